@@ -0,0 +1,185 @@
+import threading
+import time
+
+# Callback routes grouped by cost; each class has its own global concurrency cap.
+# Routes not listed here (back_to_search, no_action) are cheap and always admitted.
+ROUTE_CLASSES = {
+    "details": "details",
+    "posters": "gallery",
+    "backdrops": "gallery",
+    "logos": "gallery",
+    "lang_posters": "gallery",
+    "lang_backdrops": "gallery",
+    "lang_logos": "gallery",
+    "send_all": "send_all",
+}
+
+# Reasons a callback is shed, and what the user is told
+DEBOUNCED = "debounced"
+CHAT_LIMIT = "chat_limit"
+CLASS_LIMIT = "class_limit"
+SHED_MESSAGES = {
+    DEBOUNCED: "⏳ Already loading...",
+    CHAT_LIMIT: "⏳ Please wait for your previous request to finish.",
+    CLASS_LIMIT: "🚦 The bot is busy right now, please try again in a moment.",
+}
+
+
+class _Message:
+    __slots__ = ("generation", "data", "tapped_at", "in_flight")
+
+    def __init__(self):
+        self.generation = 0
+        self.data = None
+        self.tapped_at = 0.0
+        self.in_flight = 0
+
+
+class Ticket:
+    """An admitted callback; release() it once the work it started has finished"""
+
+    __slots__ = ("controller", "chat_id", "route_class", "message", "generation", "released")
+
+    def __init__(self, controller, chat_id, route_class, message, generation):
+        self.controller = controller
+        self.chat_id = chat_id
+        self.route_class = route_class
+        self.message = message
+        self.generation = generation
+        self.released = False
+
+    def superseded(self):
+        """True once a newer tap on the same message was admitted, so this one's result would be stale"""
+        return self.message.generation != self.generation
+
+    def release(self):
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """Admission control in front of the callback handlers.
+
+    A callback is shed (answered at once instead of queued) when the same button
+    on the same message was tapped within debounce_window seconds, when its chat
+    already has max_per_chat callbacks in flight, or when its route class is at its
+    global limit. Every ticket counts until it is released, so one chat can never
+    hold more than max_per_chat workers. Taps on a message supersede earlier ones
+    still in flight: those skip their work (or at least the render) and release
+    early, so only the latest page is drawn.
+
+    admit() is meant to run on the dispatcher thread, so shed taps are answered
+    without waiting for a worker. The worker that runs an admitted callback
+    activate()s its ticket, which is then kept per thread (like the handler name
+    bot.timed_handler() records) so work handed to yet another thread can
+    detach() it and release it when done.
+    """
+
+    def __init__(self, max_per_chat=2, debounce_window=1.0, class_limits=None):
+        self.max_per_chat = max_per_chat
+        self.debounce_window = debounce_window
+        self.class_limits = dict(class_limits or {})
+        self._chats = {}  # chat_id -> callbacks in flight
+        self._classes = {}  # route class -> callbacks in flight
+        self._messages = {}  # (chat_id, message_id) -> _Message
+        self._swept_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.admitted = 0
+        self.superseded_count = 0
+        self.shed = {reason: 0 for reason in SHED_MESSAGES}
+
+    def admit(self, route, chat_id, message_id, data):
+        """Return (ticket, None) for an admitted callback or (None, reason) for a shed one.
+
+        Cheap routes get (None, None): admitted without a ticket.
+        """
+        route_class = ROUTE_CLASSES.get(route)
+        if route_class is None:
+            return None, None
+        now = time.monotonic()
+        with self._lock:
+            key = (chat_id, message_id)
+            message = self._messages.get(key)
+            if message is None:
+                message = self._messages[key] = _Message()
+            if message.data == data and now - message.tapped_at < self.debounce_window:
+                reason = DEBOUNCED
+            elif self._chats.get(chat_id, 0) >= self.max_per_chat:
+                reason = CHAT_LIMIT
+            elif self._classes.get(route_class, 0) >= self.class_limits.get(route_class, float("inf")):
+                reason = CLASS_LIMIT
+            else:
+                reason = None
+            if reason is not None:
+                # Shed taps leave the debounce window alone, so tapping again doesn't keep extending it
+                self.shed[reason] += 1
+                return None, reason
+
+            message.data = data
+            message.tapped_at = now
+            message.generation += 1
+            message.in_flight += 1
+            self._chats[chat_id] = self._chats.get(chat_id, 0) + 1
+            self._classes[route_class] = self._classes.get(route_class, 0) + 1
+            self.admitted += 1
+            if now - self._swept_at > max(self.debounce_window, 1.0) * 60:
+                self._sweep(now)
+            return Ticket(self, chat_id, route_class, message, message.generation), None
+
+    def _release(self, ticket):
+        with self._lock:
+            if ticket.released:
+                return
+            ticket.released = True
+            ticket.message.in_flight -= 1
+            self._decrement(self._classes, ticket.route_class)
+            self._decrement(self._chats, ticket.chat_id)
+        if getattr(self._local, "ticket", None) is ticket:
+            self._local.ticket = None
+
+    @staticmethod
+    def _decrement(counts, key):
+        # Caller must hold the lock
+        counts[key] -= 1
+        if not counts[key]:
+            del counts[key]
+
+    def _sweep(self, now):
+        # Caller must hold the lock; forget idle messages whose debounce window has passed
+        self._swept_at = now
+        for key, message in list(self._messages.items()):
+            if not message.in_flight and now - message.tapped_at > self.debounce_window:
+                del self._messages[key]
+
+    def activate(self, ticket):
+        """Make ticket this thread's current ticket (None clears it)"""
+        self._local.ticket = ticket
+
+    def current(self):
+        """Ticket admitted on this thread, or None"""
+        return getattr(self._local, "ticket", None)
+
+    def detach(self):
+        """Take this thread's ticket; the caller must release it when the handed-off work finishes"""
+        ticket = self.current()
+        self._local.ticket = None
+        return ticket
+
+    def is_stale(self, ticket):
+        """True if ticket was superseded by a newer tap; counted so stale renders show up in stats"""
+        if ticket is None or not ticket.superseded():
+            return False
+        with self._lock:
+            self.superseded_count += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "superseded": self.superseded_count,
+                "shed": dict(self.shed),
+                "in_flight": dict(self._classes),
+                "chats_in_flight": len(self._chats),
+                "tracked_messages": len(self._messages),
+            }
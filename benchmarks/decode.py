@@ -0,0 +1,112 @@
+"""Benchmark of the TMDb response decoders on details payloads.
+
+Compares requests' response.json() plus projection (the old path) with every
+installed decoder from decoders.py: time per payload, throughput and peak
+allocation while decoding, after checking each produces the same projection.
+
+    python benchmarks/decode.py                 # recorded or synthetic fixtures
+    python benchmarks/decode.py --images 3000   # stress with an image-heavy title
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fixtures  # noqa: E402
+from decoders import DECODERS, available_decoders  # noqa: E402
+from projection import project  # noqa: E402
+
+
+def decode_response_json(cache_key, body):
+    """What TMDbAPI did before decoders: requests' Response.json() (text decoding included), then projection"""
+    import requests
+
+    response = requests.Response()
+    response._content = body
+    response.encoding = "utf-8"  # TMDb sends charset=utf-8
+    return project(cache_key, response.json())
+
+
+def heavy_payload(payload, images):
+    """Copy of a details payload padded to `images` image records, like the most photographed titles"""
+    payload = json.loads(json.dumps(payload))
+    for image_type, share in (("posters", 0.5), ("backdrops", 0.4), ("logos", 0.1)):
+        records = payload["images"][image_type] or [{"file_path": "/x.jpg", "iso_639_1": "en"}]
+        wanted = int(images * share)
+        payload["images"][image_type] = [dict(records[i % len(records)], file_path=f"/{image_type}{i}.jpg") for i in range(wanted)]
+    return payload
+
+
+def measure(decoders, bodies, repeat):
+    """Return {name: (median seconds per pass over bodies, peak traced bytes of one decode)}.
+
+    Passes are interleaved across decoders, after a collection each, so neither
+    ordering nor garbage left by the previous decoder favours one of them.
+    """
+    timings = {name: [] for name in decoders}
+    for _ in range(repeat):
+        for name, decode in decoders.items():
+            gc.collect()
+            start = time.perf_counter()
+            for cache_key, body in bodies:
+                decode(cache_key, body)
+            timings[name].append(time.perf_counter() - start)
+
+    results = {}
+    for name, decode in decoders.items():
+        peak = 0
+        for cache_key, body in bodies:
+            tracemalloc.start()
+            decode(cache_key, body)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        results[name] = (statistics.median(timings[name]), peak)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--titles", type=int, default=200, help="titles to synthesize when there is no recording")
+    parser.add_argument("--images", type=int, default=0, help="also add one title padded to this many images")
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes per decoder (median is reported)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    tmdb_fixtures = fixtures.load_tmdb(args.titles, args.seed)
+    payloads = list(tmdb_fixtures["details"].items())
+    if args.images:
+        key, payload = payloads[0]
+        payloads.append((key, heavy_payload(payload, args.images)))
+    bodies = [(("details",) + tuple(key.split("/")) + ("en-US",), json.dumps(payload).encode()) for key, payload in payloads]
+    total_bytes = sum(len(body) for _, body in bodies)
+    largest = max(len(body) for _, body in bodies)
+    print(f"{len(bodies)} details payloads, {total_bytes / 1024:.0f} KiB total, largest {largest / 1024:.0f} KiB")
+
+    decoders = {"response.json": decode_response_json}
+    decoders.update((name, DECODERS[name][0]) for name in available_decoders())
+    missing = sorted(set(DECODERS) - set(available_decoders()))
+    if missing:
+        print(f"Not installed: {', '.join(missing)}")
+
+    expected = [decode_response_json(cache_key, body) for cache_key, body in bodies]
+    for name in list(decoders):
+        if [decoders[name](cache_key, body) for cache_key, body in bodies] != expected:
+            print(f"{name} produced a different projection, skipped")
+            del decoders[name]
+
+    results = measure(decoders, bodies, args.repeat)
+    baseline = results["response.json"][0]
+    print(f"{'decoder':<16}{'per payload':>14}{'MiB/s':>10}{'peak alloc':>14}{'vs response.json':>20}")
+    for name, (seconds, peak) in results.items():
+        print(f"{name:<16}{seconds / len(bodies) * 1e6:>11.0f} us{total_bytes / seconds / 2 ** 20:>10.1f}"
+              f"{peak / 1024:>10.0f} KiB{baseline / seconds:>19.2f}x")
+
+
+if __name__ == "__main__":
+    main()
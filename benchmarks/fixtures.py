@@ -0,0 +1,186 @@
+"""TMDb and Telegram fixtures for the benchmarks.
+
+TMDb payloads are recorded from the live API with
+
+    TMDB_API_KEY=... python benchmarks/fixtures.py --record "Inception" "Breaking Bad" ...
+
+which writes benchmarks/fixtures/tmdb.json. Without a recording, load_tmdb()
+synthesizes payloads with TMDb's shape (extra fields, image counts and language
+mix included) so the harness still runs offline and deterministically.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+TMDB_FIXTURES = os.path.join(FIXTURES_DIR, "tmdb.json")
+UPDATE_FIXTURES = os.path.join(FIXTURES_DIR, "updates.json")
+
+# Image languages in roughly the proportions TMDb returns for include_image_language=en,hi,ta,te,bn,null
+IMAGE_LANGUAGES = ["en"] * 10 + [None] * 4 + ["hi"] * 2 + ["ta", "te", "bn"]
+
+WORDS = (
+    "silent harbor night crimson empire last garden iron river shadow broken echo winter "
+    "golden city lost kingdom dark star wild heart paper moon glass road burning sky hidden "
+    "code north wind stolen crown"
+).split()
+
+
+def _file_path(rng):
+    return "/" + "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(27)) + ".jpg"
+
+
+def _images(rng, count, aspect):
+    return [
+        {
+            "aspect_ratio": aspect,
+            "height": 3000,
+            "iso_639_1": rng.choice(IMAGE_LANGUAGES),
+            "file_path": _file_path(rng),
+            "vote_average": round(rng.uniform(0, 10), 3),
+            "vote_count": rng.randint(0, 40),
+            "width": int(3000 * aspect),
+        }
+        for _ in range(count)
+    ]
+
+
+def _search_row(rng, media_type, media_id, title):
+    row = {
+        "adult": False,
+        "backdrop_path": _file_path(rng),
+        "id": media_id,
+        "media_type": media_type,
+        "original_language": "en",
+        "overview": " ".join(rng.choice(WORDS) for _ in range(40)),
+        "popularity": round(rng.uniform(1, 500), 3),
+        "poster_path": _file_path(rng),
+        "genre_ids": rng.sample(range(10, 40), 3),
+        "vote_average": round(rng.uniform(4, 9), 3),
+        "vote_count": rng.randint(10, 30000),
+    }
+    if media_type == "movie":
+        row.update(title=title, original_title=title, release_date=f"{rng.randint(1970, 2025)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+    else:
+        row.update(name=title, original_name=title, first_air_date=f"{rng.randint(1970, 2025)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}")
+    return row
+
+
+def synthesize(titles=200, seed=1):
+    """Build {"search": {query: payload}, "details": {"movie/id": payload}} for `titles` made-up titles.
+
+    Titles earlier in the list are treated as more popular and carry more images,
+    like blockbusters do on TMDb.
+    """
+    rng = random.Random(seed)
+    names = []
+    while len(names) < titles:
+        name = " ".join(word.capitalize() for word in rng.sample(WORDS, rng.randint(2, 3)))
+        if name not in names:
+            names.append(name)
+
+    entries = []
+    details = {}
+    for rank, name in enumerate(names, 1):
+        media_type = "movie" if rank % 3 else "tv"
+        media_id = 1000 + rank
+        row = _search_row(rng, media_type, media_id, name)
+        entries.append(row)
+        scale = max(1, int(60 / rank ** 0.5))
+        payload = dict(row)
+        payload.pop("genre_ids")
+        payload.update(
+            genres=[{"id": genre, "name": rng.choice(WORDS).capitalize()} for genre in row["genre_ids"]],
+            production_companies=[{"id": rng.randint(1, 9999), "name": rng.choice(WORDS).capitalize(), "origin_country": "US"} for _ in range(3)],
+            spoken_languages=[{"iso_639_1": "en", "english_name": "English", "name": "English"}],
+            status="Released",
+            tagline=" ".join(rng.choice(WORDS) for _ in range(6)),
+            images={
+                "posters": _images(rng, rng.randint(scale, scale * 3), 0.667),
+                "backdrops": _images(rng, rng.randint(scale, scale * 2), 1.778),
+                "logos": _images(rng, rng.randint(1, max(2, scale // 4)), 3.2),
+            },
+        )
+        if media_type == "movie":
+            payload["runtime"] = rng.randint(80, 180)
+        else:
+            payload.update(number_of_seasons=rng.randint(1, 12), number_of_episodes=rng.randint(6, 200))
+        details[f"{media_type}/{media_id}"] = payload
+
+    search = {}
+    for row in entries:
+        name = row.get("title") or row.get("name")
+        # A search returns the title itself, some namesakes and the odd person
+        others = rng.sample(entries, 12)
+        results = [row] + [other for other in others if other is not row][:11]
+        results.insert(rng.randint(1, len(results)), {"id": rng.randint(1, 99999), "media_type": "person", "name": name, "popularity": 1.0})
+        search[name.lower()] = {"page": 1, "results": results, "total_pages": 1, "total_results": len(results)}
+    return {"search": search, "details": details}
+
+
+def load_tmdb(titles=200, seed=1):
+    """Recorded TMDb payloads if benchmarks/fixtures/tmdb.json exists, otherwise synthesized ones"""
+    if os.path.exists(TMDB_FIXTURES):
+        with open(TMDB_FIXTURES, encoding="utf-8") as f:
+            return json.load(f)
+    return synthesize(titles, seed)
+
+
+def load_updates():
+    """Telegram update templates keyed by kind ("command", "callback")"""
+    with open(UPDATE_FIXTURES, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def title_list(fixtures):
+    """[(query, media_type, media_id, details payload)] in fixture (popularity) order, one per search"""
+    titles = []
+    for query, payload in fixtures["search"].items():
+        # The first movie/TV row is the one record() fetched details for
+        for row in payload["results"]:
+            key = f"{row.get('media_type')}/{row.get('id')}"
+            if key in fixtures["details"]:
+                titles.append((query, row["media_type"], str(row["id"]), fixtures["details"][key]))
+                break
+    return titles
+
+
+def record(queries, path=TMDB_FIXTURES):
+    """Fetch the search and details payloads of each query's top result from TMDb and save them"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from tmdb_api import TMDbAPI, create_session, normalize_query
+
+    api = TMDbAPI(session=create_session(), disk_cache_path=None)
+    if not api.api_key:
+        raise SystemExit("TMDB_API_KEY is not set")
+    fixtures = {"search": {}, "details": {}}
+    for query in queries:
+        _, endpoint, params = api.search_request(query)
+        response = api.session.get(endpoint, params=params, timeout=api.timeout)
+        response.raise_for_status()
+        payload = response.json()
+        fixtures["search"][normalize_query(query)] = payload
+        for row in payload.get("results", []):
+            if row.get("media_type") in ("movie", "tv"):
+                _, endpoint, params = api.details_request(row["media_type"], row["id"])
+                response = api.session.get(endpoint, params=params, timeout=api.timeout)
+                response.raise_for_status()
+                fixtures["details"][f"{row['media_type']}/{row['id']}"] = response.json()
+                break
+        print(f"Recorded {query}")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f)
+    print(f"Wrote {len(fixtures['search'])} searches and {len(fixtures['details'])} titles to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record TMDb fixtures for the benchmarks")
+    parser.add_argument("--record", action="store_true", help="fetch the queries from TMDb (needs TMDB_API_KEY)")
+    parser.add_argument("queries", nargs="*", help="titles to search for, most popular first")
+    args = parser.parse_args()
+    if not args.record or not args.queries:
+        parser.error("pass --record and at least one title")
+    record(args.queries)
@@ -0,0 +1,327 @@
+"""Offline benchmark of the bot's handlers against recorded TMDb payloads.
+
+Drives synthetic Telegram updates through tmdb_search and the callback routes
+(details and every gallery handler) with a fake Telegram bot and a local TMDb
+stub, at a configurable concurrency. Titles are requested with Zipf-distributed
+popularity, so cache hit rates look like production traffic. For every scenario
+it reports throughput, latency percentiles, upstream calls and memory.
+
+    python benchmarks/run.py                                  # every scenario
+    python benchmarks/run.py -s details -s lang_posters -c 8 -n 5000
+    python benchmarks/run.py --json before.json               # save results...
+    python benchmarks/run.py --compare before.json            # ...and fail on regressions
+
+Handlers run synchronously here (ASYNC_HANDLERS is forced off) so that a
+request's latency is the time its handler takes to return. Every scenario runs
+in a fresh process, so its max_rss_mb is the peak of that scenario alone rather
+than of everything that ran before it.
+"""
+import argparse
+import copy
+import json
+import logging
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before bot and config are imported
+os.environ["ASYNC_HANDLERS"] = "false"
+os.environ.setdefault("TMDB_RATE_LIMIT", "0")  # Don't let the outbound rate limiter cap the numbers
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:benchmark")
+# Measure the handlers rather than callback admission control (set these to benchmark shedding too)
+for name in ("CALLBACK_MAX_PER_CHAT", "CALLBACK_LIMIT_DETAILS", "CALLBACK_LIMIT_GALLERY", "CALLBACK_LIMIT_SEND_ALL"):
+    os.environ.setdefault(name, "1000000")
+os.environ.setdefault("CALLBACK_DEBOUNCE_SECONDS", "0")
+
+import fixtures  # noqa: E402
+from stubs import FakeBot, TMDbStub  # noqa: E402
+
+GALLERY_ROUTES = ("posters", "backdrops", "logos")
+SCENARIOS = ("search", "details") + GALLERY_ROUTES + tuple(f"lang_{route}" for route in GALLERY_ROUTES) + ("mixed",)
+
+# Share of each request type in the "mixed" scenario: a search, a couple of details views, some gallery browsing
+MIXED_WEIGHTS = {
+    "search": 3, "details": 5,
+    "posters": 2, "backdrops": 1, "logos": 1,
+    "lang_posters": 3, "lang_backdrops": 2, "lang_logos": 1,
+}
+
+
+def _run_inline(func, *args, update=None, **kwargs):
+    return func(*args, **kwargs)
+
+
+# Stands in for the dispatcher's worker pool: the benchmark threads run admitted callbacks themselves,
+# so a callback's latency covers its handler
+INLINE_DISPATCHER = SimpleNamespace(run_async=_run_inline)
+
+
+def zipf_weights(count, exponent):
+    """Relative popularity of ranks 1..count under a Zipf law"""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def percentile(ordered, q):
+    """Nearest-rank q-th percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+class Workload:
+    """Builds the updates for a scenario before it is timed, so only the handlers are measured"""
+
+    def __init__(self, bot_module, fake_bot, titles, templates, exponent, users, seed):
+        self.bot_module = bot_module
+        self.fake_bot = fake_bot
+        self.titles = titles
+        self.templates = templates
+        self.weights = zipf_weights(len(titles), exponent)
+        self.users = users
+        self.rng = random.Random(seed)
+        self.serial = 0
+
+    def requests(self, scenario, count):
+        """Return count (handler, update, context) triples for scenario"""
+        titles = self.rng.choices(self.titles, self.weights, k=count)
+        kinds = [scenario] * count
+        if scenario == "mixed":
+            kinds = self.rng.choices(list(MIXED_WEIGHTS), list(MIXED_WEIGHTS.values()), k=count)
+        return [self._request(kind, title) for kind, title in zip(kinds, titles)]
+
+    def _update(self, kind, chat_id):
+        from telegram import Update
+
+        self.serial += 1
+        payload = copy.deepcopy(self.templates[kind])
+        payload["update_id"] = self.serial
+        message = payload["message"] if kind == "command" else payload["callback_query"]["message"]
+        message["message_id"] = self.serial
+        message["chat"]["id"] = chat_id
+        return Update.de_json(payload, self.fake_bot)
+
+    def _request(self, kind, title):
+        query, media_type, media_id, details = title
+        chat_id = self.rng.randint(1, self.users)
+        if kind == "search":
+            update = self._update("command", chat_id)
+            update.message.text = f"/tmdb {query}"
+            return self.bot_module.tmdb_search, update, SimpleNamespace(args=query.split())
+
+        args = (media_type, media_id, "en-US")
+        if kind.startswith("lang_"):
+            args += self._language_page(details, kind[len("lang_"):])
+        update = self._update("callback", chat_id)
+        update.callback_query.from_user.id = chat_id
+        update.callback_query.data = self.bot_module.callbacks.encode(kind, *args)
+        return self.bot_module.handle_callback_query, update, SimpleNamespace(args=[], dispatcher=INLINE_DISPATCHER)
+
+    def _language_page(self, details, image_type):
+        from images import IMAGES_PER_PAGE, NO_LANGUAGE
+
+        counts = {}
+        for image in (details.get("images") or {}).get(image_type) or ():
+            lang_code = image.get("iso_639_1") or NO_LANGUAGE
+            counts[lang_code] = counts.get(lang_code, 0) + 1
+        if not counts:
+            return ("en", 1)
+        lang_code = self.rng.choice(sorted(counts))
+        # Most people stay on the first page or two
+        pages = math.ceil(counts[lang_code] / IMAGES_PER_PAGE)
+        return (lang_code, min(pages, self.rng.choice((1, 1, 1, 2, 2, 3))))
+
+
+def max_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024  # bytes on macOS, KiB elsewhere
+
+
+def cache_counts(tmdb):
+    """(hits, misses) summed over the details and search caches"""
+    hits = misses = 0
+    for cache in (tmdb.cache, tmdb.search_cache):
+        stats = cache.stats()
+        hits += stats["hits"] + stats["stale_hits"]
+        misses += stats["misses"]
+    return hits, misses
+
+
+def run_scenario(workload, scenario, count, warmup, concurrency, trace_memory, stub, fake_bot, tmdb, admission):
+    # Every scenario starts cold and warms up on its own traffic, so results don't depend on what ran before.
+    # Derived values (image indexes, rendered pages) live on the cache entries, so they go cold with these.
+    tmdb.cache.clear()
+    tmdb.search_cache.clear()
+    if warmup:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda request: request[0](request[1], request[2]), workload.requests(scenario, warmup)))
+
+    requests = workload.requests(scenario, count)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(request):
+        nonlocal errors
+        handler, update, context = request
+        start = time.perf_counter()
+        failed = False
+        try:
+            handler(update, context)
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            errors += failed
+
+    upstream_before = sum(stub.requests.values())
+    telegram_before = sum(fake_bot.calls.values())
+    cache_before = cache_counts(tmdb)
+    shed_before = sum(admission.stats()["shed"].values())
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, requests))
+    wall = time.perf_counter() - started
+    traced = tracemalloc.get_traced_memory() if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+    cache_after = cache_counts(tmdb)
+
+    latencies.sort()
+    hits, misses = (after - before for after, before in zip(cache_after, cache_before))
+    result = {
+        "requests": count,
+        "concurrency": concurrency,
+        "throughput_rps": round(count / wall, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "errors": errors,
+        "shed": sum(admission.stats()["shed"].values()) - shed_before,
+        "tmdb_requests": sum(stub.requests.values()) - upstream_before,
+        "telegram_calls": sum(fake_bot.calls.values()) - telegram_before,
+        "tmdb_cache_hit_ratio": round(hits / (hits + misses), 3) if hits + misses else None,
+        "max_rss_mb": round(max_rss_mb(), 1),
+    }
+    if traced:
+        result["traced_current_mb"] = round(traced[0] / (1024 * 1024), 2)
+        result["traced_peak_mb"] = round(traced[1] / (1024 * 1024), 2)
+    return result
+
+
+def print_table(results):
+    columns = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "max_ms", "errors", "shed", "tmdb_requests",
+               "telegram_calls", "tmdb_cache_hit_ratio", "max_rss_mb", "traced_peak_mb")
+    columns = [column for column in columns if any(column in result for result in results.values())]
+    widths = [max(len(column), 8) + 2 for column in columns]
+    print(f"{'scenario':<16}" + "".join(f"{column:>{width}}" for column, width in zip(columns, widths)))
+    for scenario, result in results.items():
+        print(f"{scenario:<16}" + "".join(f"{str(result.get(column, '')):>{width}}" for column, width in zip(columns, widths)))
+
+
+def compare(results, baseline_path, threshold):
+    """Print changes against a saved run; returns False if any scenario regressed beyond threshold percent"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    ok = True
+    for scenario, result in results.items():
+        before = baseline.get(scenario)
+        if before is None:
+            continue
+        throughput = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100 if before["throughput_rps"] else 0.0
+        p95 = (result["p95_ms"] / before["p95_ms"] - 1) * 100 if before["p95_ms"] else 0.0
+        regressed = throughput < -threshold or p95 > threshold
+        ok = ok and not regressed
+        print(f"{scenario:<16} throughput {throughput:+.1f}%  p95 {p95:+.1f}%{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def run_isolated(scenario, args):
+    """Run one scenario in a child process and return its result"""
+    command = [sys.executable, os.path.abspath(__file__), "--child", scenario]
+    for flag in ("requests", "warmup", "concurrency", "titles", "zipf", "users", "tmdb_latency", "telegram_latency", "seed"):
+        value = getattr(args, flag)
+        if value is not None:
+            command += [f"--{flag.replace('_', '-')}", str(value)]
+    if args.tracemalloc:
+        command.append("--tracemalloc")
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+    # The result is the last line; anything before it is incidental output of the bot's modules
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_child(scenario, args):
+    tmdb_fixtures = fixtures.load_tmdb(args.titles, args.seed)
+    stub = TMDbStub(tmdb_fixtures, latency=args.tmdb_latency / 1000).start()
+    fake_bot = FakeBot(latency=args.telegram_latency / 1000)
+
+    import bot
+
+    logging.getLogger().setLevel(logging.WARNING)
+    bot.tmdb.base_url = stub.url
+
+    titles = fixtures.title_list(tmdb_fixtures)
+    workload = Workload(bot, fake_bot, titles, fixtures.load_updates(), args.zipf, args.users, args.seed)
+    warmup = args.requests // 10 if args.warmup is None else args.warmup
+    result = run_scenario(
+        workload, scenario, args.requests, warmup, args.concurrency, args.tracemalloc, stub, fake_bot, bot.tmdb,
+        bot.admission
+    )
+    stub.stop()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-s", "--scenario", action="append", choices=SCENARIOS, help="scenario to run (repeatable; default: all)")
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="timed requests per scenario")
+    parser.add_argument("-w", "--warmup", type=int, default=None, help="untimed requests first (default: 10%% of --requests)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="handler threads, like DISPATCHER_WORKERS")
+    parser.add_argument("--titles", type=int, default=200, help="titles to synthesize when there is no recording")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of title popularity")
+    parser.add_argument("--users", type=int, default=500, help="distinct chats sending the updates")
+    parser.add_argument("--tmdb-latency", type=float, default=0.0, help="simulated TMDb round trip, in ms")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="simulated Bot API round trip, in ms")
+    parser.add_argument("--tracemalloc", action="store_true", help="also trace Python allocations (slows the run)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="write the results to PATH")
+    parser.add_argument("--compare", metavar="PATH", help="compare against results saved with --json")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed throughput/p95 regression, in percent")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child, args)
+        return
+
+    titles = fixtures.title_list(fixtures.load_tmdb(args.titles, args.seed))
+    print(f"{len(titles)} titles, {args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"zipf {args.zipf}, {'recorded' if os.path.exists(fixtures.TMDB_FIXTURES) else 'synthetic'} TMDb fixtures")
+
+    results = {}
+    for scenario in args.scenario or SCENARIOS:
+        results[scenario] = run_isolated(scenario, args)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    ok = compare(results, args.compare, args.threshold) if args.compare else True
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Local stand-ins for TMDb, its image CDN and the Telegram Bot API used by the benchmarks and tests"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from telegram import Bot
+
+from tmdb_api import normalize_query
+
+EMPTY_SEARCH = json.dumps({"page": 1, "results": [], "total_pages": 0, "total_results": 0}).encode()
+NOT_FOUND = json.dumps({"success": False, "status_code": 34, "status_message": "The resource you requested could not be found."}).encode()
+
+
+class TMDbStub:
+    """Serves recorded search/multi and movie|tv/{id} payloads over HTTP on localhost.
+
+    Payloads are encoded once up front so the stub adds as little CPU as possible
+    to the measurements; `latency` seconds are slept per request to stand in for
+    the round trip to TMDb. Statuses (or (status, body) pairs) appended to
+    `failures` are answered, one per request, before payloads are served again.
+    """
+
+    def __init__(self, fixtures, latency=0.0):
+        self.latency = latency
+        self.requests = Counter()
+        self.failures = []
+        self._search = {query: json.dumps(payload).encode() for query, payload in fixtures["search"].items()}
+        self._details = {key: json.dumps(payload).encode() for key, payload in fixtures["details"].items()}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like api.themoviedb.org
+            # Headers and body go out in separate writes; without this, delayed ACKs add ~40ms per response
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts[0] == "search":
+                    endpoint = "search"
+                    body = stub._search.get(normalize_query(parse_qs(url.query).get("query", [""])[0]), EMPTY_SEARCH)
+                    status = 200
+                else:
+                    endpoint = "details"
+                    body = stub._details.get("/".join(parts[:2]))
+                    status = 200 if body is not None else 404
+                    body = body or NOT_FOUND
+                with stub._lock:
+                    stub.requests[endpoint] += 1
+                    if stub.failures:
+                        failure = stub.failures.pop(0)
+                        status, body = failure if isinstance(failure, tuple) else (failure, NOT_FOUND)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json;charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="tmdb-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+class ImageStub:
+    """Serves fake JPEGs at /t/p/{size}/{name} on localhost, like image.tmdb.org.
+
+    Each image is `image_bytes` long and starts with its own name, so callers can
+    tell which image they got; names listed in `missing` answer 404.
+    """
+
+    def __init__(self, image_bytes=1024, missing=(), latency=0.0):
+        self.image_bytes = image_bytes
+        self.missing = set(missing)
+        self.latency = latency
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                name = self.path.rsplit("/", 1)[-1]
+                with stub._lock:
+                    stub.requests[name] += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if name in stub.missing:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = stub.image(name)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+
+    def image(self, name):
+        return (b"\xff\xd8\xff" + name.encode()).ljust(self.image_bytes, b"\0")
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="image-stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+
+
+class FakeBot(Bot):
+    """A telegram.Bot whose API calls are answered locally instead of going to Telegram.
+
+    Handlers still go through PTB's request building and result parsing, so that
+    cost stays in the numbers; `latency` seconds are slept per call to stand in for
+    the Bot API round trip.
+    """
+
+    def __init__(self, latency=0.0):
+        super().__init__("123456:benchmark")
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _post(self, endpoint, data=None, timeout=None, api_kwargs=None):
+        with self._lock:
+            self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        data = data or {}
+        if endpoint in ("sendMessage", "editMessageText"):
+            return {
+                "message_id": data.get("message_id", 1),
+                "date": int(time.time()),
+                "chat": {"id": data.get("chat_id", 1), "type": "private"},
+                "text": data.get("text", ""),
+            }
+        if endpoint in ("sendMediaGroup", "getUpdates"):
+            return []
+        if endpoint == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+        return True
@@ -1,22 +1,130 @@
+import time
+
+# Startup is timed from here, so the breakdown includes module imports
+_module_started = time.perf_counter()
+
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Updater, CommandHandler, CallbackQueryHandler, CallbackContext, MessageHandler, Filters
-from config import TELEGRAM_BOT_TOKEN
-from tmdb_api import TMDbAPI
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+from telegram.error import TelegramError
+from telegram.ext import Updater, Dispatcher, CommandHandler, CallbackQueryHandler, CallbackContext, MessageHandler, Filters, InlineQueryHandler, TypeHandler, JobQueue
+from config import (
+    TELEGRAM_BOT_TOKEN, ASYNC_HANDLERS, TMDB_DISK_CACHE_WARM, PREFETCH_TOP_K, PREFETCH_WORKERS,
+    LOCAL_SEARCH_ENABLED, INLINE_RESULTS_LIMIT, UPDATE_MODE, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_PATH,
+    UPDATE_QUEUE_SIZE, DISPATCHER_WORKERS, HTTP_PORT, SHARD_WORKERS, TMDB_DISK_CACHE_PATH,
+    CALLBACK_STATE_MAX_ENTRIES, CALLBACK_STATE_TTL,
+    SEND_ALL_MODE, SEND_ALL_MAX_IMAGES, SEND_ALL_IMAGE_SIZE, ALBUM_MAX_BYTES,
+    ALBUM_FETCH_CONCURRENCY, IMAGE_PROXY_DIR, IMAGE_PROXY_MAX_BYTES, IMAGE_PROXY_SIZES, IMAGE_PROXY_MAX_AGE,
+    TMDB_IMAGE_BASE_URL, STARTUP_BUDGET_SECONDS, CALLBACK_MAX_PER_CHAT, CALLBACK_DEBOUNCE_SECONDS,
+    CALLBACK_CLASS_LIMITS
+)
+from title_index import EXACT_TITLE
+from tmdb_api import TMDbAPI, create_session
+from prefetch import Prefetcher
+from callbacks import CallbackStateTable, ROUTE_ARITY
+from admission import AdmissionController, SHED_MESSAGES
+from metrics import StartupTimer, registry
+from gallery import GALLERY_TYPES, GalleryRenderer, RenderedPage
+from cache import DerivedCache
+from images import IMAGE_TYPES, NO_LANGUAGE
+import hmac
+import queue
+import signal
 import threading
-from flask import Flask
+from contextlib import contextmanager
+from functools import partial
 
 # --- Flask section for Render ---
-app = Flask(__name__)
 
-@app.route('/')
-def home():
-    return "✅ Telegram Bot is running on Render!"
+# Updates waiting for the dispatcher, shared by the webhook route and the polling fallback
+update_queue = queue.Queue(maxsize=UPDATE_QUEUE_SIZE)
 
-def run_flask():
-    app.run(host='0.0.0.0', port=10000)
+# Set once the webhook is registered; until then webhook requests are refused
+webhook_bot = None
+
+# Worker processes updates are fanned out to when SHARD_WORKERS is set
+sharded = None
+
+# Set once the dispatcher is processing updates; /ready answers 503 until then
+ready = threading.Event()
+
+# Startup phase timings, reported on /ready and checked against STARTUP_BUDGET_SECONDS
+startup = StartupTimer(budget=STARTUP_BUDGET_SECONDS, started=_module_started)
+
+def create_app():
+    """Create the Flask app with the health, readiness, webhook, image proxy and metrics routes."""
+    # Imported here so Flask loads on the HTTP server thread instead of delaying the bot
+    from flask import Flask, jsonify, request, send_file
+
+    app = Flask(__name__)
+
+    @app.route('/')
+    def home():
+        return "✅ Telegram Bot is running on Render!"
+
+    @app.route('/ready')
+    def readiness():
+        # With sharding, a dead shard fails readiness until it has been restarted
+        is_ready = ready.is_set() and (sharded is None or sharded.healthy())
+        return jsonify({"ready": is_ready, "startup": startup.report()}), 200 if is_ready else 503
+
+    @app.route(WEBHOOK_PATH, methods=['POST'])
+    def telegram_webhook():
+        """Receive an update from Telegram and queue it for the dispatcher"""
+        if webhook_bot is None:
+            return "Webhook not active", 503
 
-threading.Thread(target=run_flask).start()
+        secret = request.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if not hmac.compare_digest(secret.encode(), WEBHOOK_SECRET.encode()):
+            return "Forbidden", 403
+
+        payload = request.get_json(silent=True)
+        if not payload:
+            return "Bad Request", 400
+
+        try:
+            update_queue.put_nowait(Update.de_json(payload, webhook_bot))
+        except queue.Full:
+            # Telegram retries failed deliveries, so shed load instead of blocking the HTTP server
+            logger.warning(f"Update queue full ({UPDATE_QUEUE_SIZE}), rejecting update {payload.get('update_id')}")
+            return "Busy", 503
+        return "OK"
+
+    @app.route('/status')
+    def status():
+        return jsonify({
+            "mode": "webhook" if webhook_bot is not None else "polling",
+            "update_queue": {"depth": update_queue.qsize(), "max_size": UPDATE_QUEUE_SIZE},
+            "shards": sharded.stats() if sharded is not None else [],
+            "admission": admission.stats(),
+            "tmdb_rate_limit": tmdb.rate_limit_stats(),
+            "tmdb_coalescing": tmdb.coalescing_stats(),
+            "tmdb_refresh": tmdb.refresh_stats(),
+            "prefetch": prefetcher.stats(),
+        })
+
+    @app.route('/img/<size>/<path:file_path>')
+    def image_proxy(size, file_path):
+        """Serve a TMDb image (same size/path layout as image.tmdb.org/t/p) from the local image cache"""
+        if image_store is None:
+            return "Image proxy disabled", 404
+        entry = image_store.get(size, '/' + file_path)
+        if entry is None:
+            return "Not Found", 404
+        path, digest, content_type = entry
+        # conditional=True answers If-None-Match and Range requests; the file is streamed by the WSGI server
+        return send_file(path, mimetype=content_type, conditional=True, etag=digest, max_age=IMAGE_PROXY_MAX_AGE)
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+    return app
+
+def run_flask():
+    with startup.phase("flask"):
+        app = create_app()
+    app.run(host='0.0.0.0', port=HTTP_PORT)
 
 # --- Telegram Bot Section ---
 import os
@@ -31,6 +139,273 @@ logger = logging.getLogger(__name__)
 # Initialize TMDb API
 tmdb = TMDbAPI()
 
+# Prometheus metrics served on /metrics (TMDb call latency is recorded in tmdb_api)
+HANDLER_SECONDS = registry.histogram(
+    "bot_handler_duration_seconds", "Time spent handling an update, by command or callback route", ("handler",)
+)
+HANDLER_ERRORS = registry.counter("bot_handler_errors_total", "Handler calls that raised", ("handler",))
+HANDLERS_IN_PROGRESS = registry.gauge("bot_handlers_in_progress", "Handler calls currently running")
+HANDLER_BUSY_SECONDS = registry.counter(
+    "bot_handler_busy_seconds_total", "Time each thread spent inside handlers; its rate is the thread's utilization", ("thread",)
+)
+HANDLER_PHASE_SECONDS = registry.histogram(
+    "bot_handler_phase_seconds", "Time a callback spent fetching from TMDb and rendering, by route", ("handler", "phase")
+)
+TELEGRAM_SECONDS = registry.histogram(
+    "telegram_request_duration_seconds", "Latency of Telegram Bot API calls", ("method", "outcome")
+)
+
+# Memoized poster/backdrop/logo gallery pages
+galleries = GalleryRenderer(tmdb)
+
+# Rendered details cards, kept on the cache entry of the details payload they were built from
+details_cards = DerivedCache(tmdb.cache, "details_card")
+
+# Image downloads get their own connection pool: the API session keeps a single host pool, and
+# alternating image.tmdb.org with api.themoviedb.org requests on it would reconnect every time
+image_session = create_session() if SEND_ALL_MODE == "album" or IMAGE_PROXY_DIR else None
+
+# Local cache behind the /img image proxy (enabled by IMAGE_PROXY_DIR)
+image_store = None
+if IMAGE_PROXY_DIR:
+    from image_proxy import ImageStore
+    image_store = ImageStore(
+        IMAGE_PROXY_DIR, image_session, TMDB_IMAGE_BASE_URL, IMAGE_PROXY_SIZES, max_bytes=IMAGE_PROXY_MAX_BYTES
+    )
+
+# Uploads "Send All Images" as media-group albums when SEND_ALL_MODE=album
+album_sender = None
+if SEND_ALL_MODE == "album":
+    from media_upload import AlbumSender
+    album_sender = AlbumSender(image_session, max_bytes=ALBUM_MAX_BYTES, concurrency=ALBUM_FETCH_CONCURRENCY)
+
+# Encodes button callbacks; arguments too long for a button are kept here and in the disk cache, if any
+callbacks = CallbackStateTable(max_entries=CALLBACK_STATE_MAX_ENTRIES, ttl=CALLBACK_STATE_TTL, store=tmdb.disk_cache)
+
+# Sheds callbacks that would let one chat (or one kind of button) occupy every dispatcher worker
+admission = AdmissionController(
+    max_per_chat=CALLBACK_MAX_PER_CHAT, debounce_window=CALLBACK_DEBOUNCE_SECONDS, class_limits=CALLBACK_CLASS_LIMITS
+)
+
+# Warms details for the results a user is likely to tap next (opt-in via PREFETCH_TOP_K)
+prefetcher = Prefetcher(tmdb, top_k=PREFETCH_TOP_K, workers=PREFETCH_WORKERS)
+
+# Optional asyncio path: TMDb lookups run on one event loop so dispatcher threads are freed immediately
+async_tmdb = None
+event_loop = None
+if ASYNC_HANDLERS:
+    from tmdb_async import AsyncTMDbAPI, EventLoopThread
+    event_loop = EventLoopThread()
+    async_tmdb = AsyncTMDbAPI(tmdb)
+
+def cache_stats() -> dict:
+    """Stats of every in-process cache, by name"""
+    stats = {
+        "tmdb": tmdb.cache.stats(),
+        "tmdb_search": tmdb.search_cache.stats(),
+        "image_index": tmdb.image_indexes.stats(),
+        "gallery_pages": galleries.stats(),
+        "details_cards": details_cards.stats(),
+    }
+    if tmdb.disk_cache:
+        stats["tmdb_disk"] = tmdb.disk_cache.stats()
+    if image_store:
+        stats["image_proxy"] = image_store.stats()
+    return stats
+
+def _cache_hits(stats) -> int:
+    # Stale entries served while they refresh count as hits
+    return stats["hits"] + stats.get("stale_hits", 0)
+
+registry.collect(
+    "cache_hits_total", "Cache lookups answered from the cache",
+    lambda: {(name,): _cache_hits(stats) for name, stats in cache_stats().items()}, labels=("cache",), kind="counter"
+)
+registry.collect(
+    "cache_misses_total", "Cache lookups that missed",
+    lambda: {(name,): stats["misses"] for name, stats in cache_stats().items()}, labels=("cache",), kind="counter"
+)
+registry.collect(
+    "cache_hit_ratio", "Fraction of cache lookups answered from the cache since startup",
+    lambda: {
+        (name,): _cache_hits(stats) / (_cache_hits(stats) + stats["misses"]) if _cache_hits(stats) + stats["misses"] else 0.0
+        for name, stats in cache_stats().items()
+    },
+    labels=("cache",), summed=False  # Across shards, use cache_hits_total and cache_misses_total
+)
+registry.collect(
+    "callbacks_shed_total", "Callbacks answered without running their handler, by reason",
+    lambda: {(reason,): count for reason, count in admission.stats()["shed"].items()}, labels=("reason",), kind="counter"
+)
+registry.collect(
+    "callbacks_superseded_total", "Callbacks whose render was skipped because a newer tap on the message arrived",
+    lambda: admission.stats()["superseded"], kind="counter"
+)
+registry.collect(
+    "tmdb_lookups_upstream_total", "TMDb cache misses that led an upstream request",
+    lambda: tmdb.coalescing_stats()["executions"], kind="counter"
+)
+registry.collect(
+    "tmdb_lookups_coalesced_total", "TMDb cache misses that shared a request already in flight",
+    lambda: tmdb.coalescing_stats()["coalesced"], kind="counter"
+)
+registry.collect(
+    "tmdb_refreshes_total", "Background refreshes of stale TMDb entries, by outcome",
+    lambda: {(outcome,): count for outcome, count in tmdb.refresh_stats().items() if outcome != "pending"},
+    labels=("outcome",), kind="counter"
+)
+registry.collect("tmdb_refreshes_pending", "Stale TMDb entries waiting to be refreshed", lambda: tmdb.refresh_stats()["pending"])
+registry.collect(
+    "prefetch_requests_total", "Speculative details prefetches, by outcome",
+    lambda: {(outcome,): prefetcher.stats()[outcome] for outcome in ("scheduled", "completed", "cancelled")},
+    labels=("outcome",), kind="counter"
+)
+registry.collect(
+    "prefetch_taps_total", "First result taps after a search: hit (prefetched in time), late or miss",
+    lambda: {(result,): prefetcher.stats()[key] for result, key in (("hit", "hits"), ("late", "late"), ("miss", "misses"))},
+    labels=("result",), kind="counter"
+)
+registry.collect(
+    "tmdb_rate_limit_waiting", "TMDb calls waiting for a rate-limit token, by priority lane",
+    lambda: {(lane,): stats["waiting"] for lane, stats in tmdb.rate_limit_stats().items()}, labels=("lane",)
+)
+registry.collect(
+    "tmdb_rate_limit_timeouts_total", "TMDb calls dropped after waiting too long for a rate-limit token",
+    lambda: {(lane,): stats["timeouts"] for lane, stats in tmdb.rate_limit_stats().items()}, labels=("lane",), kind="counter"
+)
+registry.collect("update_queue_depth", "Updates waiting for the dispatcher", update_queue.qsize, summed=False)
+registry.collect("update_queue_capacity", "Maximum number of queued updates", lambda: UPDATE_QUEUE_SIZE, summed=False)
+
+# Name of the handler running on each thread, so timed_phase() needn't be passed the route
+_handler = threading.local()
+
+@contextmanager
+def timed_handler(name):
+    """Record latency, errors and thread busy time of one handler call under name"""
+    HANDLERS_IN_PROGRESS.inc()
+    _handler.name = name
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        HANDLER_ERRORS.inc(name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _handler.name = None
+        HANDLERS_IN_PROGRESS.dec()
+        HANDLER_SECONDS.observe(elapsed, name)
+        HANDLER_BUSY_SECONDS.inc(threading.current_thread().name, value=elapsed)
+
+def current_handler():
+    """Name of the handler timed on this thread, or None"""
+    return getattr(_handler, "name", None)
+
+@contextmanager
+def timed_phase(phase):
+    """Add the time spent in the block to the current handler's phase ("tmdb" or "render")"""
+    name = current_handler()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if name is not None:
+            HANDLER_PHASE_SECONDS.observe(time.perf_counter() - start, name, phase)
+
+def instrumented(name, handler):
+    """Wrap a dispatcher callback so its calls are recorded under name"""
+    def timed(update: Update, context: CallbackContext) -> None:
+        with timed_handler(name):
+            handler(update, context)
+    return timed
+
+def timed_request(**kwargs):
+    """Create a Bot API Request that times every call by API method (sendMessage, editMessageText, ...)"""
+    from telegram.utils.request import Request
+
+    class TimedRequest(Request):
+        __slots__ = ()
+
+        def post(self, url, data, timeout=None):
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                result = super().post(url, data, timeout=timeout)
+                outcome = "ok"
+                return result
+            finally:
+                TELEGRAM_SECONDS.observe(time.perf_counter() - start, url.rsplit('/', 1)[-1], outcome)
+
+    return TimedRequest(**kwargs)
+
+async def _run_async(fetch, show, target, *args, route=None, ticket=None):
+    """Await a TMDb coroutine, then hand the result to a blocking show function off the event loop.
+
+    When route is given, the fetch and render times and render errors are recorded under that handler.
+    An admission ticket is released once done, and rendering is skipped if a newer tap superseded it.
+    """
+    start = time.perf_counter()
+    try:
+        try:
+            result = await fetch
+        except Exception as e:
+            logger.error(f"Error in async TMDb lookup: {e}")
+            result = None
+        fetched = time.perf_counter()
+        if admission.is_stale(ticket):
+            return
+        try:
+            await event_loop.run_blocking(show, target, result, *args)
+        except Exception as e:
+            logger.error(f"Error rendering async result: {e}")
+            if route:
+                HANDLER_ERRORS.inc(route)
+        if route:
+            HANDLER_PHASE_SECONDS.observe(fetched - start, route, "tmdb")
+            HANDLER_PHASE_SECONDS.observe(time.perf_counter() - fetched, route, "render")
+    finally:
+        if ticket is not None:
+            ticket.release()
+
+def build_keyboard(buttons) -> InlineKeyboardMarkup:
+    """Build a keyboard from rows of (label, route, args) callback specs and (label, None, url) link specs."""
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton(label, url=args) if route is None else InlineKeyboardButton(label, callback_data=callbacks.encode(route, *args))
+            for label, route, args in row
+        ]
+        for row in buttons
+    ])
+
+def with_details(query, show, media_type, media_id, language, *args) -> None:
+    """Fetch details and pass them to show(query, details, media_type, media_id, language, *args)."""
+    if async_tmdb:
+        fetch = async_tmdb.get_details(media_type, media_id, language)
+        # The event loop finishes this callback, so it takes over the admission ticket
+        event_loop.submit(_run_async(
+            fetch, show, query, media_type, media_id, language, *args,
+            route=current_handler(), ticket=admission.detach()
+        ))
+    else:
+        with timed_phase("tmdb"):
+            details = tmdb.get_details(media_type, media_id, language)
+        if admission.is_stale(admission.current()):
+            return  # A newer tap on this message is already being handled and will draw it
+        with timed_phase("render"):
+            show(query, details, media_type, media_id, language, *args)
+
+# Callback routes (see callbacks.ROUTE_ARITY) and their handlers, filled in by @callback_route
+CALLBACK_HANDLERS = {}
+
+def callback_route(route):
+    """Register the decorated function as the handler for a callback route"""
+    if route not in ROUTE_ARITY:
+        raise ValueError(f"Unknown callback route {route}")
+    def register(handler):
+        CALLBACK_HANDLERS[route] = handler
+        return handler
+    return register
+
 def start(update: Update, context: CallbackContext) -> None:
     """Send a welcome message when the command /start is issued."""
     welcome_message = (
@@ -51,57 +426,91 @@ def tmdb_search(update: Update, context: CallbackContext) -> None:
     query = ' '.join(context.args)
     update.message.reply_text(f"🔍 Searching for '{query}'...")
     
-    # Search TMDb API
-    results = tmdb.search_multi(query)
+    # Answer from the local title index when it knows this exact title; otherwise ask TMDb
+    if LOCAL_SEARCH_ENABLED:
+        rows, confidence = tmdb.search_local(query)
+        if rows and confidence >= EXACT_TITLE:
+            show_search_results(update.message, {'results': rows, 'media_results': rows}, query)
+            return
     
+    # Search TMDb API
+    if async_tmdb:
+        event_loop.submit(_run_async(async_tmdb.search_multi(query), show_search_results, update.message, query))
+    else:
+        show_search_results(update.message, tmdb.search_multi(query), query)
+
+def format_result(item) -> str:
+    """Format a search row as '🎬 Title (Year)'."""
+    title = item.get('title', item.get('name', 'Unknown'))
+    year = ""
+    if item['media_type'] == 'movie' and item.get('release_date'):
+        year = f" ({item['release_date'][:4]})"
+    elif item['media_type'] == 'tv' and item.get('first_air_date'):
+        year = f" ({item['first_air_date'][:4]})"
+    
+    media_type = "🎬" if item['media_type'] == 'movie' else "📺"
+    return f"{media_type} {title}{year}"
+
+def show_search_results(message, results, query) -> None:
+    """Reply with a keyboard of the movie and TV results of a search."""
     if not results or not results.get('results'):
-        update.message.reply_text(f"No results found for '{query}'. Please try another search.")
+        message.reply_text(f"No results found for '{query}'. Please try another search.")
         return
     
-    # Filter results to only include movies and TV shows (not people)
-    media_results = [item for item in results['results'] if item['media_type'] in ['movie', 'tv']][:10]
+    # Movie and TV rows (not people), filtered once when the search was cached
+    media_results = results['media_results']
     
     if not media_results:
-        update.message.reply_text(f"No movies or TV shows found for '{query}'. Please try another search.")
+        message.reply_text(f"No movies or TV shows found for '{query}'. Please try another search.")
         return
     
     # Create inline keyboard with search results
     keyboard = []
     for item in media_results:
-        title = item.get('title', item.get('name', 'Unknown'))
-        year = ""
-        if item['media_type'] == 'movie' and item.get('release_date'):
-            year = f" ({item['release_date'][:4]})"
-        elif item['media_type'] == 'tv' and item.get('first_air_date'):
-            year = f" ({item['first_air_date'][:4]})"
-        
-        media_type = "🎬" if item['media_type'] == 'movie' else "📺"
-        button_text = f"{media_type} {title}{year}"
-        callback_data = f"details_{item['media_type']}_{item['id']}_en-US"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
+        callback_data = callbacks.encode("details", item['media_type'], item['id'], "en-US")
+        keyboard.append([InlineKeyboardButton(format_result(item), callback_data=callback_data)])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
-    update.message.reply_text(f"Found {len(media_results)} results for '{query}':", reply_markup=reply_markup)
+    message.reply_text(f"Found {len(media_results)} results for '{query}':", reply_markup=reply_markup)
+    
+    # Warm the details cache for the results the user is most likely to tap
+    prefetcher.prefetch(message.chat_id, [(item['media_type'], item['id']) for item in media_results])
+
+def handle_inline_query(update: Update, context: CallbackContext) -> None:
+    """Suggest titles as the user types @bot <title>, answered from the local index only."""
+    text = update.inline_query.query.strip()
+    if len(text) < 2:
+        update.inline_query.answer([], cache_time=5)
+        return
+    
+    rows, _ = tmdb.search_local(text, limit=INLINE_RESULTS_LIMIT, prefix=True)
+    results = []
+    for item in rows:
+        title = format_result(item)
+        results.append(InlineQueryResultArticle(
+            id=f"{item['media_type']}_{item['id']}",
+            title=title,
+            input_message_content=InputTextMessageContent(title),
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton("ℹ️ Show Details", callback_data=callbacks.encode("details", item['media_type'], item['id'], "en-US"))
+            ]])
+        ))
+    update.inline_query.answer(results, cache_time=30)
 
-def handle_details(update: Update, context: CallbackContext) -> None:
+@callback_route("details")
+def handle_details(update: Update, context: CallbackContext, media_type: str, media_id: str, language: str) -> None:
     """Handle button press to show media details."""
     query = update.callback_query
     query.answer()
     
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 4 or data_parts[0] != 'details':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
-    
-    _, media_type, media_id, language = data_parts
+    if update.effective_chat:
+        prefetcher.record_tap(update.effective_chat.id, media_type, media_id, language)
     
     # Get detailed information
-    details = tmdb.get_details(media_type, media_id, language)
-    if not details:
-        query.edit_message_text("Failed to fetch details. Please try again.")
-        return
-    
+    with_details(query, show_details, media_type, media_id, language)
+
+def render_details(details, media_type, media_id, language) -> RenderedPage:
+    """Build the details card (text and button specs) for a fetched movie or TV show."""
     # Get title and basic info
     title = details.get('title', details.get('name', 'Unknown'))
     
@@ -132,104 +541,117 @@ def handle_details(update: Update, context: CallbackContext) -> None:
             f"📝 Overview: {details.get('overview', 'No overview available.')}"
         )
     
-    # Create keyboard for images and language options
+    # Keyboard rows of button specs for images and language options
     keyboard = []
     
     # Current language name
     current_lang_name = "English" if language == "en-US" else language
-    
+
+    image_index = tmdb.image_index(details)
+
     # Poster button (if available) - Portrait (High-Res by default)
-    posters = details.get('images', {}).get('posters', [])
+    posters = image_index.posters.images
     if details.get('poster_path'):
         poster_url = tmdb.get_poster_url(details['poster_path'], 'original')  # High-Res by default
         keyboard.append([
-            InlineKeyboardButton(f"🖼️ Portrait Poster ({current_lang_name})", url=poster_url)
+            (f"🖼️ Portrait Poster ({current_lang_name})", None, poster_url)
         ])
     elif posters:
         # If main poster not available but there are posters in images
         poster = posters[0]
-        poster_url = tmdb.get_poster_url(poster['file_path'], 'original')  # High-Res by default
+        poster_url = tmdb.get_poster_url(poster.file_path, 'original')  # High-Res by default
         keyboard.append([
-            InlineKeyboardButton(f"🖼️ Portrait Poster ({current_lang_name})", url=poster_url)
+            (f"🖼️ Portrait Poster ({current_lang_name})", None, poster_url)
         ])
     else:
-        keyboard.append([InlineKeyboardButton("❌ No Portrait Poster Available", callback_data="no_action")])
+        keyboard.append([("❌ No Portrait Poster Available", "no_action", ())])
         
     # View All Posters button (if there are multiple posters)
     if len(posters) > 1:
         keyboard.append([
-            InlineKeyboardButton(f"🖼️ View All {len(posters)} Posters", callback_data=f"posters_{media_type}_{media_id}_{language}")
+            (f"🖼️ View All {len(posters)} Posters", "posters", (media_type, media_id, language))
         ])
     
     # Backdrop button (if available) - Landscape (High-Res by default)
-    backdrops = details.get('images', {}).get('backdrops', [])
+    backdrops = image_index.backdrops.images
     if details.get('backdrop_path'):
         backdrop_url = tmdb.get_backdrop_url(details['backdrop_path'], 'original')  # High-Res by default
         keyboard.append([
-            InlineKeyboardButton(f"🌆 Landscape Poster ({current_lang_name})", url=backdrop_url)
+            (f"🌆 Landscape Poster ({current_lang_name})", None, backdrop_url)
         ])
     elif backdrops:
         # If main backdrop not available but there are backdrops in images
         backdrop = backdrops[0]
-        backdrop_url = tmdb.get_backdrop_url(backdrop['file_path'], 'original')  # High-Res by default
+        backdrop_url = tmdb.get_backdrop_url(backdrop.file_path, 'original')  # High-Res by default
         keyboard.append([
-            InlineKeyboardButton(f"🌆 Landscape Poster ({current_lang_name})", url=backdrop_url)
+            (f"🌆 Landscape Poster ({current_lang_name})", None, backdrop_url)
         ])
     else:
-        keyboard.append([InlineKeyboardButton("❌ No Landscape Poster Available", callback_data="no_action")])
+        keyboard.append([("❌ No Landscape Poster Available", "no_action", ())])
         
     # View All Backdrops button (if there are multiple backdrops)
     if len(backdrops) > 1:
         keyboard.append([
-            InlineKeyboardButton(f"🖼️ View All {len(backdrops)} Backdrops", callback_data=f"backdrops_{media_type}_{media_id}_{language}")
+            (f"🖼️ View All {len(backdrops)} Backdrops", "backdrops", (media_type, media_id, language))
         ])
         
     # Logo button (if available) - High-Res by default
-    all_logos = details.get('images', {}).get('logos', [])
-    logos = [logo for logo in all_logos if logo.get('iso_639_1') == language[:2] or not logo.get('iso_639_1')]
+    all_logos = image_index.logos.images
+    # First logo for the current language or without language specification
+    logo = image_index.logos.first_for_language(language)
     
-    if logos:
-        logo = logos[0]  # Get the first logo for the current language or without language specification
-        logo_url = tmdb.get_logo_url(logo['file_path'], 'original')  # High-Res by default
+    if logo:
+        logo_url = tmdb.get_logo_url(logo.file_path, 'original')  # High-Res by default
         keyboard.append([
-            InlineKeyboardButton(f"🎥 Logo ({current_lang_name})", url=logo_url)
+            (f"🎥 Logo ({current_lang_name})", None, logo_url)
         ])
     else:
-        keyboard.append([InlineKeyboardButton("❌ No Logo Available", callback_data="no_action")])
+        keyboard.append([("❌ No Logo Available", "no_action", ())])
         
     # View All Logos button (if there are multiple logos)
     if len(all_logos) > 1:
         keyboard.append([
-            InlineKeyboardButton(f"🎥 View All {len(all_logos)} Logos", callback_data=f"logos_{media_type}_{media_id}_{language}")
+            (f"🎥 View All {len(all_logos)} Logos", "logos", (media_type, media_id, language))
         ])
         
     # Send All Images button
     keyboard.append([
-        InlineKeyboardButton("📦 Send All Images", callback_data=f"send_all_{media_type}_{media_id}_{language}")
+        ("📦 Send All Images", "send_all", (media_type, media_id, language))
     ])
     
     # Language options - removed multiple language support
     
     # Back button
-    keyboard.append([InlineKeyboardButton("🔙 Back to Search", callback_data=f"back_to_search")])
+    keyboard.append([("🔙 Back to Search", "back_to_search", ())])
     
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return RenderedPage(info_text, keyboard, 'Markdown', None)
+
+def show_details(query, details, media_type, media_id, language) -> None:
+    """Render the details card for a fetched movie or TV show."""
+    if not details:
+        query.edit_message_text("Failed to fetch details. Please try again.")
+        return
+    
+    # The card is built once per details payload; a refreshed payload gets a new card
+    card = details_cards.get(details, lambda details: render_details(details, media_type, media_id, language))
+    reply_markup = build_keyboard(card.buttons)
     
     # Send or edit message with details
     try:
         query.edit_message_text(
-            text=info_text,
+            text=card.text,
             reply_markup=reply_markup,
-            parse_mode='Markdown'
+            parse_mode=card.parse_mode
         )
     except Exception as e:
         logger.error(f"Error editing message: {e}")
         # If editing fails (e.g., due to identical content), try without parse_mode
         query.edit_message_text(
-            text=info_text,
+            text=card.text,
             reply_markup=reply_markup
         )
 
+@callback_route("back_to_search")
 def handle_back_to_search(update: Update, context: CallbackContext) -> None:
     """Handle the back button to return to search."""
     query = update.callback_query
@@ -239,26 +661,23 @@ def handle_back_to_search(update: Update, context: CallbackContext) -> None:
         "Please use /tmdb <movie or show name> to search again.",
     )
 
+@callback_route("no_action")
 def handle_no_action(update: Update, context: CallbackContext) -> None:
     """Handle buttons that should not perform any action."""
     query = update.callback_query
     query.answer("No action available")
 
-def handle_send_all_images(update: Update, context: CallbackContext) -> None:
+@callback_route("send_all")
+def handle_send_all_images(update: Update, context: CallbackContext, media_type: str, media_id: str, language: str) -> None:
     """Handle the send all images button."""
     query = update.callback_query
     query.answer("Preparing all images...")
     
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 4 or data_parts[0] != 'send':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
-    
-    _, all, media_type, media_id, language = data_parts
-    
     # Get detailed information
-    details = tmdb.get_details(media_type, media_id, language)
+    with_details(query, show_all_images, media_type, media_id, language)
+
+def show_all_images(query, details, media_type, media_id, language) -> None:
+    """Render links to the main images of a fetched title."""
     if not details:
         query.edit_message_text("Failed to fetch details. Please try again.")
         return
@@ -266,6 +685,7 @@ def handle_send_all_images(update: Update, context: CallbackContext) -> None:
     # Get title
     title = details.get('title', details.get('name', 'Unknown'))
     current_lang_name = "English" if language == "en-US" else language
+    image_index = tmdb.image_index(details)
     
     # Create message with all image links
     message = f"🎬 *{title}* - All Images ({current_lang_name})\n\n"
@@ -279,47 +699,45 @@ def handle_send_all_images(update: Update, context: CallbackContext) -> None:
     if details.get('backdrop_path'):
         backdrop_url = tmdb.get_backdrop_url(details['backdrop_path'], 'original')  # High-res by default
         message += f"🌆 *Landscape Poster*:\n{backdrop_url}\n\n"
-    elif details.get('images', {}).get('backdrops'):
-        backdrop = details['images']['backdrops'][0]
-        backdrop_url = tmdb.get_backdrop_url(backdrop['file_path'], 'original')  # High-res by default
+    elif image_index.backdrops.images:
+        backdrop = image_index.backdrops.images[0]
+        backdrop_url = tmdb.get_backdrop_url(backdrop.file_path, 'original')  # High-res by default
         message += f"🌆 *Landscape Poster*:\n{backdrop_url}\n\n"
     
     # Add logo links (high-res by default)
-    logos = details.get('images', {}).get('logos', [])
-    logos = [logo for logo in logos if logo.get('iso_639_1') == language[:2] or not logo.get('iso_639_1')]
+    logo = image_index.logos.first_for_language(language)
     
-    if logos:
-        logo = logos[0]
-        logo_url = tmdb.get_logo_url(logo['file_path'], 'original')  # High-res by default
+    if logo:
+        logo_url = tmdb.get_logo_url(logo.file_path, 'original')  # High-res by default
         message += f"🎬 *Logo*:\n{logo_url}\n\n"
     
     # Add buttons for all image types and back
     keyboard = []
     
     # Add view all posters button if there are multiple posters
-    posters = details.get('images', {}).get('posters', [])
+    posters = image_index.posters.images
     if len(posters) > 1:
         keyboard.append([
-            InlineKeyboardButton(f"🖼️ View All {len(posters)} Posters", callback_data=f"posters_{media_type}_{media_id}_{language}")
+            InlineKeyboardButton(f"🖼️ View All {len(posters)} Posters", callback_data=callbacks.encode("posters", media_type, media_id, language))
         ])
     
     # Add view all backdrops button if there are multiple backdrops
-    backdrops = details.get('images', {}).get('backdrops', [])
+    backdrops = image_index.backdrops.images
     if len(backdrops) > 1:
         keyboard.append([
-            InlineKeyboardButton(f"🌆 View All {len(backdrops)} Backdrops", callback_data=f"backdrops_{media_type}_{media_id}_{language}")
+            InlineKeyboardButton(f"🌆 View All {len(backdrops)} Backdrops", callback_data=callbacks.encode("backdrops", media_type, media_id, language))
         ])
         
     # Add view all logos button if there are multiple logos
-    logos = details.get('images', {}).get('logos', [])
+    logos = image_index.logos.images
     if len(logos) > 1:
         keyboard.append([
-            InlineKeyboardButton(f"🎥 View All {len(logos)} Logos", callback_data=f"logos_{media_type}_{media_id}_{language}")
+            InlineKeyboardButton(f"🎥 View All {len(logos)} Logos", callback_data=callbacks.encode("logos", media_type, media_id, language))
         ])
     
     # Back button
     keyboard.append([
-        InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")
+        InlineKeyboardButton("🔙 Back to Details", callback_data=callbacks.encode("details", media_type, media_id, language))
     ])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
@@ -338,610 +756,239 @@ def handle_send_all_images(update: Update, context: CallbackContext) -> None:
             text="Failed to send all images. Please try again.",
             reply_markup=reply_markup
         )
-
-def handle_backdrops(update: Update, context: CallbackContext) -> None:
-    """Handle the view all backdrops button."""
-    query = update.callback_query
-    query.answer("Loading all backdrops...")
-    
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 4 or data_parts[0] != 'backdrops':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
     
-    _, media_type, media_id, language = data_parts
-    
-    # Get detailed information
-    details = tmdb.get_details(media_type, media_id, language)
-    if not details:
-        query.edit_message_text("Failed to fetch details. Please try again.")
-        return
-    
-    # Get title
-    title = details.get('title', details.get('name', 'Unknown'))
-    
-    # Get all backdrops
-    backdrops = details.get('images', {}).get('backdrops', [])
-    if not backdrops:
-        query.edit_message_text(f"No backdrops found for {title}.")
-        return
-    
-    # Group backdrops by language
-    backdrops_by_lang = {}
-    for backdrop in backdrops:
-        lang_code = backdrop.get('iso_639_1') or 'null'  # Use 'null' for backdrops without language
-        if lang_code not in backdrops_by_lang:
-            backdrops_by_lang[lang_code] = []
-        backdrops_by_lang[lang_code].append(backdrop)
-    
-    # Create message with backdrop count by language
-    message = f"🌆 *{title}* - All Backdrops\n\n"
-    
-    # Create keyboard with language options for backdrops
-    keyboard = []
-    
-    # Add buttons for each language with backdrops
-    for lang_code, lang_backdrops in backdrops_by_lang.items():
-        if lang_code == 'null':
-            lang_name = "No Language"
-        else:
-            lang_name = "English" if lang_code == "en" else lang_code
-        
-        # Button to view all backdrops in this language
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{lang_name} ({len(lang_backdrops)} backdrops)", 
-                callback_data=f"lang_backdrops_{media_type}_{media_id}_{language}_{lang_code}_1"  # Add page number 1
-            )
-        ])
-        
-        # Add to message
-        message += f"• {lang_name}: {len(lang_backdrops)} backdrops\n"
-    
-    # Back button
-    keyboard.append([InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Send message with backdrop language options
-    try:
-        query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
-        )
-    except Exception as e:
-        logger.error(f"Error showing backdrops: {e}")
-        query.edit_message_text(
-            text="Failed to show backdrops. Please try again.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")
-            ]])
-        )
+    # Album mode also uploads the images themselves to the chat, in the background
+    if album_sender and query.message:
+        urls = album_urls(details, language)
+        if urls:
+            album_sender.submit(query.bot, query.message.chat_id, urls, caption=title)
 
-def handle_lang_backdrops(update: Update, context: CallbackContext) -> None:
-    """Handle showing backdrops for a specific language with pagination."""
-    query = update.callback_query
-    query.answer("Loading backdrops...")
-    
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 6 or data_parts[0] != 'lang':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
-    
-    # Check if page number is included
-    page = 1
-    if len(data_parts) >= 7 and data_parts[6].isdigit():
-        page = int(data_parts[6])
-    
-    _, _, media_type, media_id, base_language, backdrop_lang_code = data_parts[:6]
-    
-    # Get detailed information
-    details = tmdb.get_details(media_type, media_id, base_language)
-    if not details:
-        query.edit_message_text("Failed to fetch details. Please try again.")
-        return
-    
-    # Get title
-    title = details.get('title', details.get('name', 'Unknown'))
-    
-    # Get all backdrops for the selected language
-    all_backdrops = details.get('images', {}).get('backdrops', [])
-    if backdrop_lang_code == 'null':
-        backdrops = [b for b in all_backdrops if not b.get('iso_639_1')]
-        lang_name = "No Language"
-    else:
-        backdrops = [b for b in all_backdrops if b.get('iso_639_1') == backdrop_lang_code]
-        lang_name = "English" if backdrop_lang_code == "en" else backdrop_lang_code
-    
-    if not backdrops:
-        query.edit_message_text(f"No backdrops found for {title} in {lang_name}.")
-        return
-    
-    # Pagination settings
-    backdrops_per_page = 5
-    total_pages = (len(backdrops) + backdrops_per_page - 1) // backdrops_per_page  # Ceiling division
-    
-    # Ensure page is within valid range
-    if page < 1:
-        page = 1
-    elif page > total_pages:
-        page = total_pages
-    
-    # Get backdrops for current page
-    start_idx = (page - 1) * backdrops_per_page
-    end_idx = min(start_idx + backdrops_per_page, len(backdrops))
-    current_backdrops = backdrops[start_idx:end_idx]
-    
-    # Create message with backdrop links for current page
-    message = f"🌆 *{title}* - {lang_name} Backdrops (Page {page}/{total_pages})\n\n"
-    
-    # Add backdrop links for current page (high-res by default)
-    for i, backdrop in enumerate(current_backdrops):
-        backdrop_url = tmdb.get_backdrop_url(backdrop['file_path'], 'original')  # High-res by default
-        message += f"*Backdrop {start_idx + i + 1}*:\n{backdrop_url}\n\n"
-    
-    # Create navigation buttons
-    keyboard = []
-    
-    # Add pagination buttons
-    nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(
-            "⬅️ Previous", 
-            callback_data=f"lang_backdrops_{media_type}_{media_id}_{base_language}_{backdrop_lang_code}_{page-1}"
-        ))
-    
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(
-            "Next ➡️", 
-            callback_data=f"lang_backdrops_{media_type}_{media_id}_{base_language}_{backdrop_lang_code}_{page+1}"
-        ))
-    
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-    
-    # Back buttons
-    keyboard.append([InlineKeyboardButton("🔙 Back to All Backdrops", callback_data=f"backdrops_{media_type}_{media_id}_{base_language}")])
-    keyboard.append([InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{base_language}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Send message with backdrop links
-    try:
-        query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown',
-            disable_web_page_preview=True  # Disable preview to avoid showing just one image
-        )
-    except Exception as e:
-        logger.error(f"Error showing language backdrops: {e}")
-        query.edit_message_text(
-            text="Failed to show backdrops. Please try again.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{base_language}")
-            ]])
-        )
+def album_urls(details, language) -> list:
+    """URLs of the title's images in language or without a language, posters first."""
+    image_index = tmdb.image_index(details)
+    urls = []
+    for image_type in IMAGE_TYPES:
+        image_url = getattr(tmdb, GALLERY_TYPES[image_type].url_method)
+        group = image_index.group(image_type)
+        for lang_code in dict.fromkeys((language[:2], NO_LANGUAGE)):
+            urls.extend(image_url(image.file_path, SEND_ALL_IMAGE_SIZE) for image in group.languages.get(lang_code, ()))
+    return urls[:SEND_ALL_MAX_IMAGES]
 
-def handle_posters(update: Update, context: CallbackContext) -> None:
-    """Handle the view all posters button."""
+def handle_gallery(image_type: str, update: Update, context: CallbackContext, media_type: str, media_id: str, language: str, lang_code: str = None, page: str = "1") -> None:
+    """Handle the poster, backdrop and logo galleries: the language overview or one language page."""
     query = update.callback_query
-    query.answer("Loading all posters...")
+    query.answer(f"Loading all {image_type}..." if lang_code is None else f"Loading {image_type}...")
     
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 4 or data_parts[0] != 'posters':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
-    
-    _, media_type, media_id, language = data_parts
+    page = int(page) if page.isdigit() else 1
     
     # Get detailed information
-    details = tmdb.get_details(media_type, media_id, language)
+    with_details(query, show_gallery, media_type, media_id, language, image_type, lang_code, page)
+
+def show_gallery(query, details, media_type, media_id, language, image_type, lang_code, page) -> None:
+    """Render a gallery page of a fetched title."""
     if not details:
         query.edit_message_text("Failed to fetch details. Please try again.")
         return
     
-    # Get title
-    title = details.get('title', details.get('name', 'Unknown'))
-    
-    # Get all posters
-    posters = details.get('images', {}).get('posters', [])
-    if not posters:
-        query.edit_message_text(f"No posters found for {title}.")
+    rendered = galleries.render(details, image_type, media_type, media_id, language, lang_code, page)
+    if rendered.buttons is None:
+        query.edit_message_text(rendered.text)
         return
     
-    # Group posters by language
-    posters_by_lang = {}
-    for poster in posters:
-        lang_code = poster.get('iso_639_1') or 'null'  # Use 'null' for posters without language
-        if lang_code not in posters_by_lang:
-            posters_by_lang[lang_code] = []
-        posters_by_lang[lang_code].append(poster)
-    
-    # Create message with poster count by language
-    message = f"🖼️ *{title}* - All Posters\n\n"
-    
-    # Create keyboard with language options for posters
-    keyboard = []
-    
-    # Add buttons for each language with posters
-    for lang_code, lang_posters in posters_by_lang.items():
-        if lang_code == 'null':
-            lang_name = "No Language"
-        else:
-            lang_name = "English" if lang_code == "en" else lang_code
-        
-        # Button to view all posters in this language
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{lang_name} ({len(lang_posters)} posters)", 
-                callback_data=f"lang_posters_{media_type}_{media_id}_{language}_{lang_code}_1"  # Add page number 1
-            )
-        ])
-        
-        # Add to message
-        message += f"• {lang_name}: {len(lang_posters)} posters\n"
-    
-    # Back button
-    keyboard.append([InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Send message with poster language options
     try:
         query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
+            text=rendered.text,
+            reply_markup=build_keyboard(rendered.buttons),
+            parse_mode=rendered.parse_mode,
+            disable_web_page_preview=rendered.disable_web_page_preview
         )
     except Exception as e:
-        logger.error(f"Error showing posters: {e}")
+        logger.error(f"Error showing {image_type}: {e}")
         query.edit_message_text(
-            text="Failed to show posters. Please try again.",
+            text=f"Failed to show {image_type}. Please try again.",
             reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")
+                InlineKeyboardButton("🔙 Back to Details", callback_data=callbacks.encode("details", media_type, media_id, language))
             ]])
         )
 
-def handle_lang_posters(update: Update, context: CallbackContext) -> None:
-    """Handle showing posters for a specific language with pagination."""
+# Both gallery routes of every image type share one handler
+for image_type in IMAGE_TYPES:
+    callback_route(image_type)(partial(handle_gallery, image_type))
+    callback_route(f"lang_{image_type}")(partial(handle_gallery, image_type))
+
+def handle_callback_query(update: Update, context: CallbackContext) -> None:
+    """Route callback queries to appropriate handlers.
+
+    Runs on the dispatcher thread: admission is decided here, so shed taps are answered
+    at once, and only admitted callbacks are queued for the dispatcher's worker pool.
+    """
     query = update.callback_query
-    query.answer("Loading posters...")
+    route, args = callbacks.decode(query.data)
     
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 7 or data_parts[0] != 'lang':
-        query.edit_message_text("Invalid selection. Please try again.")
+    handler = CALLBACK_HANDLERS.get(route)
+    if handler is None:
+        query.answer("Unknown action")
         return
-    
-    _, image_type, media_type, media_id, base_language, poster_lang_code, page = data_parts
-    page = int(page)
-    
-    # Get detailed information
-    details = tmdb.get_details(media_type, media_id, base_language)
-    if not details:
-        query.edit_message_text("Failed to fetch details. Please try again.")
+    if args is None:
+        query.answer("This button has expired. Please search again.", show_alert=True)
         return
     
-    # Get title
-    title = details.get('title', details.get('name', 'Unknown'))
-    
-    # Get all posters for the selected language
-    all_posters = details.get('images', {}).get('posters', [])
-    if poster_lang_code == 'null':
-        posters = [p for p in all_posters if not p.get('iso_639_1')]
-        lang_name = "No Language"
+    # Buttons on inline results have no chat message; limit those per user and inline message
+    if query.message:
+        chat_id, message_id = query.message.chat_id, query.message.message_id
     else:
-        posters = [p for p in all_posters if p.get('iso_639_1') == poster_lang_code]
-        lang_name = "English" if poster_lang_code == "en" else poster_lang_code
-    
-    if not posters:
-        query.edit_message_text(f"No posters found for {title} in {lang_name}.")
+        chat_id, message_id = query.from_user.id, query.inline_message_id
+    ticket, reason = admission.admit(route, chat_id, message_id, query.data)
+    if reason is not None:
+        # Shed immediately instead of queueing behind the work this chat already has running
+        query.answer(SHED_MESSAGES[reason])
         return
     
-    # Pagination settings
-    posters_per_page = 5
-    total_pages = (len(posters) + posters_per_page - 1) // posters_per_page  # Ceiling division
-    
-    # Ensure page is within valid range
-    if page < 1:
-        page = 1
-    elif page > total_pages:
-        page = total_pages
-    
-    # Get posters for current page
-    start_idx = (page - 1) * posters_per_page
-    end_idx = min(start_idx + posters_per_page, len(posters))
-    current_posters = posters[start_idx:end_idx]
-    
-    # Create message with poster links for current page
-    message = f"🖼️ *{title}* - {lang_name} Posters (Page {page}/{total_pages})\n\n"
-    
-    # Add poster links for current page (high-res by default)
-    for i, poster in enumerate(current_posters):
-        poster_url = tmdb.get_poster_url(poster['file_path'], 'original')  # High-res by default
-        message += f"*Poster {start_idx + i + 1}*:\n{poster_url}\n\n"
-    
-    # Create navigation buttons
-    keyboard = []
-    
-    # Add pagination buttons
-    nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(
-            "⬅️ Previous", 
-            callback_data=f"lang_posters_{media_type}_{media_id}_{base_language}_{poster_lang_code}_{page-1}"
-        ))
-    
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(
-            "Next ➡️", 
-            callback_data=f"lang_posters_{media_type}_{media_id}_{base_language}_{poster_lang_code}_{page+1}"
-        ))
-    
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-    
-    # Back buttons
-    keyboard.append([InlineKeyboardButton("🔙 Back to All Posters", callback_data=f"posters_{media_type}_{media_id}_{base_language}")])
-    keyboard.append([InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{base_language}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Send message with poster links
+    context.dispatcher.run_async(run_callback, update, context, route, handler, args, ticket, update=update)
+
+def run_callback(update: Update, context: CallbackContext, route, handler, args, ticket) -> None:
+    """Run an admitted callback on a dispatcher worker and release its admission ticket"""
+    admission.activate(ticket)
     try:
-        query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown',
-            disable_web_page_preview=True  # Disable preview to avoid showing just one image
-        )
-    except Exception as e:
-        logger.error(f"Error showing language posters: {e}")
-        query.edit_message_text(
-            text="Failed to show posters. Please try again.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{base_language}")
-            ]])
-        )
+        if admission.is_stale(ticket):
+            # A newer tap on this message was admitted while this one waited for a worker
+            update.callback_query.answer()
+            return
+        with timed_handler(route):
+            handler(update, context, *args)
+    finally:
+        # Work handed to the event loop detached the ticket and releases it when it finishes
+        if ticket is not None and admission.current() is ticket:
+            ticket.release()
+        admission.activate(None)
 
-def handle_logos(update: Update, context: CallbackContext) -> None:
-    """Handle the view all logos button."""
-    query = update.callback_query
-    query.answer("Loading all logos...")
-    
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 4 or data_parts[0] != 'logos':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
-    
-    _, media_type, media_id, language = data_parts
-    
-    # Get detailed information
-    details = tmdb.get_details(media_type, media_id, language)
-    if not details:
-        query.edit_message_text("Failed to fetch details. Please try again.")
-        return
-    
-    # Get title
-    title = details.get('title', details.get('name', 'Unknown'))
-    
-    # Get all logos
-    logos = details.get('images', {}).get('logos', [])
-    if not logos:
-        query.edit_message_text(f"No logos found for {title}.")
-        return
-    
-    # Group logos by language
-    logos_by_lang = {}
-    for logo in logos:
-        lang_code = logo.get('iso_639_1') or 'null'  # Use 'null' for logos without language
-        if lang_code not in logos_by_lang:
-            logos_by_lang[lang_code] = []
-        logos_by_lang[lang_code].append(logo)
-    
-    # Create message with logo count by language
-    message = f"🎥 *{title}* - All Logos\n\n"
+def setup_dispatcher(dispatcher: Dispatcher) -> None:
+    """Register the bot's handlers and start warming the caches (runs in every shard process)"""
+    # Serve popular titles from the persistent cache right after a restart, without delaying startup
+    threading.Thread(target=warm_cache, name="warm-cache", daemon=True).start()
+
+    # Register command handlers
+    dispatcher.add_handler(CommandHandler("start", instrumented("start", start)))
+    dispatcher.add_handler(CommandHandler("tmdb", instrumented("tmdb", tmdb_search)))
+    # Also register the alternative command as mentioned in requirements
+    dispatcher.add_handler(CommandHandler("trndb", instrumented("trndb", tmdb_search)))
     
-    # Create keyboard with language options for logos
-    keyboard = []
+    # Register callback query handler. Admitted callbacks run on the dispatcher's worker pool so a slow
+    # gallery doesn't hold up every other chat; admission control keeps any one chat from taking the whole pool.
+    dispatcher.add_handler(CallbackQueryHandler(handle_callback_query))
     
-    # Add buttons for each language with logos
-    for lang_code, lang_logos in logos_by_lang.items():
-        if lang_code == 'null':
-            lang_name = "No Language"
-        else:
-            lang_name = "English" if lang_code == "en" else lang_code
-        
-        # Button to view all logos in this language
-        keyboard.append([
-            InlineKeyboardButton(
-                f"{lang_name} ({len(lang_logos)} logos)", 
-                callback_data=f"lang_logos_{media_type}_{media_id}_{language}_{lang_code}_1"  # Add page number 1
+    # As-you-type suggestions in inline mode (enable inline mode for the bot in @BotFather)
+    dispatcher.add_handler(InlineQueryHandler(instrumented("inline_query", handle_inline_query)))
+
+def warm_cache() -> None:
+    """Load the most recently used TMDb responses from the disk cache"""
+    with startup.phase("warm_cache"):
+        warmed = tmdb.warm_cache(TMDB_DISK_CACHE_WARM)
+    if warmed:
+        logger.info(f"Warmed TMDb cache with {warmed} entries from disk")
+
+def create_updater(bot: Bot) -> Updater:
+    """Create an Updater whose dispatcher consumes the bounded update queue"""
+    job_queue = JobQueue()
+    dispatcher = Dispatcher(bot, update_queue, workers=DISPATCHER_WORKERS, job_queue=job_queue, use_context=True)
+    job_queue.set_dispatcher(dispatcher)
+    # workers defaults to 4, which PTB rejects alongside a dispatcher
+    return Updater(dispatcher=dispatcher, workers=None)
+
+def main() -> None:
+    """Start the bot."""
+    global sharded
+    startup.record("module", time.perf_counter() - _module_started)
+    threading.Thread(target=run_flask, daemon=True).start()
+
+    with startup.phase("dispatcher"):
+        # The connection pool covers every dispatcher worker
+        bot = Bot(TELEGRAM_BOT_TOKEN, request=timed_request(con_pool_size=DISPATCHER_WORKERS + 4))
+        updater = create_updater(bot)
+        dispatcher = updater.dispatcher
+
+        if SHARD_WORKERS > 0:
+            from sharding import ShardedDispatcher
+            
+            # This process only receives updates; handlers run in the shard processes
+            if not TMDB_DISK_CACHE_PATH:
+                logger.warning("SHARD_WORKERS is set without TMDB_DISK_CACHE_PATH, so shards won't share TMDb responses")
+            sharded = ShardedDispatcher(
+                TELEGRAM_BOT_TOKEN, setup_dispatcher, SHARD_WORKERS,
+                dispatcher_workers=DISPATCHER_WORKERS, queue_size=UPDATE_QUEUE_SIZE, request=timed_request
             )
-        ])
-        
-        # Add to message
-        message += f"• {lang_name}: {len(lang_logos)} logos\n"
-    
-    # Back button
-    keyboard.append([InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
+            sharded.start()
+            dispatcher.add_handler(TypeHandler(Update, sharded.forward))
+            # Handlers run in the shards, so /metrics adds in what they record
+            registry.add_source(sharded.metric_snapshots)
+        else:
+            setup_dispatcher(dispatcher)
     
-    # Send message with logo language options
-    try:
-        query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
-        )
-    except Exception as e:
-        logger.error(f"Error showing logos: {e}")
-        query.edit_message_text(
-            text="Failed to show logos. Please try again.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{language}")
-            ]])
-        )
+    # Receive updates through the Flask webhook route, falling back to long polling
+    with startup.phase("connect"):
+        use_webhook = UPDATE_MODE == "webhook" and start_webhook(bot)
+        if use_webhook:
+            start_dispatcher(dispatcher)
+        else:
+            # Start the Bot
+            updater.start_polling()
+    mark_ready()
 
-def handle_lang_logos(update: Update, context: CallbackContext) -> None:
-    """Handle showing logos for a specific language with pagination."""
-    query = update.callback_query
-    query.answer("Loading logos...")
-    
-    # Parse callback data
-    data_parts = query.data.split('_')
-    if len(data_parts) < 7 or data_parts[0] != 'lang':
-        query.edit_message_text("Invalid selection. Please try again.")
-        return
-    
-    _, image_type, media_type, media_id, base_language, logo_lang_code, page = data_parts
-    page = int(page)
-    
-    # Get detailed information
-    details = tmdb.get_details(media_type, media_id, base_language)
-    if not details:
-        query.edit_message_text("Failed to fetch details. Please try again.")
-        return
-    
-    # Get title
-    title = details.get('title', details.get('name', 'Unknown'))
-    
-    # Get all logos for the selected language
-    all_logos = details.get('images', {}).get('logos', [])
-    if logo_lang_code == 'null':
-        logos = [l for l in all_logos if not l.get('iso_639_1')]
-        lang_name = "No Language"
+    if use_webhook:
+        run_webhook(dispatcher)
     else:
-        logos = [l for l in all_logos if l.get('iso_639_1') == logo_lang_code]
-        lang_name = "English" if logo_lang_code == "en" else logo_lang_code
-    
-    if not logos:
-        query.edit_message_text(f"No logos found for {title} in {lang_name}.")
-        return
-    
-    # Pagination settings
-    logos_per_page = 5
-    total_pages = (len(logos) + logos_per_page - 1) // logos_per_page  # Ceiling division
-    
-    # Ensure page is within valid range
-    if page < 1:
-        page = 1
-    elif page > total_pages:
-        page = total_pages
-    
-    # Get logos for current page
-    start_idx = (page - 1) * logos_per_page
-    end_idx = min(start_idx + logos_per_page, len(logos))
-    current_logos = logos[start_idx:end_idx]
-    
-    # Create message with logo links for current page
-    message = f"🎥 *{title}* - {lang_name} Logos (Page {page}/{total_pages})\n\n"
-    
-    # Add logo links for current page (high-res by default)
-    for i, logo in enumerate(current_logos):
-        logo_url = tmdb.get_logo_url(logo['file_path'], 'original')  # High-res by default
-        message += f"*Logo {start_idx + i + 1}*:\n{logo_url}\n\n"
-    
-    # Create navigation buttons
-    keyboard = []
-    
-    # Add pagination buttons
-    nav_buttons = []
-    if page > 1:
-        nav_buttons.append(InlineKeyboardButton(
-            "⬅️ Previous", 
-            callback_data=f"lang_logos_{media_type}_{media_id}_{base_language}_{logo_lang_code}_{page-1}"
-        ))
-    
-    if page < total_pages:
-        nav_buttons.append(InlineKeyboardButton(
-            "Next ➡️", 
-            callback_data=f"lang_logos_{media_type}_{media_id}_{base_language}_{logo_lang_code}_{page+1}"
-        ))
-    
-    if nav_buttons:
-        keyboard.append(nav_buttons)
-    
-    # Back buttons
-    keyboard.append([InlineKeyboardButton("🔙 Back to All Logos", callback_data=f"logos_{media_type}_{media_id}_{base_language}")])
-    keyboard.append([InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{base_language}")])
-    
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Send message with logo links
+        # Run the bot until you press Ctrl-C
+        updater.idle()
+
+    if sharded is not None:
+        sharded.stop()
+
+def mark_ready() -> None:
+    """Flip the readiness signal and report how long startup took"""
+    ready.set()
+    total = startup.finish()
+    breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup.phases.items())
+    logger.info(f"Ready in {total:.2f}s ({breakdown})")
+    if total > startup.budget:
+        logger.warning(f"Startup took {total:.2f}s, over the {startup.budget:.2f}s budget")
+
+def start_webhook(bot: Bot) -> bool:
+    """Register the webhook with Telegram; returns False if polling should be used instead"""
+    global webhook_bot
+    if not WEBHOOK_URL or not WEBHOOK_SECRET:
+        logger.error("UPDATE_MODE=webhook needs WEBHOOK_URL and WEBHOOK_SECRET, falling back to polling")
+        return False
+
+    url = WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH
     try:
-        query.edit_message_text(
-            text=message,
-            reply_markup=reply_markup,
-            parse_mode='Markdown',
-            disable_web_page_preview=True  # Disable preview to avoid showing just one image
-        )
-    except Exception as e:
-        logger.error(f"Error showing language logos: {e}")
-        query.edit_message_text(
-            text="Failed to show logos. Please try again.",
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("🔙 Back to Details", callback_data=f"details_{media_type}_{media_id}_{base_language}")
-            ]])
-        )
+        bot.set_webhook(url=url, secret_token=WEBHOOK_SECRET, max_connections=DISPATCHER_WORKERS * 10)
+    except TelegramError as e:
+        logger.error(f"Error setting webhook to {url}, falling back to polling: {e}")
+        return False
 
-def handle_callback_query(update: Update, context: CallbackContext) -> None:
-    """Route callback queries to appropriate handlers."""
-    query = update.callback_query
-    data = query.data
-    
-    if data.startswith('details_'):
-        handle_details(update, context)
-    elif data.startswith('send_all_'):
-        handle_send_all_images(update, context)
-    elif data.startswith('backdrops_'):
-        handle_backdrops(update, context)
-    elif data.startswith('posters_'):
-        handle_posters(update, context)
-    elif data.startswith('logos_'):
-        handle_logos(update, context)
-    elif data.startswith('lang_backdrops_'):
-        handle_lang_backdrops(update, context)
-    elif data.startswith('lang_posters_'):
-        handle_lang_posters(update, context)
-    elif data.startswith('lang_logos_'):
-        handle_lang_logos(update, context)
-    elif data == 'back_to_search':
-        handle_back_to_search(update, context)
-    elif data == 'no_action':
-        handle_no_action(update, context)
-    else:
-        query.answer("Unknown action")
+    webhook_bot = bot
+    logger.info(f"Receiving updates through webhook {url}")
+    return True
 
-def main() -> None:
-    """Start the bot."""
-    # Create the Updater and pass it your bot's token
-    updater = Updater(TELEGRAM_BOT_TOKEN)
+def start_dispatcher(dispatcher: Dispatcher, timeout: float = 10) -> None:
+    """Start processing queued updates on a background thread and wait until the dispatcher is running"""
+    thread = threading.Thread(target=dispatcher.start, name="dispatcher", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not dispatcher.running and thread.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.01)
 
-    # Get the dispatcher to register handlers
-    dispatcher = updater.dispatcher
+def run_webhook(dispatcher: Dispatcher) -> None:
+    """Keep processing webhook updates until SIGINT/SIGTERM, then stop the dispatcher"""
+    stopping = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopping.set())
 
-    # Register command handlers
-    dispatcher.add_handler(CommandHandler("start", start))
-    dispatcher.add_handler(CommandHandler("tmdb", tmdb_search))
-    # Also register the alternative command as mentioned in requirements
-    dispatcher.add_handler(CommandHandler("trndb", tmdb_search))
-    
-    # Register callback query handler
-    dispatcher.add_handler(CallbackQueryHandler(handle_callback_query))
-    
-    # Start the Bot
-    updater.start_polling()
-    
-    # Run the bot until you press Ctrl-C
-    updater.idle()
+    while not stopping.wait(1):
+        pass
+
+    logger.info("Stopping dispatcher")
+    dispatcher.stop()
 
 if __name__ == '__main__':
     if not TELEGRAM_BOT_TOKEN:
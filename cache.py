@@ -0,0 +1,216 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """Approximate the in-memory footprint of a JSON-like value in bytes"""
+    try:
+        return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False))
+    except (TypeError, ValueError):
+        return 0
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and entry/byte limits.
+
+    With a non-zero grace, expired entries are kept for that many extra seconds so
+    lookup() can serve them as stale while the caller refreshes them. Values derived
+    from a cached value (see DerivedCache) live on its entry and go away with it.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=0, default_ttl=300, grace=0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes  # 0 disables the byte limit
+        self.default_ttl = default_ttl
+        self.grace = grace
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._keys = {}  # id(value) -> key, to find the entry of a value handed out earlier
+        self._derived = {}  # key -> {name: value derived from the entry's value}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        value, stale = self.lookup(key, allow_stale=False)
+        return value
+
+    def lookup(self, key, allow_stale=True):
+        """Return (value, stale); stale values are expired entries still within the grace window"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            value, expires_at, size = entry
+            if expires_at <= now:
+                if now >= expires_at + self.grace:
+                    self._remove(key)
+                    self.expirations += 1
+                elif allow_stale:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    return value, True
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value, False
+
+    def peek(self, key):
+        """Return the cached value without touching counters or recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, key, value, ttl=None, size=None):
+        """Store value under key for ttl seconds, evicting old entries as needed"""
+        if ttl is None:
+            ttl = self.default_ttl
+        if size is None:
+            size = estimate_size(value)
+        if self.max_bytes and size > self.max_bytes:
+            return  # Too large to ever fit; don't flush the whole cache for it
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._keys[id(value)] = key
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._derived.clear()
+            self._bytes = 0
+
+    def derive(self, source, name, build, size=estimate_size):
+        """Return (build(source), cached) for a value this cache holds, built once per entry.
+
+        The derived value is dropped with the entry, so it never outlives (or keeps
+        alive) a payload the byte limit has evicted, and its size(value) is added to
+        the entry's so the byte limit covers it too. Values the cache doesn't hold
+        are built on every call and not kept.
+        """
+        with self._lock:
+            key = self._keys.get(id(source))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry[0] is not source:
+                return build(source), False
+            derived = self._derived.get(key)
+            if derived is not None and name in derived:
+                return derived[name], True
+
+        value = build(source)
+        value_size = size(value)
+        with self._lock:
+            entry = self._entries.get(key)
+            # The entry may have been replaced or evicted while we were building
+            if entry is not None and entry[0] is source:
+                derived = self._derived.setdefault(key, {})
+                if name in derived:
+                    return derived[name], False  # Another thread built it first
+                derived[name] = value
+                self._entries[key] = (source, entry[1], entry[2] + value_size)
+                self._bytes += value_size
+                self._evict()
+        return value, False
+
+    def derived_count(self, name):
+        """Number of values derived under name, or under (name, key) names"""
+        with self._lock:
+            return sum(
+                1 for derived in self._derived.values() for derived_name in derived
+                if derived_name == name or (isinstance(derived_name, tuple) and derived_name[0] == name)
+            )
+
+    def stats(self):
+        """Return a snapshot of the cache counters"""
+        with self._lock:
+            served = self.hits + self.stale_hits
+            lookups = served + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": served / lookups if lookups else 0.0,
+                "stale_hits": self.stale_hits,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        # Caller must hold the lock
+        self._forget(key, self._entries.pop(key))
+
+    def _forget(self, key, entry):
+        # Caller must hold the lock
+        value, _, size = entry
+        if self._keys.get(id(value)) == key:
+            del self._keys[id(value)]
+        self._derived.pop(key, None)
+        self._bytes -= size
+
+    def _evict(self):
+        # Caller must hold the lock; drop least recently used entries first
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            self._forget(*self._entries.popitem(last=False))
+            self.evictions += 1
+
+
+class DerivedCache:
+    """Values derived from payloads held in a TTLCache, such as rendered cards of cached TMDb details.
+
+    Each value is stored on the cache entry of the payload it was built from, so a
+    refreshed payload gets a freshly built value, repeat lookups for the same payload
+    reuse it, and nothing is kept once the payload itself is evicted. size(value)
+    estimates a value's footprint, which counts against the cache's byte limit.
+    """
+
+    def __init__(self, cache, name, size=estimate_size):
+        self.cache = cache
+        self.name = name
+        self.size = size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, build, key=None):
+        """Return build(source), reusing the value built for this exact source object (and key)"""
+        name = self.name if key is None else (self.name, key)
+        value, cached = self.cache.derive(source, name, build, self.size)
+        with self._lock:
+            if cached:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {"entries": self.cache.derived_count(self.name), "hits": hits, "misses": misses}
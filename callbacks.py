@@ -0,0 +1,175 @@
+import hashlib
+import string
+import threading
+import time
+from collections import OrderedDict
+
+# Characters used for route codes and the digests of stored callback arguments (all single-byte)
+ALPHABET = string.digits + string.ascii_letters + "-."
+
+# Marks compact tokens; legacy callback strings always start with a letter
+TOKEN_PREFIX = "~"
+# Separates the arguments carried in a token (never part of ALPHABET, so digests can't start with it)
+ARG_SEPARATOR = ":"
+# Telegram's limit on callback_data
+MAX_CALLBACK_BYTES = 64
+
+# Callback routes and the number of arguments each one takes.
+# Route codes are positions in this table, so only append new routes.
+ROUTE_ARITY = {
+    "details": 3,  # media_type, media_id, language
+    "send_all": 3,
+    "posters": 3,
+    "backdrops": 3,
+    "logos": 3,
+    "lang_posters": 5,  # media_type, media_id, language, image language, page
+    "lang_backdrops": 5,
+    "lang_logos": 5,
+    "back_to_search": 0,
+    "no_action": 0,
+}
+ROUTE_CODES = {route: ALPHABET[index] for index, route in enumerate(ROUTE_ARITY)}
+_ROUTES_BY_CODE = {code: route for route, code in ROUTE_CODES.items()}
+
+
+def encode_int(number):
+    """Encode a non-negative integer in base len(ALPHABET)"""
+    digits = []
+    while True:
+        number, digit = divmod(number, len(ALPHABET))
+        digits.append(ALPHABET[digit])
+        if not number:
+            return "".join(reversed(digits))
+
+
+def parse_legacy(data):
+    """Parse an old-style callback string such as lang_backdrops_movie_12345_en-US_null_7 into (route, args)"""
+    if ROUTE_ARITY.get(data) == 0:
+        return data, ()
+    parts = data.split("_")
+    if parts[0] in ("lang", "send"):
+        route, args = "_".join(parts[:2]), parts[2:]
+    else:
+        route, args = parts[0], parts[1:]
+    if route.startswith("lang_") and len(args) == 4:
+        args.append("1")  # Buttons from before pagination had no page number
+    if ROUTE_ARITY.get(route) != len(args):
+        return None, None
+    return route, tuple(args)
+
+
+class CallbackStateTable:
+    """Encodes button callbacks as short tokens that carry their own arguments.
+
+    A token is TOKEN_PREFIX, one character for the route and the arguments, e.g.
+    "~2:movie:27205:en-US" instead of "posters_movie_27205_en-US", so a button keeps
+    working after a restart and in whichever shard its chat lands on. Arguments
+    that don't fit in Telegram's 64-byte callback_data are kept server-side instead:
+    the token then ends in the base-N digest of (route, args), which maps to the
+    arguments in a bounded, expiring table and, when a store (the SQLite disk
+    cache) is given, on disk, so those buttons survive restarts and resolve in
+    every shard sharing the file. Routes without arguments need neither.
+    """
+
+    def __init__(self, max_entries=50000, ttl=2 * 24 * 3600, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._records = OrderedDict()  # digest -> (route, args, expires_at), oldest issue first
+        self._lock = threading.Lock()
+        self.issued = 0
+        self.reused = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def encode(self, route, *args):
+        """Return the callback token for route(*args); args are passed back as strings"""
+        token = TOKEN_PREFIX + ROUTE_CODES[route]
+        if not args:
+            return token
+        args = tuple(str(arg) for arg in args)
+        inline = token + ARG_SEPARATOR + ARG_SEPARATOR.join(args)
+        if len(inline.encode("utf-8")) <= MAX_CALLBACK_BYTES and not any(ARG_SEPARATOR in arg for arg in args):
+            return inline
+        return token + self._keep(route, args)
+
+    def _keep(self, route, args):
+        # Store the arguments of a token that can't carry them; returns the digest naming them
+        digest = encode_int(int.from_bytes(
+            hashlib.blake2b(repr((route, args)).encode("utf-8"), digest_size=8).digest(), "big"
+        ))
+        now = time.monotonic()
+        with self._lock:
+            record = self._records.get(digest)
+            # Persist new records, and extend stored ones once half their lifetime has passed
+            persist = record is None or record[2] - now < self.ttl / 2
+            if record is None:
+                self.issued += 1
+            else:
+                self._records.move_to_end(digest)
+                self.reused += 1
+            self._records[digest] = (route, args, now + self.ttl)
+            self._evict(now)
+        if persist and self.store is not None:
+            self.store.set(("callback", digest), [route, *args], self.ttl)
+        return digest
+
+    def decode(self, data):
+        """Resolve callback data to (route, args).
+
+        args is None when the route is known but its stored arguments have expired;
+        route is None when the data is not understood. Legacy callback strings are
+        parsed as well.
+        """
+        if not data.startswith(TOKEN_PREFIX):
+            return parse_legacy(data)
+        route = _ROUTES_BY_CODE.get(data[1:2])
+        if route is None:
+            return None, None
+        if ROUTE_ARITY[route] == 0:
+            return route, ()
+        if data[2:3] == ARG_SEPARATOR:
+            args = tuple(data[3:].split(ARG_SEPARATOR))
+            return (route, args) if len(args) == ROUTE_ARITY[route] else (None, None)
+        return route, self._lookup(route, data[2:])
+
+    def _lookup(self, route, digest):
+        now = time.monotonic()
+        with self._lock:
+            record = self._records.get(digest)
+            if record is not None and record[2] > now:
+                return record[1]
+        entry = self.store.get(("callback", digest)) if self.store is not None else None
+        if entry is None or entry[0][0] != route or len(entry[0]) != ROUTE_ARITY[route] + 1:
+            with self._lock:
+                self.expired += 1
+            return None
+        (_, *args), remaining_ttl = entry
+        args = tuple(args)
+        with self._lock:
+            self._records[digest] = (route, args, now + remaining_ttl)
+            self._evict(now)
+        return args
+
+    def _evict(self, now):
+        # Caller must hold the lock; records are ordered by issue time, so expired ones are at the front
+        while self._records:
+            digest, (_, _, expires_at) = next(iter(self._records.items()))
+            if expires_at > now and len(self._records) <= self.max_entries:
+                break
+            del self._records[digest]
+            if expires_at > now:
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._records)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "issued": self.issued,
+                "reused": self.reused,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
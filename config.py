@@ -35,3 +35,116 @@ LOGO_SIZES = {
     "large": "w500",
     "original": "original"
 }
+
+# TMDb response cache
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "2000"))
+TMDB_CACHE_MAX_BYTES = int(os.getenv("TMDB_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Cache lifetime in seconds for each TMDb endpoint
+TMDB_CACHE_TTLS = {
+    "search": int(os.getenv("TMDB_CACHE_TTL_SEARCH", "600")),
+    "details": int(os.getenv("TMDB_CACHE_TTL_DETAILS", "3600")),
+}
+
+# TMDb HTTP connection pool and retry policy
+TMDB_POOL_SIZE = int(os.getenv("TMDB_POOL_SIZE", "16"))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_BACKOFF_FACTOR = float(os.getenv("TMDB_BACKOFF_FACTOR", "0.5"))
+TMDB_REQUEST_TIMEOUT = float(os.getenv("TMDB_REQUEST_TIMEOUT", "10"))
+# Decoder for TMDb response bodies: "auto" (orjson when installed, else json), "json", "orjson",
+# or "streaming" (ijson; keeps only the fields the bot reads while parsing details payloads)
+TMDB_JSON_DECODER = os.getenv("TMDB_JSON_DECODER", "auto").lower()
+
+# Run TMDb lookups for handlers on a shared asyncio event loop instead of blocking dispatcher threads
+ASYNC_HANDLERS = os.getenv("ASYNC_HANDLERS", "false").lower() == "true"
+# Threads used by the async path for blocking Telegram API calls
+ASYNC_IO_WORKERS = int(os.getenv("ASYNC_IO_WORKERS", "16"))
+
+# Client-side TMDb rate limit (requests per second, 0 disables) and burst size
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = int(os.getenv("TMDB_RATE_BURST", "20"))
+
+# Optional persistent TMDb cache (SQLite file); leave TMDB_DISK_CACHE_PATH empty to disable
+TMDB_DISK_CACHE_PATH = os.getenv("TMDB_DISK_CACHE_PATH", "")
+TMDB_DISK_CACHE_MAX_BYTES = int(os.getenv("TMDB_DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Number of recently used payloads loaded into memory at startup
+TMDB_DISK_CACHE_WARM = int(os.getenv("TMDB_DISK_CACHE_WARM", "500"))
+
+# Stale-while-revalidate: expired entries are served for this many extra seconds while refreshed in the background
+TMDB_STALE_GRACE = int(os.getenv("TMDB_STALE_GRACE", "600"))
+TMDB_REFRESH_WORKERS = int(os.getenv("TMDB_REFRESH_WORKERS", "2"))
+# Upper bound of the per-title delay before a background refresh starts
+TMDB_REFRESH_JITTER = float(os.getenv("TMDB_REFRESH_JITTER", "5"))
+
+# Speculative prefetch of details for the top search results (0 disables)
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "0"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+
+# Dedicated cache for normalized search queries
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Local title index built from past search results
+TITLE_INDEX_MAX_TITLES = int(os.getenv("TITLE_INDEX_MAX_TITLES", "50000"))
+# Answer /tmdb from the local index when it has an exact title match, skipping TMDb
+LOCAL_SEARCH_ENABLED = os.getenv("LOCAL_SEARCH_ENABLED", "false").lower() == "true"
+# Maximum suggestions returned for inline queries
+INLINE_RESULTS_LIMIT = int(os.getenv("INLINE_RESULTS_LIMIT", "10"))
+
+# How updates reach the bot: "polling" (default) or "webhook" (served by the Flask app)
+UPDATE_MODE = os.getenv("UPDATE_MODE", "polling").lower()
+# Public base URL of this service, e.g. https://my-bot.onrender.com (the webhook path is appended)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+# Shared secret Telegram sends in X-Telegram-Bot-Api-Secret-Token with every webhook request
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_PATH = "/webhook"
+# Updates waiting for the dispatcher; webhook requests get 503 (and are retried by Telegram) when full
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "1000"))
+DISPATCHER_WORKERS = int(os.getenv("DISPATCHER_WORKERS", "4"))
+# Port of the Flask server (Render provides PORT)
+HTTP_PORT = int(os.getenv("PORT", "10000"))
+# Worker processes that handle updates, sharded by chat (0 handles them in this process).
+# Set it to the number of cores and point TMDB_DISK_CACHE_PATH at a shared file so shards reuse TMDb responses.
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0"))
+# Buttons carry their own arguments; those too long for Telegram's 64 bytes are kept server-side (and in the
+# TMDb disk cache when enabled) for CALLBACK_STATE_TTL seconds, after which the button answers "expired"
+CALLBACK_STATE_MAX_ENTRIES = int(os.getenv("CALLBACK_STATE_MAX_ENTRIES", "50000"))
+CALLBACK_STATE_TTL = int(os.getenv("CALLBACK_STATE_TTL", str(2 * 24 * 3600)))
+# "Send All Images": "links" edits the message with image links; "album" also uploads the images as albums
+SEND_ALL_MODE = os.getenv("SEND_ALL_MODE", "links").lower()
+SEND_ALL_MAX_IMAGES = int(os.getenv("SEND_ALL_MAX_IMAGES", "30"))
+SEND_ALL_IMAGE_SIZE = os.getenv("SEND_ALL_IMAGE_SIZE", "large")
+# Memory used by all album uploads together (downloaded images plus the upload request
+# bodies, two copies per image), and parallel image downloads
+ALBUM_MAX_BYTES = int(os.getenv("ALBUM_MAX_BYTES", str(32 * 1024 * 1024)))
+ALBUM_FETCH_CONCURRENCY = int(os.getenv("ALBUM_FETCH_CONCURRENCY", "4"))
+
+# Image proxy: serves TMDb images at /img/<size>/<file> from a local disk cache (empty dir disables it)
+IMAGE_PROXY_DIR = os.getenv("IMAGE_PROXY_DIR", "")
+IMAGE_PROXY_MAX_BYTES = int(os.getenv("IMAGE_PROXY_MAX_BYTES", str(512 * 1024 * 1024)))
+# TMDb size variants the proxy will fetch (defaults to every size the bot knows about)
+IMAGE_PROXY_SIZES = os.getenv(
+    "IMAGE_PROXY_SIZES",
+    ",".join(sorted({*POSTER_SIZES.values(), *BACKDROP_SIZES.values(), *LOGO_SIZES.values()}))
+).split(",")
+IMAGE_PROXY_MAX_AGE = int(os.getenv("IMAGE_PROXY_MAX_AGE", str(30 * 24 * 3600)))
+# Public base URL of the proxy, e.g. https://my-bot.onrender.com/img; when set, image links use it
+IMAGE_PROXY_URL = os.getenv("IMAGE_PROXY_URL", "")
+# Cold-start budget; a warning is logged when the bot takes longer than this to become ready
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+
+# Admission control for callback buttons: callbacks per chat in flight at once, and the window (seconds)
+# in which repeated taps on the same button of the same message are dropped
+CALLBACK_MAX_PER_CHAT = int(os.getenv("CALLBACK_MAX_PER_CHAT", "2"))
+CALLBACK_DEBOUNCE_SECONDS = float(os.getenv("CALLBACK_DEBOUNCE_SECONDS", "1.0"))
+# Callbacks running at once across all chats, per route class (see admission.ROUTE_CLASSES). The defaults
+# add up to one less than DISPATCHER_WORKERS (with at least one per class), so however the classes fill up,
+# a worker stays free for cheap buttons like "Back to Search"
+_CALLBACK_BUDGET = max(DISPATCHER_WORKERS - 1, 1)
+_SEND_ALL_LIMIT = max(_CALLBACK_BUDGET // 6, 1)
+_GALLERY_LIMIT = max(_CALLBACK_BUDGET // 3, 1)
+CALLBACK_CLASS_LIMITS = {
+    "details": int(os.getenv("CALLBACK_LIMIT_DETAILS", str(max(_CALLBACK_BUDGET - _GALLERY_LIMIT - _SEND_ALL_LIMIT, 1)))),
+    "gallery": int(os.getenv("CALLBACK_LIMIT_GALLERY", str(_GALLERY_LIMIT))),
+    "send_all": int(os.getenv("CALLBACK_LIMIT_SEND_ALL", str(_SEND_ALL_LIMIT))),
+}
@@ -0,0 +1,89 @@
+import io
+import itertools
+import json
+import logging
+
+from projection import project, project_details_events
+
+# Optional accelerated parsers; the bot runs on the standard library without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+class DecodeError(ValueError):
+    """Raised by every decoder when a body is not a JSON object (truncated, an HTML error page, ...)"""
+
+
+def _document(loads, body):
+    # json.JSONDecodeError and orjson.JSONDecodeError are both ValueErrors
+    try:
+        document = loads(body)
+    except ValueError as e:
+        raise DecodeError(f"invalid JSON: {e}") from e
+    if not isinstance(document, dict):
+        raise DecodeError(f"expected a JSON object, got {type(document).__name__}")
+    return document
+
+
+def decode_json(cache_key, body):
+    """Parse a TMDb response body with the standard library and project it for cache_key"""
+    return project(cache_key, _document(json.loads, body))
+
+
+def decode_orjson(cache_key, body):
+    """Same as decode_json, with orjson doing the parsing (several times faster on large payloads)"""
+    return project(cache_key, _document(orjson.loads, body))
+
+
+def decode_streaming(cache_key, body):
+    """Project details payloads straight from ijson parse events instead of building the whole document.
+
+    Only the handled fields and image records are materialized, which keeps peak memory
+    low for titles with thousands of images. Other payloads are small and parsed whole.
+    """
+    if cache_key[0] == "details":
+        events = ijson.parse(io.BytesIO(body), use_float=True)
+        try:
+            first = next(events, None)
+            if first is None or first[1] != "start_map":
+                raise DecodeError("expected a JSON object")
+            return project_details_events(itertools.chain((first,), events))
+        except ijson.JSONError as e:
+            raise DecodeError(f"invalid JSON: {e}") from e
+    return (decode_orjson if orjson else decode_json)(cache_key, body)
+
+
+# Decoders by TMDB_JSON_DECODER name, with the optional module each one needs
+DECODERS = {
+    "json": (decode_json, json),
+    "orjson": (decode_orjson, orjson),
+    "streaming": (decode_streaming, ijson),
+}
+
+
+def available_decoders():
+    """Names of the decoders whose libraries are installed"""
+    return [name for name, (decode, module) in DECODERS.items() if module is not None]
+
+
+def get_decoder(name="auto"):
+    """Return the decode(cache_key, body) function for name; falls back to json if its library is missing"""
+    if name == "auto":
+        name = "orjson" if orjson else "json"
+    if name not in DECODERS:
+        raise ValueError(f"Unknown JSON decoder {name}, expected one of {', '.join(DECODERS)}")
+    decode, module = DECODERS[name]
+    if module is None:
+        logger.warning(f"JSON decoder {name} is not installed, using json")
+        return decode_json
+    return decode
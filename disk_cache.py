@@ -0,0 +1,182 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+"""
+
+# Only rewrite accessed_at when it is older than this, so reads rarely turn into writes
+TOUCH_INTERVAL = 60
+
+# Re-read the stored total after writing this fraction of max_bytes, since other processes write too
+SYNC_FRACTION = 0.05
+
+
+def _encode_key(key):
+    return json.dumps(list(key), separators=(",", ":"), ensure_ascii=False)
+
+
+def _decode_key(text):
+    return tuple(json.loads(text))
+
+
+class SQLiteCache:
+    """Persistent, size-bounded cache of JSON payloads stored zlib-compressed in SQLite.
+
+    Entries carry a wall-clock expiry so they survive restarts. When the stored bytes
+    exceed max_bytes, expired entries are purged first and then the least recently
+    accessed ones until the cache is back under the low-water mark.
+
+    Several processes (shard workers) may share the file, so the running byte count
+    is only this process's view: it is re-read from the table whenever it crosses
+    max_bytes and after every SYNC_FRACTION of max_bytes written, before deciding
+    to compact.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, compression_level=6):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._bytes = None
+        self._unsynced = 0  # bytes written since _bytes was last read from the table
+        self.hits = 0
+        self.misses = 0
+        self.compactions = 0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _connect(self):
+        # SQLite connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Return (value, remaining_ttl) for key, or None if missing or expired"""
+        conn = self._connect()
+        now = time.time()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE key = ?", (_encode_key(key),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading disk cache: {e}")
+            return None
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+        value, expires_at, accessed_at = row
+        if now - accessed_at > TOUCH_INTERVAL:
+            try:
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, _encode_key(key)))
+            except sqlite3.Error:
+                pass  # Recency is best effort
+        self.hits += 1
+        return json.loads(zlib.decompress(value)), expires_at - now
+
+    def set(self, key, value, ttl):
+        """Store value under key for ttl seconds"""
+        blob = zlib.compress(
+            json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), self.compression_level
+        )
+        now = time.time()
+        encoded_key = _encode_key(key)
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                old = conn.execute("SELECT size FROM entries WHERE key = ?", (encoded_key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (encoded_key, blob, len(blob), now + ttl, now),
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Error writing disk cache: {e}")
+                return
+            self._bytes += len(blob) - (old[0] if old else 0)
+            self._unsynced += len(blob)
+            if self.max_bytes and (self._bytes > self.max_bytes or self._unsynced > self.max_bytes * SYNC_FRACTION):
+                self._sync(conn, now)
+
+    def compact(self):
+        """Purge expired entries and trim to the size budget"""
+        with self._write_lock:
+            self._compact(self._connect(), time.time())
+
+    def _sync(self, conn, now):
+        # Caller must hold the write lock; compacts only if the shared total is really over budget
+        try:
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error reading disk cache size: {e}")
+            return
+        self._unsynced = 0
+        if self._bytes > self.max_bytes:
+            self._compact(conn, now)
+
+    def _compact(self, conn, now):
+        # Caller must hold the write lock; the transaction keeps other processes from compacting at the same time
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            target = int(self.max_bytes * 0.8) if self.max_bytes else total
+            if total > target:
+                # Evict least recently accessed entries until we are under the low-water mark
+                freed = 0
+                victims = []
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                    if total - freed <= target:
+                        break
+                    victims.append((key,))
+                    freed += size
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                total -= freed
+            conn.execute("COMMIT")
+            self._bytes = total
+            self._unsynced = 0
+            self.compactions += 1
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.error(f"Error compacting disk cache: {e}")
+
+    def recent(self, limit):
+        """Yield (key, value, remaining_ttl) for the most recently accessed live entries"""
+        now = time.time()
+        rows = self._connect().execute(
+            "SELECT key, value, expires_at FROM entries WHERE expires_at > ? ORDER BY accessed_at DESC LIMIT ?",
+            (now, limit),
+        ).fetchall()
+        for key, value, expires_at in rows:
+            yield _decode_key(key), json.loads(zlib.decompress(value)), expires_at - now
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "compactions": self.compactions,
+        }
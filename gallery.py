@@ -0,0 +1,102 @@
+from collections import namedtuple
+
+from cache import DerivedCache
+from images import NO_LANGUAGE
+
+# A rendered gallery message. buttons is a list of rows of (label, route, args) specs rather
+# than callback tokens, so memoized pages never hand out tokens that have since expired.
+RenderedPage = namedtuple("RenderedPage", ["text", "buttons", "parse_mode", "disable_web_page_preview"])
+
+# Per image type: header emoji, plural label, singular label and the TMDbAPI URL builder
+GalleryType = namedtuple("GalleryType", ["emoji", "label", "item", "url_method"])
+
+GALLERY_TYPES = {
+    "posters": GalleryType("🖼️", "Posters", "Poster", "get_poster_url"),
+    "backdrops": GalleryType("🌆", "Backdrops", "Backdrop", "get_backdrop_url"),
+    "logos": GalleryType("🎥", "Logos", "Logo", "get_logo_url"),
+}
+
+OVERVIEW_HEADER = "{emoji} *{title}* - All {label}\n\n"
+OVERVIEW_LINE = "• {lang_name}: {count} {noun}\n"
+OVERVIEW_BUTTON = "{lang_name} ({count} {noun})"
+PAGE_HEADER = "{emoji} *{title}* - {lang_name} {label} (Page {page}/{total_pages})\n\n"
+PAGE_ITEM = "*{item} {number}*:\n{url}\n\n"
+NOT_FOUND = "No {noun} found for {title}."
+NOT_FOUND_IN_LANGUAGE = "No {noun} found for {title} in {lang_name}."
+
+
+def language_name(lang_code):
+    """Display name for an image language code"""
+    if lang_code == NO_LANGUAGE:
+        return "No Language"
+    return "English" if lang_code == "en" else lang_code
+
+
+class GalleryRenderer:
+    """Renders the poster, backdrop and logo galleries of a title from its ImageIndex.
+
+    Rendered pages are memoized per details payload, keyed by (title, image type,
+    image language, page, locale). A refreshed payload is a new object, so its
+    pages are rendered afresh while repeat views of a hot page are a dict lookup.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self._pages = DerivedCache(api.cache, "gallery_pages")  # (details, page key) -> RenderedPage
+
+    def render(self, details, image_type, media_type, media_id, language, lang_code=None, page=1):
+        """Render the language overview (lang_code=None) or one page of lang_code images"""
+        group = self.api.image_index(details).group(image_type)
+        if lang_code is not None:
+            page = min(max(page, 1), max(group.total_pages(lang_code), 1))
+        def render_page(details):
+            title = details.get('title', details.get('name', 'Unknown'))
+            if lang_code is None:
+                return self._overview(title, group, image_type, media_type, media_id, language)
+            return self._page(title, group, image_type, media_type, media_id, language, lang_code, page)
+
+        key = (media_type, media_id, image_type, lang_code, page, language)
+        return self._pages.get(details, render_page, key=key)
+
+    def _overview(self, title, group, image_type, media_type, media_id, language):
+        gallery = GALLERY_TYPES[image_type]
+        if not group:
+            return RenderedPage(NOT_FOUND.format(noun=image_type, title=title), None, None, None)
+
+        lines = [OVERVIEW_HEADER.format(emoji=gallery.emoji, title=title, label=gallery.label)]
+        buttons = []
+        for lang_code, images in group.languages.items():
+            fields = dict(lang_name=language_name(lang_code), count=len(images), noun=image_type)
+            lines.append(OVERVIEW_LINE.format(**fields))
+            buttons.append([(OVERVIEW_BUTTON.format(**fields), f"lang_{image_type}", (media_type, media_id, language, lang_code, 1))])
+        buttons.append([("🔙 Back to Details", "details", (media_type, media_id, language))])
+        return RenderedPage("".join(lines), buttons, "Markdown", None)
+
+    def _page(self, title, group, image_type, media_type, media_id, language, lang_code, page):
+        gallery = GALLERY_TYPES[image_type]
+        lang_name = language_name(lang_code)
+        if not group.count(lang_code):
+            return RenderedPage(NOT_FOUND_IN_LANGUAGE.format(noun=image_type, title=title, lang_name=lang_name), None, None, None)
+
+        page, total_pages, start_idx, images = group.page(lang_code, page)
+        image_url = getattr(self.api, gallery.url_method)
+        lines = [PAGE_HEADER.format(emoji=gallery.emoji, title=title, lang_name=lang_name, label=gallery.label, page=page, total_pages=total_pages)]
+        lines.extend(
+            PAGE_ITEM.format(item=gallery.item, number=start_idx + i + 1, url=image_url(image.file_path, 'original'))
+            for i, image in enumerate(images)
+        )
+
+        route = f"lang_{image_type}"
+        nav_buttons = []
+        if page > 1:
+            nav_buttons.append(("⬅️ Previous", route, (media_type, media_id, language, lang_code, page - 1)))
+        if page < total_pages:
+            nav_buttons.append(("Next ➡️", route, (media_type, media_id, language, lang_code, page + 1)))
+        buttons = [nav_buttons] if nav_buttons else []
+        buttons.append([(f"🔙 Back to All {gallery.label}", image_type, (media_type, media_id, language))])
+        buttons.append([("🔙 Back to Details", "details", (media_type, media_id, language))])
+        # Previews are disabled so Telegram doesn't show just the first image of the page
+        return RenderedPage("".join(lines), buttons, "Markdown", True)
+
+    def stats(self):
+        return self._pages.stats()
@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from singleflight import SingleFlight
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    key TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_accessed ON images (accessed_at);
+CREATE INDEX IF NOT EXISTS images_digest ON images (digest);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    content_type TEXT NOT NULL
+);
+"""
+
+# Only rewrite accessed_at when it is older than this, so hits rarely turn into writes
+TOUCH_INTERVAL = 60
+
+
+class ImageStore:
+    """Disk cache of TMDb images for the image proxy, bounded by total bytes.
+
+    Image bytes are stored once per content hash (blobs/ab/abcd...), and an SQLite
+    index maps "size/file_path" to the hash, so the hash doubles as a strong ETag.
+    Misses are downloaded straight to disk in chunks, with concurrent requests for
+    the same image sharing one download. When the stored bytes exceed max_bytes the
+    least recently requested images are dropped until 80% of the budget is left.
+    """
+
+    def __init__(self, directory, session, source_url, sizes, max_bytes=512 * 1024 * 1024, timeout=10):
+        self.directory = directory
+        self.session = session
+        self.source_url = source_url
+        self.sizes = frozenset(sizes)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.evictions = 0
+        os.makedirs(os.path.join(directory, "blobs"), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _connect(self):
+        # SQLite connections can't be shared across threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, digest):
+        return os.path.join(self.directory, "blobs", digest[:2], digest)
+
+    def get(self, size, file_path):
+        """Return (path, digest, content_type) for a TMDb image, downloading it on a miss; None if unavailable"""
+        if size not in self.sizes or not file_path.startswith("/") or ".." in file_path:
+            return None
+        key = f"{size}{file_path}"
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return self._flight.do(key, lambda: self._lookup(key) or self._download(key))
+
+    def _lookup(self, key):
+        now = time.time()
+        row = self._connect().execute(
+            "SELECT images.digest, images.accessed_at, blobs.content_type FROM images "
+            "JOIN blobs ON blobs.digest = images.digest WHERE images.key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        digest, accessed_at, content_type = row
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            return None  # Removed behind our back; download it again
+        if now - accessed_at > TOUCH_INTERVAL:
+            try:
+                self._connect().execute("UPDATE images SET accessed_at = ? WHERE key = ?", (now, key))
+            except sqlite3.Error:
+                pass  # Recency is best effort
+        return path, digest, content_type
+
+    def _download(self, key):
+        url = f"{self.source_url}/{key}"
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as temp, self.session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                content_type = response.headers.get("Content-Type", "application/octet-stream")
+                for chunk in response.iter_content(64 * 1024):
+                    temp.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Error fetching image {url}: {e}")
+            os.unlink(temp_path)
+            return None
+
+        digest = digest.hexdigest()
+        path = self.blob_path(digest)
+        with self._write_lock:
+            # Placing the blob under the lock keeps a concurrent eviction from deleting it before it is indexed
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN")
+                if conn.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone() is None:
+                    conn.execute("INSERT INTO blobs (digest, size, content_type) VALUES (?, ?, ?)", (digest, size, content_type))
+                    self._bytes += size
+                conn.execute("INSERT OR REPLACE INTO images (key, digest, accessed_at) VALUES (?, ?, ?)", (key, digest, time.time()))
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK")
+                logger.error(f"Error indexing image {key}: {e}")
+                return None
+            if self._bytes > self.max_bytes:
+                self._evict(conn, keep=key)
+        return path, digest, content_type
+
+    def _evict(self, conn, keep):
+        # Caller must hold the write lock; drop least recently requested images down to 80% of the budget
+        target = int(self.max_bytes * 0.8)
+        try:
+            victims = conn.execute(
+                "SELECT key, digest FROM images WHERE key != ? ORDER BY accessed_at", (keep,)
+            ).fetchall()
+            for key, digest in victims:
+                if self._bytes <= target:
+                    break
+                conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                self.evictions += 1
+                if conn.execute("SELECT 1 FROM images WHERE digest = ? LIMIT 1", (digest,)).fetchone():
+                    continue  # Another size/path still points at these bytes
+                size = conn.execute("SELECT size FROM blobs WHERE digest = ?", (digest,)).fetchone()[0]
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                try:
+                    os.unlink(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+                self._bytes -= size
+        except sqlite3.Error as e:
+            logger.error(f"Error evicting images: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "failures": self.failures,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,84 @@
+import sys
+
+IMAGE_TYPES = ("posters", "backdrops", "logos")
+
+# Language code used for images that have no iso_639_1 (matches the callback data format)
+NO_LANGUAGE = "null"
+
+# Images listed per page in the per-language galleries
+IMAGES_PER_PAGE = 5
+
+
+class ImageGroup:
+    """All images of one type for a title, grouped by language with precomputed pages"""
+
+    __slots__ = ("images", "languages", "per_page", "_pages", "_first")
+
+    def __init__(self, images, per_page=IMAGES_PER_PAGE):
+        self.images = images
+        self.per_page = per_page
+        self.languages = {}  # lang_code -> images, in order of first appearance
+        self._first = {}  # lang_code -> position of its first image in self.images
+        for position, image in enumerate(images):
+            lang_code = image.iso_639_1 or NO_LANGUAGE
+            if lang_code not in self.languages:
+                self.languages[lang_code] = []
+                self._first[lang_code] = position
+            self.languages[lang_code].append(image)
+
+        self._pages = {
+            lang_code: [lang_images[start:start + per_page] for start in range(0, len(lang_images), per_page)]
+            for lang_code, lang_images in self.languages.items()
+        }
+
+    def __len__(self):
+        return len(self.images)
+
+    def count(self, lang_code):
+        """Number of images in lang_code"""
+        return len(self.languages.get(lang_code, ()))
+
+    def total_pages(self, lang_code):
+        return len(self._pages.get(lang_code, ()))
+
+    def page(self, lang_code, page):
+        """Return (page, total_pages, start_idx, images) with page clamped to the valid range"""
+        pages = self._pages.get(lang_code)
+        if not pages:
+            return 1, 0, 0, []
+        page = min(max(page, 1), len(pages))
+        return page, len(pages), (page - 1) * self.per_page, pages[page - 1]
+
+    def size_in_bytes(self):
+        """Memory held by the grouping itself; the images are shared with the details payload"""
+        size = sys.getsizeof(self.languages) + sys.getsizeof(self._first) + sys.getsizeof(self._pages)
+        size += sum(sys.getsizeof(lang_images) for lang_images in self.languages.values())
+        for pages in self._pages.values():
+            size += sys.getsizeof(pages) + sum(sys.getsizeof(page) for page in pages)
+        return size
+
+    def first_for_language(self, language):
+        """First image in language (e.g. 'en-US') or without a language, in TMDb order"""
+        candidates = [
+            self._first[lang_code] for lang_code in (language[:2], NO_LANGUAGE) if lang_code in self._first
+        ]
+        return self.images[min(candidates)] if candidates else None
+
+
+class ImageIndex:
+    """Per-title index of poster, backdrop and logo images, built once per details payload"""
+
+    __slots__ = ("posters", "backdrops", "logos")
+
+    def __init__(self, details, per_page=IMAGES_PER_PAGE):
+        images = details.get('images', {})
+        self.posters = ImageGroup(images.get('posters', []), per_page)
+        self.backdrops = ImageGroup(images.get('backdrops', []), per_page)
+        self.logos = ImageGroup(images.get('logos', []), per_page)
+
+    def group(self, image_type):
+        """Return the ImageGroup for 'posters', 'backdrops' or 'logos'"""
+        return getattr(self, image_type)
+
+    def size_in_bytes(self):
+        return sum(self.group(image_type).size_in_bytes() for image_type in IMAGE_TYPES)
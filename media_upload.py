@@ -0,0 +1,195 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from telegram import InputMediaPhoto
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Telegram accepts at most 10 items per media group
+MAX_ALBUM_SIZE = 10
+# Copies of each image alive at the peak: the downloaded bytes, plus the multipart
+# request body PTB builds in memory for send_media_group (or the chunks being joined
+# while the download finishes)
+IMAGE_COPIES = 2
+
+
+class ByteBudget:
+    """Counts bytes held in memory across all uploads and refuses reservations beyond max_bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._cond = threading.Condition()
+
+    def try_acquire(self, size):
+        with self._cond:
+            if self.in_use + size > self.max_bytes:
+                return False
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+            return True
+
+    def acquire(self, size):
+        """Block until size bytes fit in the budget"""
+        with self._cond:
+            if self.in_use + size > self.max_bytes:
+                self.waits += 1
+            while self.in_use + size > self.max_bytes:
+                self._cond.wait()
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+
+    def release(self, size):
+        with self._cond:
+            self.in_use -= size
+            self._cond.notify_all()
+
+
+class AlbumSender:
+    """Downloads images and uploads them to a chat as media-group albums, in order.
+
+    Downloads run on a shared pool of `concurrency` threads. Every download first
+    reserves IMAGE_COPIES * max_image_bytes of the shared byte budget (shrunk to
+    IMAGE_COPIES times the real size once it finishes), and the bytes stay reserved
+    until their album is uploaded. max_bytes therefore bounds the downloaded images
+    together with the request bodies encoding them, however many chats are sending
+    at once. When the budget is exhausted the uploader sends what it has, or waits
+    for the next image, instead of starting more downloads.
+    """
+
+    def __init__(self, session, max_bytes=32 * 1024 * 1024, concurrency=4, max_image_bytes=5 * 1024 * 1024,
+                 album_size=MAX_ALBUM_SIZE, timeout=10, jobs=2):
+        self.session = session
+        self.budget = ByteBudget(max_bytes)
+        self.max_image_bytes = min(max_image_bytes, max_bytes // IMAGE_COPIES)
+        self.reservation = self.max_image_bytes * IMAGE_COPIES
+        self.album_size = min(album_size, MAX_ALBUM_SIZE)
+        self.timeout = timeout
+        self._downloads = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="album-fetch")
+        self._jobs = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="album-upload")
+        self._active_chats = set()  # Chats with a send queued or running
+        self._lock = threading.Lock()
+        self.albums_sent = 0
+        self.images_sent = 0
+        self.images_failed = 0
+        self.sends_skipped = 0
+
+    def submit(self, bot, chat_id, urls, caption=None):
+        """Send urls to chat_id in the background; returns a future with the per-album timings.
+
+        Returns None without queueing anything if the chat already has a send queued or
+        running, so repeated taps can't pile up upload jobs.
+        """
+        with self._lock:
+            if chat_id in self._active_chats:
+                self.sends_skipped += 1
+                return None
+            self._active_chats.add(chat_id)
+        future = self._jobs.submit(self.send, bot, chat_id, urls, caption)
+        future.add_done_callback(lambda _: self._finish(chat_id))
+        return future
+
+    def _finish(self, chat_id):
+        with self._lock:
+            self._active_chats.discard(chat_id)
+
+    def send(self, bot, chat_id, urls, caption=None):
+        """Send urls to chat_id as albums and return one timing dict per album"""
+        timings = []
+        pending = deque()  # Download futures, in upload order
+        album = []
+        started = time.perf_counter()
+
+        def upload():
+            nonlocal started
+            fetched = time.perf_counter()
+            size = sum(len(data) for data in album)
+            media = [
+                InputMediaPhoto(data, caption=caption if not timings and index == 0 else None)
+                for index, data in enumerate(album)
+            ]
+            try:
+                bot.send_media_group(chat_id, media, timeout=max(self.timeout, 60))
+                self.albums_sent += 1
+                self.images_sent += len(album)
+            except Exception as e:
+                logger.error(f"Error sending album to chat {chat_id}: {e}")
+            finally:
+                self.budget.release(size * IMAGE_COPIES)
+            timing = {
+                "album": len(timings) + 1,
+                "images": len(album),
+                "bytes": size,
+                "fetch_seconds": round(fetched - started, 3),
+                "upload_seconds": round(time.perf_counter() - fetched, 3),
+            }
+            logger.info(f"Album {timing['album']} to chat {chat_id}: {timing['images']} images, {size} bytes, "
+                        f"fetched in {timing['fetch_seconds']}s, uploaded in {timing['upload_seconds']}s")
+            timings.append(timing)
+            album.clear()
+            started = time.perf_counter()
+
+        def take_next():
+            data = pending.popleft().result()
+            if data is None:
+                self.images_failed += 1
+                return
+            album.append(data)
+            if len(album) == self.album_size:
+                upload()
+
+        for url in urls:
+            # Backpressure: make room in the byte budget before starting another download
+            while not self.budget.try_acquire(self.reservation):
+                if pending:
+                    take_next()
+                elif album:
+                    upload()
+                else:
+                    self.budget.acquire(self.reservation)  # Other chats hold the budget
+                    break
+            pending.append(self._downloads.submit(self._download, url))
+
+        while pending:
+            take_next()
+        if album:
+            upload()
+        return timings
+
+    def _download(self, url):
+        # Runs with the reservation held; gives back whatever the image didn't need.
+        # The chunks are joined once into the bytes PTB uploads as they are.
+        chunks = []
+        size = 0
+        try:
+            with self.session.get(url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(64 * 1024):
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        raise ValueError(f"image larger than {self.max_image_bytes} bytes")
+            data = b"".join(chunks)
+        except Exception as e:
+            logger.error(f"Error downloading {url}: {e}")
+            self.budget.release(self.reservation)
+            return None
+        self.budget.release(self.reservation - size * IMAGE_COPIES)
+        return data
+
+    def stats(self):
+        return {
+            "albums_sent": self.albums_sent,
+            "images_sent": self.images_sent,
+            "images_failed": self.images_failed,
+            "sends_skipped": self.sends_skipped,
+            "bytes_in_use": self.budget.in_use,
+            "peak_bytes": self.budget.peak,
+            "budget_waits": self.budget.waits,
+        }
@@ -0,0 +1,259 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets; slower observations go to an overflow bucket
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class StartupTimer:
+    """Wall-clock breakdown of startup phases, checked against a time budget.
+
+    Phases may overlap (the HTTP server boots on its own thread), so they need not
+    add up to the total, which is measured from `started` until finish().
+    """
+
+    def __init__(self, budget, started=None):
+        self.budget = budget
+        self.started = time.perf_counter() if started is None else started
+        self.phases = {}  # name -> seconds, in the order they finished
+        self.total = None
+
+    def record(self, name, seconds):
+        self.phases[name] = seconds
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def finish(self):
+        """Stop the clock and return the total startup time in seconds"""
+        self.total = time.perf_counter() - self.started
+        return self.total
+
+    def report(self):
+        return {
+            "total_s": round(self.total, 3) if self.total is not None else None,
+            "budget_s": self.budget,
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+        }
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labels):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def _cell(self, labels, size):
+        # Each thread writes only to its own shard, so recording never takes a lock
+        shard = self.registry._shard()
+        key = (self.name, labels)
+        cell = shard.get(key)
+        if cell is None:
+            cell = shard[key] = [0] * size
+        return cell
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, value=1):
+        self._cell(labels, 1)[0] += value
+
+
+class Gauge(Counter):
+    """Gauge that goes up and down; each inc() must be matched by a dec() on the same thread"""
+
+    kind = "gauge"
+
+    def dec(self, *labels, value=1):
+        self._cell(labels, 1)[0] -= value
+
+
+class LatencyHistogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, seconds, *labels):
+        # One slot per bucket, an overflow slot, then the running sum
+        cell = self._cell(labels, len(self.buckets) + 2)
+        cell[bisect.bisect_left(self.buckets, seconds)] += 1
+        cell[-1] += seconds
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+
+class _Collected(_Metric):
+    """Metric read from a callback at scrape time, for values other components already count"""
+
+    def __init__(self, registry, name, help, labels, kind, collect, summed):
+        super().__init__(registry, name, help, labels)
+        self.kind = kind
+        self.collect = collect
+        self.summed = summed
+
+    def samples(self):
+        samples = self.collect()
+        return samples if isinstance(samples, dict) else {(): samples}
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Recording is lock-free: every thread accumulates into its own shard (a dict
+    of small lists), and a scrape sums the shards of all threads. Values owned by
+    other components (cache hit counts, queue depths) are registered with
+    collect() and read from their stats() only when /metrics is scraped.
+    Values from other processes (shard workers) are added in through add_source(),
+    from the snapshot() each of them publishes; collected values are included in
+    the snapshot unless they were registered with summed=False.
+    """
+
+    def __init__(self):
+        self._metrics = {}  # name -> metric, in registration order
+        self._shards = []  # one {(name, label values): cell} dict per thread that recorded anything
+        self._sources = []  # callables returning snapshots recorded in other processes
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = self._local.values = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(self, name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._register(Gauge(self, name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(LatencyHistogram(self, name, help, labels, buckets))
+
+    def collect(self, name, help, collect, labels=(), kind="gauge", summed=True):
+        """Register a metric whose samples come from collect(): a number, or {label values: number}.
+
+        summed=False keeps other processes' values out of it, for ratios and values
+        that only mean something in the process serving /metrics.
+        """
+        return self._register(_Collected(self, name, help, labels, kind, collect, summed))
+
+    def add_source(self, source):
+        """Also render the values in the snapshots returned by source(), e.g. ones sent by worker processes"""
+        self._sources.append(source)
+
+    def snapshot(self):
+        """Values of this process as {(name, label values): cell}, for another process's add_source()"""
+        totals = self._totals(include_sources=False)
+        for metric in list(self._metrics.values()):
+            if isinstance(metric, _Collected) and metric.summed:
+                try:
+                    samples = metric.samples()
+                except Exception:
+                    continue
+                for labels, value in samples.items():
+                    totals[(metric.name, tuple(labels))] = [value]
+        return totals
+
+    def _totals(self, include_sources=True):
+        # list() copies each shard in one step, so threads may keep recording during a scrape
+        with self._lock:
+            shards = list(self._shards)
+        if include_sources:
+            for source in self._sources:
+                try:
+                    shards.extend(source())
+                except Exception:
+                    continue  # A failing source must not break the whole scrape
+        totals = {}
+        for shard in shards:
+            for key, cell in list(shard.items()):
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = list(cell)
+                else:
+                    for index, value in enumerate(cell):
+                        total[index] += value
+        return totals
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format"""
+        totals = self._totals()
+        by_metric = {}
+        for (name, labels), cell in sorted(totals.items(), key=lambda item: (item[0][0], tuple(map(str, item[0][1])))):
+            by_metric.setdefault(name, []).append((labels, cell))
+
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, _Collected):
+                try:
+                    samples = dict(metric.samples())
+                except Exception:
+                    continue  # A failing source must not break the whole scrape
+                if metric.summed:
+                    # Only sources contribute cells for collected metrics
+                    for labels, cell in by_metric.get(metric.name, ()):
+                        samples[labels] = samples.get(labels, 0) + cell[0]
+                for labels, value in samples.items():
+                    lines.append(f"{metric.name}{_labels(metric.labels, labels)} {_number(value)}")
+            elif isinstance(metric, LatencyHistogram):
+                for labels, cell in by_metric.get(metric.name, ()):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + ("+Inf",), cell):
+                        cumulative += count
+                        le = f'le="{bound}"'
+                        lines.append(f"{metric.name}_bucket{_labels(metric.labels, labels, le)} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_labels(metric.labels, labels)} {_number(float(cell[-1]))}")
+                    lines.append(f"{metric.name}_count{_labels(metric.labels, labels)} {cumulative}")
+            else:
+                for labels, cell in by_metric.get(metric.name, ()):
+                    lines.append(f"{metric.name}{_labels(metric.labels, labels)} {_number(cell[0])}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served on /metrics; modules declare their metrics against it at import time
+registry = MetricsRegistry()
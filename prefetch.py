@@ -0,0 +1,116 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from ratelimit import BACKGROUND
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Chats whose prefetch batch we remember; older ones are forgotten first
+MAX_TRACKED_CHATS = 10000
+
+
+class _Batch:
+    __slots__ = ("keys", "done", "futures")
+
+    def __init__(self):
+        self.keys = set()
+        self.done = set()
+        self.futures = []
+
+
+class Prefetcher:
+    """Warms the details cache for the top search results a chat is likely to tap next.
+
+    Each chat has at most one batch in flight. A new search or a tap on a result
+    cancels whatever has not started yet. Taps are classified as hits (prefetched in
+    time), late (prefetch still running) or misses (not prefetched) to help tune top_k.
+    """
+
+    def __init__(self, api, top_k=3, workers=2):
+        self.api = api
+        self.top_k = top_k
+        self._executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="tmdb-prefetch")
+        self._batches = OrderedDict()  # chat_id -> _Batch
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.hits = 0
+        self.late = 0
+        self.misses = 0
+
+    def prefetch(self, chat_id, items, language="en-US"):
+        """Start warming details for the first top_k (media_type, media_id) items shown to chat_id"""
+        if not self.top_k:
+            return
+        batch = _Batch()
+        with self._lock:
+            self._cancel(chat_id)
+            self._batches[chat_id] = batch
+            while len(self._batches) > MAX_TRACKED_CHATS:
+                _, old = self._batches.popitem(last=False)
+                self._cancel_batch(old)
+            for media_type, media_id in items[:self.top_k]:
+                key = (media_type, str(media_id), language)
+                batch.keys.add(key)
+                batch.futures.append(self._executor.submit(self._run, batch, key))
+                self.scheduled += 1
+
+    def _run(self, batch, key):
+        try:
+            if self.api.get_details(*key, priority=BACKGROUND) is not None:
+                with self._lock:
+                    batch.done.add(key)
+                    self.completed += 1
+        except Exception as e:
+            logger.error(f"Error prefetching details for {key}: {e}")
+
+    def record_tap(self, chat_id, media_type, media_id, language):
+        """Account for a result tap and stop prefetching the rest of the chat's batch"""
+        key = (media_type, str(media_id), language)
+        with self._lock:
+            batch = self._batches.pop(chat_id, None)
+            if batch is None:
+                return  # Not the first tap after a search (e.g. "Back to Details")
+            self._cancel_batch(batch)
+            if key in batch.done:
+                self.hits += 1
+            elif key in batch.keys:
+                self.late += 1
+            else:
+                self.misses += 1
+
+    def cancel(self, chat_id):
+        """Drop any prefetches for chat_id that have not started yet"""
+        with self._lock:
+            self._cancel(chat_id)
+
+    def _cancel(self, chat_id):
+        # Caller must hold the lock
+        batch = self._batches.pop(chat_id, None)
+        if batch is not None:
+            self._cancel_batch(batch)
+
+    def _cancel_batch(self, batch):
+        # Caller must hold the lock
+        for future in batch.futures:
+            if future.cancel():
+                self.cancelled += 1
+
+    def stats(self):
+        """Return prefetch counters and the fraction of result taps served by a finished prefetch"""
+        with self._lock:
+            taps = self.hits + self.late + self.misses
+            return {
+                "top_k": self.top_k,
+                "scheduled": self.scheduled,
+                "completed": self.completed,
+                "cancelled": self.cancelled,
+                "hits": self.hits,
+                "late": self.late,
+                "misses": self.misses,
+                "hit_rate": self.hits / taps if taps else 0.0,
+            }
@@ -0,0 +1,98 @@
+import sys
+from collections import namedtuple
+
+from images import IMAGE_TYPES
+
+# The only image attributes the bot reads; a tuple is far smaller than TMDb's seven-key dict
+Image = namedtuple("Image", ["file_path", "iso_639_1"])
+
+DETAILS_FIELDS = (
+    "id", "title", "name", "overview", "vote_average", "poster_path", "backdrop_path",
+    "release_date", "runtime",  # Movies
+    "first_air_date", "number_of_seasons", "number_of_episodes",  # TV shows
+)
+
+SEARCH_FIELDS = ("id", "media_type", "title", "name", "release_date", "first_air_date")
+
+# Number of movie/TV rows offered as result buttons
+MAX_MEDIA_RESULTS = 10
+
+
+def _image(entry):
+    # Accepts raw TMDb image dicts as well as already-projected images (tuples, or lists read back from JSON)
+    if isinstance(entry, dict):
+        file_path, lang = entry.get("file_path"), entry.get("iso_639_1")
+    else:
+        file_path, lang = entry
+    # Language codes repeat across thousands of images, so share one string object per code
+    return Image(file_path, sys.intern(lang) if lang else None)
+
+
+def project_details(raw):
+    """Reduce a details payload to the fields the handlers use plus compact image records"""
+    details = {field: raw[field] for field in DETAILS_FIELDS if field in raw}
+    images = raw.get("images") or {}
+    details["images"] = {
+        image_type: [_image(entry) for entry in images.get(image_type) or ()] for image_type in IMAGE_TYPES
+    }
+    return details
+
+
+def project_details_events(events):
+    """Build project_details' result from ijson-style (prefix, event, value) parse events.
+
+    Only the handled fields and image records are kept as they stream past, so the
+    full payload (every image attribute, anything else appended) is never built.
+    """
+    fields = {}
+    images = {image_type: [] for image_type in IMAGE_TYPES}
+    image = None
+    for prefix, event, value in events:
+        attribute = _IMAGE_ATTRIBUTES.get(prefix)
+        if attribute is not None:
+            image[attribute] = value
+        elif prefix in _IMAGE_PREFIXES:
+            if event == "start_map":
+                image = {}
+            elif event == "end_map":
+                images[_IMAGE_PREFIXES[prefix]].append(_image(image))
+        elif prefix in _DETAILS_FIELD_SET and event in _SCALAR_EVENTS:
+            fields[prefix] = value
+    details = {field: fields[field] for field in DETAILS_FIELDS if field in fields}
+    details["images"] = images
+    return details
+
+
+_DETAILS_FIELD_SET = frozenset(DETAILS_FIELDS)
+_SCALAR_EVENTS = frozenset(("string", "number", "boolean", "null"))
+_IMAGE_PREFIXES = {f"images.{image_type}.item": image_type for image_type in IMAGE_TYPES}
+_IMAGE_ATTRIBUTES = {
+    f"{prefix}.{attribute}": attribute for prefix in _IMAGE_PREFIXES for attribute in Image._fields
+}
+
+
+def project_search(raw):
+    """Reduce a search payload to the fields needed to build result buttons.
+
+    media_results holds the already-filtered movie/TV rows that are shown to the user,
+    so cache hits skip the filtering as well as the request.
+    """
+    results = [{field: item[field] for field in SEARCH_FIELDS if field in item} for item in raw.get("results") or ()]
+    return {
+        "page": raw.get("page"),
+        "total_pages": raw.get("total_pages"),
+        "results": results,
+        "media_results": [item for item in results if item.get("media_type") in ("movie", "tv")][:MAX_MEDIA_RESULTS],
+    }
+
+
+# Projection applied per cache namespace (the first element of a TMDbAPI cache key)
+PROJECTIONS = {
+    "details": project_details,
+    "search": project_search,
+}
+
+
+def project(cache_key, data):
+    """Project a payload for cache_key; projections are idempotent so cached payloads can be re-projected"""
+    return PROJECTIONS[cache_key[0]](data)
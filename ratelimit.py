@@ -0,0 +1,132 @@
+import threading
+import time
+
+# Lanes in priority order: callers in an earlier lane are always served first
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+LANES = (INTERACTIVE, BACKGROUND)
+
+
+class _LaneStats:
+    __slots__ = ("waiting", "acquired", "timeouts", "total_wait", "max_wait")
+
+    def __init__(self):
+        self.waiting = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket with strict-priority lanes.
+
+    Tokens refill at `rate` per second up to `burst`. A caller may only take a token
+    when no caller in a higher-priority lane is waiting, so background work never
+    delays interactive requests. A rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate, burst, lanes=LANES):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.lanes = tuple(lanes)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition(threading.Lock())
+        self._stats = {lane: _LaneStats() for lane in self.lanes}
+
+    def _refill(self, now):
+        # Caller must hold the lock
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _higher_waiting(self, lane):
+        # Caller must hold the lock
+        for other in self.lanes:
+            if other == lane:
+                return False
+            if self._stats[other].waiting:
+                return True
+        return False
+
+    def _take(self, lane, now):
+        # Caller must hold the lock; returns 0 when a token was taken, else seconds until one may be
+        self._refill(now)
+        if self._tokens >= 1 and not self._higher_waiting(lane):
+            self._tokens -= 1
+            return 0.0
+        return max((1 - self._tokens) / self.rate, 0.001)
+
+    def _record(self, stats, waited):
+        # Caller must hold the lock
+        stats.acquired += 1
+        stats.total_wait += waited
+        if waited > stats.max_wait:
+            stats.max_wait = waited
+
+    def acquire(self, lane=INTERACTIVE, timeout=None):
+        """Block until a token is available in lane; returns False if timeout expires first"""
+        if not self.rate:
+            return True
+        stats = self._stats[lane]
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        with self._cond:
+            stats.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._take(lane, now)
+                    if not delay:
+                        self._record(stats, now - start)
+                        return True
+                    if deadline is not None:
+                        if now >= deadline:
+                            stats.timeouts += 1
+                            return False
+                        delay = min(delay, deadline - now)
+                    self._cond.wait(delay)
+            finally:
+                stats.waiting -= 1
+                # Lower lanes may be blocked on us; let them re-check
+                self._cond.notify_all()
+
+    def try_acquire(self, lane=INTERACTIVE):
+        """Take a token without blocking; returns 0 on success, else seconds to wait before retrying"""
+        if not self.rate:
+            return 0.0
+        with self._cond:
+            return self._take(lane, time.monotonic())
+
+    def add_waiter(self, lane=INTERACTIVE):
+        """Count a caller that waits outside acquire() (an asyncio caller polling try_acquire()) as waiting in lane.
+
+        Lower lanes then hold back for it just as for a blocked acquire(); pair with remove_waiter().
+        """
+        with self._cond:
+            self._stats[lane].waiting += 1
+
+    def remove_waiter(self, lane, waited=None):
+        """End a wait begun with add_waiter(): waited is how long it took to get a token, None if it timed out"""
+        with self._cond:
+            stats = self._stats[lane]
+            stats.waiting -= 1
+            if waited is None:
+                stats.timeouts += 1
+            else:
+                self._record(stats, waited)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Return per-lane queue-wait statistics"""
+        with self._cond:
+            return {
+                lane: {
+                    "waiting": s.waiting,
+                    "acquired": s.acquired,
+                    "timeouts": s.timeouts,
+                    "avg_wait": s.total_wait / s.acquired if s.acquired else 0.0,
+                    "max_wait": s.max_wait,
+                }
+                for lane, s in self._stats.items()
+            }
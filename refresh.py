@@ -0,0 +1,81 @@
+import heapq
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+
+def key_jitter(key, max_jitter):
+    """Stable per-key delay in [0, max_jitter) so refreshes of different titles spread out"""
+    return (zlib.crc32(repr(key).encode("utf-8")) % 1000) / 1000 * max_jitter
+
+
+class RefreshScheduler:
+    """Runs background refreshes on a small worker pool after a per-key jittered delay.
+
+    A key is refreshed at most once at a time; repeat requests while it is pending are dropped.
+    """
+
+    def __init__(self, workers=2, jitter=5.0):
+        self.jitter = jitter
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tmdb-refresh")
+        self._heap = []  # (due, sequence, key, fn)
+        self._pending = set()
+        self._sequence = 0
+        self._cond = threading.Condition()
+        self.scheduled = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="tmdb-refresh-scheduler", daemon=True)
+        self._thread.start()
+
+    def schedule(self, key, fn):
+        """Run fn() in the background after key's jitter delay; returns False if key is already pending"""
+        with self._cond:
+            if key in self._pending:
+                self.deduplicated += 1
+                return False
+            self._pending.add(key)
+            self._sequence += 1
+            heapq.heappush(self._heap, (time.monotonic() + key_jitter(key, self.jitter), self._sequence, key, fn))
+            self.scheduled += 1
+            self._cond.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    self._cond.wait(self._heap[0][0] - time.monotonic() if self._heap else None)
+                _, _, key, fn = heapq.heappop(self._heap)
+            self._executor.submit(self._execute, key, fn)
+
+    def _execute(self, key, fn):
+        failed = False
+        try:
+            fn()
+        except Exception as e:
+            failed = True
+            logger.error(f"Background refresh of {key} failed: {e}")
+        with self._cond:
+            # Counted under the lock so concurrent workers don't lose increments
+            if failed:
+                self.failed += 1
+            else:
+                self.completed += 1
+            self._pending.discard(key)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "scheduled": self.scheduled,
+                "deduplicated": self.deduplicated,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
@@ -0,0 +1,196 @@
+import logging
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+
+from telegram import Bot, Update
+from telegram.ext import CallbackContext, Dispatcher
+from telegram.utils.request import Request
+
+from metrics import registry
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+# Seconds between the metric snapshots each shard sends to the ingress process for /metrics
+METRICS_INTERVAL = 5
+# Seconds the ingress dispatcher waits for room in a shard's queue before dropping the update
+FORWARD_TIMEOUT = 1
+# Seconds between checks for shard processes that died
+WATCH_INTERVAL = 1
+
+
+def shard_key(update):
+    """Chat the update belongs to (falling back to the user), so one chat always lands on one shard"""
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id  # Inline queries and inline-message callbacks have no chat
+    return update.update_id
+
+
+def _publish_metrics(index, metrics, interval):
+    # Runs in a shard; a full queue just means the ingress process will get the next snapshot instead
+    while True:
+        time.sleep(interval)
+        try:
+            metrics.put_nowait((index, registry.snapshot()))
+        except queue.Full:
+            pass
+
+
+def _run_worker(index, updates, metrics, token, setup, dispatcher_workers, request, metrics_interval):
+    # Runs in a spawned process; the ingress process owns shutdown, so Ctrl-C must not kill us mid-update
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    bot = Bot(token, request=request(con_pool_size=dispatcher_workers + 4))
+    dispatcher = Dispatcher(bot, queue.Queue(), workers=dispatcher_workers, use_context=True)
+    setup(dispatcher)
+    threading.Thread(target=dispatcher.start, name=f"dispatcher-{index}", daemon=True).start()
+    threading.Thread(target=_publish_metrics, args=(index, metrics, metrics_interval), name=f"metrics-{index}", daemon=True).start()
+    logger.info(f"Shard {index} ready")
+
+    while True:
+        data = updates.get()
+        if data is None:
+            break
+        dispatcher.update_queue.put(Update.de_json(data, bot))
+
+    dispatcher.stop()
+
+
+class ShardedDispatcher:
+    """Fans updates out to worker processes, each running its own Dispatcher.
+
+    Updates are routed by chat, so a chat's updates are always handled in order by
+    the same process. setup(dispatcher) registers the handlers in every worker and
+    must be a module-level function, since workers are started with "spawn"; so
+    must request(**kwargs), which builds each worker's Bot API Request (e.g. one
+    that records call latencies). Every worker periodically sends a snapshot of
+    its metrics back, which metric_snapshots() hands to the ingress registry.
+
+    A shard that dies is restarted with a fresh queue (the updates queued for it are
+    lost). Updates for a shard whose queue stays full are dropped after
+    forward_timeout seconds rather than stalling every other chat's updates.
+    """
+
+    def __init__(self, token, setup, shards, dispatcher_workers=4, queue_size=1000, request=Request,
+                 metrics_interval=METRICS_INTERVAL, forward_timeout=FORWARD_TIMEOUT):
+        self._context = multiprocessing.get_context("spawn")
+        self._worker_args = (token, setup, dispatcher_workers, request, metrics_interval)
+        self.queue_size = queue_size
+        self.forward_timeout = forward_timeout
+        self.metrics = self._context.Queue(maxsize=shards * 2)
+        self._snapshots = {}  # shard index -> latest metric snapshot
+        self.queues = [None] * shards
+        self.processes = [None] * shards
+        for index in range(shards):
+            self._create(index)
+        self.forwarded = [0] * shards
+        self.dropped = [0] * shards
+        self.restarts = [0] * shards
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def _create(self, index):
+        self.queues[index] = self._context.Queue(maxsize=self.queue_size)
+        self.processes[index] = self._context.Process(
+            target=_run_worker,
+            args=(index, self.queues[index], self.metrics) + self._worker_args,
+            name=f"shard-{index}",
+            daemon=True,
+        )
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        threading.Thread(target=self._collect_metrics, name="shard-metrics", daemon=True).start()
+        threading.Thread(target=self._watch, name="shard-watch", daemon=True).start()
+
+    def _watch(self):
+        while not self._stopping:
+            time.sleep(WATCH_INTERVAL)
+            for index in range(len(self.processes)):
+                self._ensure_alive(index)
+
+    def _ensure_alive(self, index):
+        """Restart shard index if its process died; returns False while shutting down"""
+        with self._lock:
+            if self._stopping:
+                return False
+            process = self.processes[index]
+            if process.is_alive():
+                return True
+            # A worker killed mid-get() can leave its queue locked, so the new one gets a fresh queue
+            logger.error(f"{process.name} exited with code {process.exitcode}, restarting it")
+            self._snapshots.pop(index, None)
+            self._create(index)
+            self.processes[index].start()
+            self.restarts[index] += 1
+            return True
+
+    def healthy(self):
+        """True while every shard process is running"""
+        return all(process.is_alive() for process in self.processes)
+
+    def _collect_metrics(self):
+        while True:
+            index, snapshot = self.metrics.get()
+            self._snapshots[index] = snapshot
+
+    def metric_snapshots(self):
+        """Latest metric snapshot of every shard, for MetricsRegistry.add_source()"""
+        return list(self._snapshots.values())
+
+    def forward(self, update: Update, context: CallbackContext) -> None:
+        """Handler for the ingress dispatcher: hand the update to its shard, dropping it if the shard is stuck"""
+        index = shard_key(update) % len(self.queues)
+        if not self._ensure_alive(index):
+            return
+        try:
+            self.queues[index].put(update.to_dict(), timeout=self.forward_timeout)
+        except queue.Full:
+            self.dropped[index] += 1
+            logger.warning(f"shard-{index} queue full for {self.forward_timeout}s, dropping update {update.update_id}")
+            return
+        self.forwarded[index] += 1
+
+    def stop(self, timeout=10):
+        """Let every shard finish its queued updates, then wait for the processes to exit"""
+        with self._lock:
+            self._stopping = True
+        for updates in self.queues:
+            try:
+                updates.put(None, timeout=self.forward_timeout)
+            except queue.Full:
+                pass  # A stuck shard is killed below
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                # Workers ignore SIGTERM (see _run_worker), so terminate() would not stop them
+                logger.error(f"{process.name} did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+    def stats(self):
+        return [
+            {
+                "shard": index,
+                "alive": process.is_alive(),
+                "restarts": self.restarts[index],
+                "forwarded": self.forwarded[index],
+                "dropped": self.dropped[index],
+                "queued": _qsize(updates),
+            }
+            for index, (process, updates) in enumerate(zip(self.processes, self.queues))
+        ]
+
+
+def _qsize(updates):
+    try:
+        return updates.qsize()
+    except NotImplementedError:
+        return None  # Not available on macOS
@@ -0,0 +1,35 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The Telegram and TMDb stand-ins live with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Must be set before config is imported; load_dotenv() leaves variables that are already set alone
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test")
+os.environ.setdefault("TMDB_API_KEY", "test")
+os.environ["ASYNC_HANDLERS"] = "false"
+os.environ["UPDATE_MODE"] = "polling"
+os.environ["TMDB_DISK_CACHE_PATH"] = ""
+os.environ["SHARD_WORKERS"] = "0"
+
+
+class Clock:
+    """Stand-in for time.monotonic() that only moves when a test advances it"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
@@ -0,0 +1,113 @@
+from admission import AdmissionController, CHAT_LIMIT, CLASS_LIMIT, DEBOUNCED
+
+
+def controller(**kwargs):
+    kwargs.setdefault("class_limits", {"details": 2, "gallery": 1, "send_all": 1})
+    return AdmissionController(**kwargs)
+
+
+def test_cheap_routes_are_admitted_without_ticket(clock):
+    control = controller()
+    assert control.admit("back_to_search", 1, 1, "~8") == (None, None)
+    assert control.stats()["admitted"] == 0
+
+
+def test_repeated_tap_is_debounced(clock):
+    control = controller(debounce_window=1.0)
+    ticket, reason = control.admit("details", 1, 1, "a")
+    assert ticket is not None and reason is None
+    ticket.release()
+
+    clock.now += 0.5
+    assert control.admit("details", 1, 1, "a") == (None, DEBOUNCED)
+    # Shed taps don't extend the window
+    clock.now += 0.6
+    ticket, reason = control.admit("details", 1, 1, "a")
+    assert reason is None
+    ticket.release()
+
+
+def test_latest_tap_on_a_message_supersedes_older_ones(clock):
+    control = controller(max_per_chat=2, class_limits={"gallery": 3})
+    page1, _ = control.admit("lang_posters", 1, 1, "p1")
+    page2, reason = control.admit("lang_posters", 1, 1, "p2")
+    assert reason is None
+    assert control.is_stale(page1) and not control.is_stale(page2)
+    assert control.stats()["superseded"] == 1
+
+    # Superseded taps still count until they are released, so one chat can't take every worker
+    assert control.admit("lang_posters", 1, 1, "p3") == (None, CHAT_LIMIT)
+    assert control.stats()["in_flight"] == {"gallery": 2}
+    other, reason = control.admit("posters", 2, 1, "g")
+    assert reason is None
+
+    page1.release()
+    page3, reason = control.admit("lang_posters", 1, 1, "p3")
+    assert reason is None and control.is_stale(page2)
+    for ticket in (page2, page3, other):
+        ticket.release()
+    assert control.stats()["in_flight"] == {}
+    assert control.stats()["chats_in_flight"] == 0
+
+
+def test_chat_limit_counts_callbacks(clock):
+    control = controller(max_per_chat=2)
+    first, _ = control.admit("details", 1, 1, "a")
+    second, _ = control.admit("posters", 1, 2, "b")
+    assert control.admit("details", 1, 3, "c") == (None, CHAT_LIMIT)
+    # Another chat is unaffected
+    other, reason = control.admit("details", 2, 1, "a")
+    assert reason is None
+
+    first.release()
+    third, reason = control.admit("details", 1, 3, "c")
+    assert reason is None
+    for ticket in (second, other, third):
+        ticket.release()
+
+
+def test_class_limit_is_global(clock):
+    control = controller()
+    first, _ = control.admit("send_all", 1, 1, "s")
+    assert control.admit("send_all", 2, 1, "s") == (None, CLASS_LIMIT)
+    # Other classes have their own limits
+    details, reason = control.admit("details", 2, 2, "d")
+    assert reason is None
+
+    first.release()
+    second, reason = control.admit("send_all", 2, 1, "s")
+    assert reason is None
+    assert control.stats()["shed"] == {DEBOUNCED: 0, CHAT_LIMIT: 0, CLASS_LIMIT: 1}
+    for ticket in (details, second):
+        ticket.release()
+
+
+def test_release_is_idempotent_and_clears_current(clock):
+    control = controller()
+    ticket, _ = control.admit("details", 1, 1, "a")
+    control.activate(ticket)
+    assert control.current() is ticket
+    ticket.release()
+    ticket.release()
+    assert control.current() is None
+    assert control.stats()["in_flight"] == {}
+    assert control.stats()["chats_in_flight"] == 0
+
+
+def test_detach_hands_the_ticket_over(clock):
+    control = controller()
+    ticket, _ = control.admit("details", 1, 1, "a")
+    control.activate(ticket)
+    assert control.detach() is ticket
+    assert control.current() is None
+    assert control.stats()["in_flight"] == {"details": 1}
+    ticket.release()
+
+
+def test_is_stale_ignores_missing_and_current_tickets(clock):
+    control = controller()
+    ticket, _ = control.admit("details", 1, 1, "a")
+    assert not control.is_stale(None)
+    assert not control.is_stale(ticket)
+    assert control.stats()["superseded"] == 0
+    ticket.release()
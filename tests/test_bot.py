@@ -0,0 +1,75 @@
+import queue
+import time
+
+import pytest
+from telegram import Update
+from telegram.ext import Updater
+
+import bot
+from stubs import FakeBot
+
+
+def test_create_updater_starts_polling():
+    fake_bot = FakeBot()
+    updater = bot.create_updater(fake_bot)
+    assert isinstance(updater, Updater)
+    assert updater.dispatcher.update_queue is bot.update_queue
+    assert updater.job_queue is updater.dispatcher.job_queue is not None
+
+    updater.start_polling(poll_interval=0.01)
+    try:
+        deadline = time.monotonic() + 5
+        while not fake_bot.calls["getUpdates"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert updater.running
+        assert updater.dispatcher.running
+        assert fake_bot.calls["getUpdates"]
+    finally:
+        updater.stop()
+
+
+UPDATE = {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "Inception"}}
+
+
+@pytest.fixture
+def webhook(monkeypatch):
+    monkeypatch.setattr(bot, "webhook_bot", FakeBot())
+    monkeypatch.setattr(bot, "WEBHOOK_SECRET", "s3cret")
+    monkeypatch.setattr(bot, "update_queue", queue.Queue(maxsize=1))
+    return bot.create_app().test_client()
+
+
+def test_webhook_rejects_wrong_secret(webhook):
+    response = webhook.post(bot.WEBHOOK_PATH, json=UPDATE, headers={"X-Telegram-Bot-Api-Secret-Token": "guess"})
+    assert response.status_code == 403
+    assert webhook.post(bot.WEBHOOK_PATH, json=UPDATE).status_code == 403
+    assert bot.update_queue.empty()
+
+
+def test_webhook_queues_updates_and_sheds_when_full(webhook):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+    assert webhook.post(bot.WEBHOOK_PATH, json=UPDATE, headers=headers).status_code == 200
+    assert bot.update_queue.get_nowait().message.text == "Inception"
+
+    assert webhook.post(bot.WEBHOOK_PATH, json=UPDATE, headers=headers).status_code == 200
+    # Telegram redelivers on 503, so a full queue answers that instead of blocking
+    assert webhook.post(bot.WEBHOOK_PATH, json=UPDATE, headers=headers).status_code == 503
+    assert bot.update_queue.qsize() == 1
+
+
+def test_superseded_callback_is_answered_without_running(monkeypatch):
+    fake_bot = FakeBot()
+    monkeypatch.setattr(bot, "admission", bot.AdmissionController(class_limits={"gallery": 2}))
+    update = Update.de_json({"update_id": 1, "callback_query": {
+        "id": "1", "chat_instance": "1", "data": "p1", "from": {"id": 1, "is_bot": False, "first_name": "A"},
+        "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "Posters"},
+    }}, fake_bot)
+    older, _ = bot.admission.admit("lang_posters", 1, 1, "p1")
+    newer, _ = bot.admission.admit("lang_posters", 1, 1, "p2")
+    ran = []
+
+    bot.run_callback(update, None, "lang_posters", lambda *args: ran.append(args), (), older)
+    assert ran == []
+    assert fake_bot.calls["answerCallbackQuery"] == 1
+    assert bot.admission.stats()["in_flight"] == {"gallery": 1}
+    newer.release()
@@ -0,0 +1,93 @@
+from cache import DerivedCache, TTLCache
+from images import ImageIndex
+from projection import Image
+
+
+def test_expired_entries_are_served_stale_within_grace(clock):
+    ttl_cache = TTLCache(default_ttl=10, grace=5)
+    ttl_cache.set("key", {"id": 1})
+    clock.now += 12
+    assert ttl_cache.lookup("key") == ({"id": 1}, True)
+    assert ttl_cache.get("key") is None
+    clock.now += 5
+    assert ttl_cache.lookup("key") == (None, False)
+    assert len(ttl_cache) == 0
+    assert ttl_cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    ttl_cache = TTLCache(max_entries=2)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1 and ttl_cache.get("c") == 3
+    assert ttl_cache.stats()["evictions"] == 1
+
+
+def test_byte_limit(clock):
+    ttl_cache = TTLCache(max_bytes=10)
+    ttl_cache.set("a", "x", size=6)
+    ttl_cache.set("b", "y", size=6)
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.stats()["bytes"] == 6
+    # Values that could never fit are refused without flushing the rest
+    ttl_cache.set("c", "z", size=11)
+    assert ttl_cache.get("c") is None and ttl_cache.get("b") == "y"
+
+
+def test_derived_values_are_built_once_per_payload(clock):
+    ttl_cache = TTLCache()
+    cards = DerivedCache(ttl_cache, "card")
+    payload = {"id": 1}
+    ttl_cache.set("details", payload)
+    built = []
+
+    def build(source):
+        built.append(source)
+        return f"card {source['id']}"
+
+    assert cards.get(payload, build) == "card 1"
+    assert cards.get(payload, build) == "card 1"
+    assert len(built) == 1
+    # A refreshed payload replaces the entry and its derived values
+    refreshed = {"id": 2}
+    ttl_cache.set("details", refreshed)
+    assert cards.get(refreshed, build) == "card 2"
+    assert cards.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+
+def test_derived_values_go_with_evicted_payloads(clock):
+    ttl_cache = TTLCache(max_bytes=10)
+    cards = DerivedCache(ttl_cache, "card")
+    payload = {"id": 1}
+    ttl_cache.set("a", payload, size=6)
+    cards.get(payload, lambda source: "card")
+    ttl_cache.set("b", {"id": 2}, size=6)
+    # Nothing keeps the evicted payload alive, and uncached payloads aren't kept either
+    assert cards.stats()["entries"] == 0
+    assert cards.get(payload, lambda source: "rebuilt") == "rebuilt"
+    assert cards.stats()["entries"] == 0
+
+
+def test_derived_values_count_against_the_byte_limit(clock):
+    ttl_cache = TTLCache(max_bytes=100)
+    pages = DerivedCache(ttl_cache, "pages", size=len)
+    payload = {"id": 1}
+    ttl_cache.set("a", payload, size=10)
+    assert pages.get(payload, lambda source: "x" * 30, key=1) == "x" * 30
+    assert pages.get(payload, lambda source: "y" * 20, key=2) == "y" * 20
+    assert ttl_cache.stats()["bytes"] == 60
+    assert pages.stats()["entries"] == 2
+
+    # Rendering more pages pushes older entries out instead of growing past the limit
+    ttl_cache.set("b", {"id": 2}, size=50)
+    assert ttl_cache.stats()["bytes"] == 50
+    assert pages.stats()["entries"] == 0
+
+
+def test_image_index_size_grows_with_its_images():
+    details = {"images": {"posters": [Image(f"/{number}.jpg", "en") for number in range(40)]}}
+    small = ImageIndex({"images": {}}).size_in_bytes()
+    assert ImageIndex(details).size_in_bytes() > small > 0
@@ -0,0 +1,92 @@
+import pytest
+
+from callbacks import ALPHABET, MAX_CALLBACK_BYTES, ROUTE_ARITY, CallbackStateTable, encode_int, parse_legacy
+from disk_cache import SQLiteCache
+
+
+@pytest.mark.parametrize("data, expected", [
+    ("details_movie_27205_en-US", ("details", ("movie", "27205", "en-US"))),
+    ("send_all_tv_1399_en-US", ("send_all", ("tv", "1399", "en-US"))),
+    ("lang_backdrops_movie_12345_en-US_null_7", ("lang_backdrops", ("movie", "12345", "en-US", "null", "7"))),
+    # Buttons from before pagination had no page number
+    ("lang_posters_tv_1399_en-US_en", ("lang_posters", ("tv", "1399", "en-US", "en", "1"))),
+    ("back_to_search", ("back_to_search", ())),
+    ("no_action", ("no_action", ())),
+    ("posters_movie_1", (None, None)),
+    ("bogus", (None, None)),
+])
+def test_parse_legacy(data, expected):
+    assert parse_legacy(data) == expected
+
+
+def test_encode_int():
+    assert encode_int(0) == ALPHABET[0]
+    assert encode_int(len(ALPHABET) + 1) == ALPHABET[1] * 2
+    assert len(encode_int(2 ** 64 - 1)) == 11
+
+
+def test_tokens_carry_their_arguments():
+    table = CallbackStateTable()
+    token = table.encode("lang_posters", "movie", 27205, "en-US", "null", 2)
+    assert len(token.encode()) <= MAX_CALLBACK_BYTES
+    assert len(table) == 0
+    # A fresh table, as after a restart or in another shard, resolves it
+    assert CallbackStateTable().decode(token) == ("lang_posters", ("movie", "27205", "en-US", "null", "2"))
+
+
+def test_routes_without_arguments():
+    table = CallbackStateTable()
+    assert table.decode(table.encode("back_to_search")) == ("back_to_search", ())
+
+
+def test_unknown_and_malformed_tokens():
+    table = CallbackStateTable()
+    assert table.decode("~?") == (None, None)
+    token = table.encode("details", "movie", "1", "en-US")
+    assert table.decode(token + ":extra") == (None, None)
+
+
+def test_long_arguments_are_stored():
+    table = CallbackStateTable()
+    args = ("movie", "1", "x" * 80)
+    token = table.encode("details", *args)
+    assert len(token.encode()) <= MAX_CALLBACK_BYTES
+    assert table.encode("details", *args) == token
+    assert table.decode(token) == ("details", args)
+    assert table.stats()["issued"] == 1 and table.stats()["reused"] == 1
+    # Without a store they are lost on restart
+    assert CallbackStateTable().decode(token) == ("details", None)
+
+
+def test_stored_arguments_survive_restart(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite"))
+    args = ("movie", "1", "en-US", "x" * 80, "3")
+    token = CallbackStateTable(store=store).encode("lang_logos", *args)
+
+    restarted = CallbackStateTable(store=SQLiteCache(str(tmp_path / "cache.sqlite")))
+    assert restarted.decode(token) == ("lang_logos", args)
+    assert len(restarted) == 1
+
+
+def test_stored_arguments_expire(clock):
+    table = CallbackStateTable(ttl=10)
+    token = table.encode("details", "movie", "1", "x" * 80)
+    clock.now += 11
+    assert table.decode(token) == ("details", None)
+    assert table.stats()["expired"] == 1
+
+
+def test_table_is_bounded():
+    table = CallbackStateTable(max_entries=2)
+    tokens = [table.encode("details", "movie", str(number), "x" * 80) for number in range(3)]
+    assert len(table) == 2
+    assert table.decode(tokens[0]) == ("details", None)
+    assert table.decode(tokens[2])[1] is not None
+    assert table.stats()["evictions"] == 1
+
+
+def test_every_route_round_trips():
+    table = CallbackStateTable()
+    for route, arity in ROUTE_ARITY.items():
+        args = tuple(str(index) for index in range(arity))
+        assert table.decode(table.encode(route, *args)) == (route, args)
@@ -0,0 +1,38 @@
+from disk_cache import SQLiteCache
+
+
+def payload(number):
+    # Incompressible enough that every entry takes a few hundred bytes on disk
+    return {"id": number, "blob": "".join(chr(0x4e00 + (number * 7919 + index * 104729) % 20000) for index in range(200))}
+
+
+def test_round_trip_and_expiry(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"))
+    cache.set(("details", "movie", 1), payload(1), ttl=60)
+    cache.set(("details", "movie", 2), payload(2), ttl=-1)
+    value, remaining = cache.get(("details", "movie", 1))
+    assert value == payload(1) and 0 < remaining <= 60
+    assert cache.get(("details", "movie", 2)) is None
+    # Survives a reopen
+    assert SQLiteCache(str(tmp_path / "cache.sqlite")).get(("details", "movie", 1))[0] == payload(1)
+
+
+def test_compacts_to_budget(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.sqlite"), max_bytes=20000)
+    for number in range(100):
+        cache.set(("details", "movie", number), payload(number), ttl=60)
+    assert cache.compactions
+    assert cache.stats()["bytes"] <= 20000
+    assert cache.get(("details", "movie", 99)) is not None
+
+
+def test_processes_sharing_a_file_stay_within_budget(tmp_path):
+    # Each instance stands in for a shard process writing to the same file
+    path = str(tmp_path / "cache.sqlite")
+    shards = [SQLiteCache(path, max_bytes=20000) for _ in range(4)]
+    # Each writes less than max_bytes itself, but three times that together
+    for number in range(120):
+        shards[number % 4].set(("details", "movie", number), payload(number), ttl=60)
+    fresh = SQLiteCache(path, max_bytes=20000)
+    assert fresh.stats()["bytes"] <= 20000 * (1 + 4 * 0.05)
+    assert sum(shard.compactions for shard in shards) >= 1
@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import bot
+from image_proxy import ImageStore
+from stubs import ImageStub
+from tmdb_api import create_session
+
+
+@pytest.fixture
+def images():
+    stub = ImageStub(image_bytes=1000, missing={"missing.jpg"}).start()
+    yield stub
+    stub.stop()
+
+
+def make_store(tmp_path, images, max_bytes=10_000):
+    return ImageStore(str(tmp_path), create_session(), f"{images.url}/t/p", ["w500", "original"], max_bytes=max_bytes)
+
+
+def test_rejects_unknown_sizes_and_traversal(tmp_path, images):
+    store = make_store(tmp_path, images)
+    assert store.get("w9999", "/a.jpg") is None
+    assert store.get("w500", "/../index.sqlite") is None
+    assert store.get("w500", "a.jpg") is None
+    assert store.get("w500", "/missing.jpg") is None
+    assert store.stats()["failures"] == 1
+    assert sum(images.requests.values()) == 1
+
+
+def test_hits_are_served_from_disk(tmp_path, images):
+    store = make_store(tmp_path, images)
+    path, digest, content_type = store.get("w500", "/a.jpg")
+    assert store.get("w500", "/a.jpg") == (path, digest, content_type)
+    with open(path, "rb") as f:
+        assert f.read() == images.image("a.jpg")
+    assert content_type == "image/jpeg"
+    assert images.requests["a.jpg"] == 1
+    assert store.stats()["hits"] == 1 and store.stats()["misses"] == 1
+
+
+def test_identical_images_are_stored_once(tmp_path, images):
+    store = make_store(tmp_path, images)
+    # The stub serves the same bytes for a name at every size
+    small = store.get("w500", "/a.jpg")
+    large = store.get("original", "/a.jpg")
+    assert small == large
+    assert store.stats()["bytes"] == 1000
+    assert len(os.listdir(os.path.dirname(small[0]))) == 1
+
+
+def test_evicts_least_recently_requested_over_budget(tmp_path, images):
+    store = make_store(tmp_path, images, max_bytes=2500)
+    first = store.get("w500", "/a.jpg")
+    store.get("w500", "/b.jpg")
+    store.get("w500", "/c.jpg")
+
+    # 3000 bytes is over budget, so the oldest image goes until 80% (2000) is left
+    assert store.stats()["bytes"] == 2000
+    assert store.stats()["evictions"] == 1
+    assert not os.path.exists(first[0])
+    store.get("w500", "/a.jpg")
+    assert images.requests["a.jpg"] == 2
+    # The byte count survives a restart
+    assert make_store(tmp_path, images, max_bytes=2500).stats()["bytes"] == 2000
+
+
+@pytest.fixture
+def proxy(tmp_path, images, monkeypatch):
+    monkeypatch.setattr(bot, "image_store", make_store(tmp_path, images))
+    return bot.create_app().test_client()
+
+
+def test_proxy_serves_images_with_etag(proxy, images):
+    response = proxy.get("/img/w500/a.jpg")
+    assert response.status_code == 200
+    assert response.data == images.image("a.jpg")
+    assert response.headers["Content-Type"] == "image/jpeg"
+    etag = response.headers["ETag"]
+
+    response = proxy.get("/img/w500/a.jpg", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert images.requests["a.jpg"] == 1
+
+
+def test_proxy_answers_404_for_unavailable_images(proxy):
+    assert proxy.get("/img/w9999/a.jpg").status_code == 404
+    assert proxy.get("/img/w500/missing.jpg").status_code == 404
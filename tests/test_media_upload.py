@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+
+from media_upload import AlbumSender, ByteBudget
+from stubs import FakeBot, ImageStub
+from tmdb_api import create_session
+
+
+class AlbumBot(FakeBot):
+    """Records the images of every album it is sent"""
+
+    def __init__(self):
+        super().__init__()
+        self.albums = []
+
+    def _post(self, endpoint, data=None, timeout=None, api_kwargs=None):
+        if endpoint == "sendMediaGroup":
+            self.albums.append([(item.media.input_file_content, getattr(item, "caption", None)) for item in data["media"]])
+        return super()._post(endpoint, data, timeout, api_kwargs)
+
+
+@pytest.fixture
+def images():
+    stub = ImageStub(image_bytes=1000, missing={"missing.jpg"}).start()
+    yield stub
+    stub.stop()
+
+
+def urls(images, count):
+    return [f"{images.url}/t/p/original/{number}.jpg" for number in range(count)]
+
+
+def test_budget_refuses_and_waits():
+    budget = ByteBudget(100)
+    assert budget.try_acquire(60)
+    assert not budget.try_acquire(60)
+
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (budget.acquire(60), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+    budget.release(60)
+    assert acquired.wait(1)
+    waiter.join()
+    assert budget.in_use == 60 and budget.peak == 60 and budget.waits == 1
+
+
+def test_images_are_sent_as_ordered_albums(images):
+    sender = AlbumSender(create_session(), max_image_bytes=2000)
+    fake_bot = AlbumBot()
+    timings = sender.send(fake_bot, 1, urls(images, 23), caption="Inception")
+
+    assert [timing["images"] for timing in timings] == [10, 10, 3]
+    sent = [image for album in fake_bot.albums for image in album]
+    assert [data for data, _ in sent] == [images.image(f"{number}.jpg") for number in range(23)]
+    # Only the first image of the first album carries the caption
+    assert [caption for _, caption in sent] == ["Inception"] + [None] * 22
+    assert sender.stats()["bytes_in_use"] == 0
+
+
+def test_memory_stays_within_budget(images):
+    images.latency = 0.01
+    sender = AlbumSender(create_session(), max_bytes=6000, concurrency=4, max_image_bytes=2000)
+    fake_bot = AlbumBot()
+    sender.send(fake_bot, 1, urls(images, 25))
+
+    stats = sender.stats()
+    assert stats["images_sent"] == 25
+    assert stats["peak_bytes"] <= 6000
+    assert stats["bytes_in_use"] == 0
+
+
+def test_failed_downloads_are_skipped(images):
+    sender = AlbumSender(create_session(), max_image_bytes=2000)
+    fake_bot = AlbumBot()
+    sender.send(fake_bot, 1, urls(images, 3) + [f"{images.url}/t/p/original/missing.jpg"])
+    assert len(fake_bot.albums) == 1 and len(fake_bot.albums[0]) == 3
+    assert sender.stats()["images_failed"] == 1
+    assert sender.stats()["bytes_in_use"] == 0
+
+
+def test_oversized_images_are_refused(images):
+    sender = AlbumSender(create_session(), max_image_bytes=500)
+    sender.send(AlbumBot(), 1, urls(images, 2))
+    assert sender.stats()["images_failed"] == 2
+    assert sender.stats()["bytes_in_use"] == 0
+
+
+def test_repeated_taps_do_not_queue_more_sends(images):
+    images.latency = 0.05
+    sender = AlbumSender(create_session(), max_image_bytes=2000)
+    fake_bot = AlbumBot()
+    first = sender.submit(fake_bot, 1, urls(images, 3))
+    assert sender.submit(fake_bot, 1, urls(images, 3)) is None
+    assert sender.stats()["sends_skipped"] == 1
+    first.result(timeout=5)
+    # The chat can send again once its first send is done
+    deadline = time.monotonic() + 1
+    while (second := sender.submit(fake_bot, 1, urls(images, 1))) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert second is not None
+    second.result(timeout=5)
+    assert len(fake_bot.albums) == 2
+
+
+def test_budget_covers_the_upload_request_body(images):
+    sender = AlbumSender(create_session(), max_bytes=10_000, max_image_bytes=2000)
+    in_use = []
+
+    class BudgetBot(AlbumBot):
+        def _post(self, endpoint, data=None, timeout=None, api_kwargs=None):
+            if endpoint == "sendMediaGroup":
+                in_use.append(sender.budget.in_use)
+            return super()._post(endpoint, data, timeout, api_kwargs)
+
+    sender.send(BudgetBot(), 1, urls(images, 3))
+    # Each image is reserved twice while PTB encodes the album: its bytes and the request body
+    assert in_use == [2 * 3 * 1000]
+    assert sender.stats()["peak_bytes"] <= 10_000
+    assert sender.stats()["bytes_in_use"] == 0
@@ -0,0 +1,60 @@
+import threading
+
+from metrics import MetricsRegistry
+
+
+def test_threads_record_into_one_total():
+    registry = MetricsRegistry()
+    taps = registry.counter("taps_total", "Taps", ("route",))
+    threads = [threading.Thread(target=lambda: [taps.inc("details") for _ in range(100)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'taps_total{route="details"} 400' in registry.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    seconds = registry.histogram("handler_seconds", "Latency", ("handler",), buckets=(0.1, 1.0))
+    seconds.observe(0.05, "details")
+    seconds.observe(0.5, "details")
+    text = registry.render()
+    assert 'handler_seconds_bucket{handler="details",le="0.1"} 1' in text
+    assert 'handler_seconds_bucket{handler="details",le="+Inf"} 2' in text
+    assert 'handler_seconds_count{handler="details"} 2' in text
+
+
+def test_sources_are_added_to_local_values():
+    worker = MetricsRegistry()
+    worker.counter("taps_total", "Taps", ("route",)).inc("details", value=3)
+    ingress = MetricsRegistry()
+    ingress.counter("taps_total", "Taps", ("route",)).inc("details")
+    ingress.add_source(lambda: [worker.snapshot()])
+    assert 'taps_total{route="details"} 4' in ingress.render()
+    # The ingress snapshot only carries its own values
+    assert list(ingress.snapshot().values()) == [[1]]
+
+
+def test_failing_source_does_not_break_scrape():
+    registry = MetricsRegistry()
+    registry.counter("taps_total", "Taps").inc()
+
+    def broken():
+        raise RuntimeError("shard gone")
+
+    registry.add_source(broken)
+    assert "taps_total 1" in registry.render()
+
+
+def test_collected_values_are_summed_across_processes():
+    worker = MetricsRegistry()
+    worker.collect("cache_hits_total", "Hits", lambda: {("details",): 5}, labels=("cache",), kind="counter")
+    worker.collect("cache_hit_ratio", "Ratio", lambda: {("details",): 0.5}, labels=("cache",), summed=False)
+    ingress = MetricsRegistry()
+    ingress.collect("cache_hits_total", "Hits", lambda: {("details",): 1}, labels=("cache",), kind="counter")
+    ingress.collect("cache_hit_ratio", "Ratio", lambda: {("details",): 0.25}, labels=("cache",), summed=False)
+    ingress.add_source(lambda: [worker.snapshot(), worker.snapshot()])
+    text = ingress.render()
+    assert 'cache_hits_total{cache="details"} 11' in text
+    assert 'cache_hit_ratio{cache="details"} 0.25' in text
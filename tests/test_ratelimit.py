@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+from ratelimit import BACKGROUND, INTERACTIVE, TokenBucket
+from tmdb_async import AsyncTMDbAPI
+
+
+def test_burst_then_refill():
+    bucket = TokenBucket(rate=100, burst=3)
+    assert all(bucket.try_acquire() == 0 for _ in range(3))
+    delay = bucket.try_acquire()
+    assert 0 < delay <= 0.011
+    time.sleep(delay + 0.005)
+    assert bucket.try_acquire() == 0
+
+
+def test_zero_rate_disables_limiting():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert all(bucket.acquire(timeout=0) for _ in range(100))
+
+
+def test_acquire_times_out():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.05)
+    assert bucket.stats()[INTERACTIVE]["timeouts"] == 1
+
+
+def test_background_yields_to_registered_waiter():
+    bucket = TokenBucket(rate=50, burst=5)
+    bucket.add_waiter(INTERACTIVE)
+    # Tokens are available, but an interactive caller is waiting for one
+    assert bucket.try_acquire(BACKGROUND) > 0
+    assert not bucket.acquire(BACKGROUND, timeout=0.05)
+    assert bucket.try_acquire(INTERACTIVE) == 0
+    bucket.remove_waiter(INTERACTIVE, waited=0.0)
+    assert bucket.acquire(BACKGROUND, timeout=0.05)
+
+    stats = bucket.stats()
+    assert stats[INTERACTIVE]["waiting"] == 0
+    assert stats[INTERACTIVE]["acquired"] == 1
+    assert stats[BACKGROUND]["timeouts"] == 1
+
+
+def test_async_caller_is_served_before_background_threads():
+    bucket = TokenBucket(rate=20, burst=1)
+    client = AsyncTMDbAPI(SimpleNamespace(limiter=bucket, timeout=2))
+    assert bucket.acquire(BACKGROUND)  # Drain the bucket
+    order = []
+
+    def background():
+        bucket.acquire(BACKGROUND, timeout=2)
+        order.append(BACKGROUND)
+
+    async def interactive():
+        task = asyncio.ensure_future(client._acquire(INTERACTIVE))
+        await asyncio.sleep(0)  # Registered before the background thread starts waiting
+        thread = threading.Thread(target=background)
+        thread.start()
+        assert await task
+        order.append(INTERACTIVE)
+        return thread
+
+    asyncio.run(interactive()).join()
+    assert order == [INTERACTIVE, BACKGROUND]
+    assert bucket.stats()[INTERACTIVE]["waiting"] == 0
@@ -0,0 +1,22 @@
+import time
+
+from refresh import RefreshScheduler
+
+
+def test_counts_every_refresh_from_concurrent_workers():
+    scheduler = RefreshScheduler(workers=8, jitter=0)
+
+    def refresh(number):
+        if number % 2:
+            raise ValueError("upstream error")
+
+    for number in range(400):
+        assert scheduler.schedule(number, lambda number=number: refresh(number))
+    deadline = time.monotonic() + 5
+    while scheduler.stats()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    stats = scheduler.stats()
+    assert stats["pending"] == 0
+    assert stats["scheduled"] == 400
+    assert stats["completed"] == 200 and stats["failed"] == 200
@@ -0,0 +1,113 @@
+import os
+import signal
+import time
+
+from telegram import Bot, Update
+from telegram.ext import TypeHandler
+from telegram.utils.request import Request
+
+from metrics import MetricsRegistry, registry
+from sharding import ShardedDispatcher
+
+UPDATES = registry.counter("test_shard_updates_total", "Updates handled by a test shard")
+TELEGRAM_CALLS = registry.counter("test_shard_telegram_calls_total", "Bot API calls made by a test shard")
+
+
+class LocalRequest(Request):
+    """Bot API request answered locally, counting its calls in the shard's registry"""
+
+    __slots__ = ()
+
+    def post(self, url, data, timeout=None):
+        TELEGRAM_CALLS.inc()
+        return {"id": 123456, "is_bot": True, "first_name": "Test", "username": "test_bot"}
+
+
+def count_updates(dispatcher):
+    # Runs in every shard process
+    def handle(update, context):
+        UPDATES.inc()
+        context.bot.get_me()
+
+    dispatcher.add_handler(TypeHandler(Update, handle))
+
+
+def message(update_id, chat_id):
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": chat_id, "type": "private"}, "text": "hi",
+    }}, Bot("123456:test"))
+
+
+def value(registry, name):
+    for line in registry.render().splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    return 0
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_shard_metrics_reach_the_ingress_registry():
+    sharded = ShardedDispatcher(
+        "123456:test", count_updates, 2, dispatcher_workers=1, request=LocalRequest, metrics_interval=0.1
+    )
+    sharded.start()
+    ingress = MetricsRegistry()
+    ingress.add_source(sharded.metric_snapshots)
+    ingress.counter("test_shard_updates_total", "Updates handled by a test shard")
+    ingress.counter("test_shard_telegram_calls_total", "Bot API calls made by a test shard")
+    try:
+        for update_id in range(10):
+            sharded.forward(message(update_id, update_id), None)
+        wait_for(lambda: value(ingress, "test_shard_updates_total") == 10)
+        # The shards' Bot API calls went through the given request factory
+        # Every handler's getMe went through the request factory the shards were given
+        wait_for(lambda: value(ingress, "test_shard_telegram_calls_total") >= 10)
+    finally:
+        sharded.stop()
+
+
+def test_dead_shard_is_restarted():
+    sharded = ShardedDispatcher(
+        "123456:test", count_updates, 2, dispatcher_workers=1, request=LocalRequest, metrics_interval=0.1
+    )
+    sharded.start()
+    ingress = MetricsRegistry()
+    ingress.add_source(sharded.metric_snapshots)
+    ingress.counter("test_shard_updates_total", "Updates handled by a test shard")
+    try:
+        killed = sharded.processes[0]
+        killed.kill()
+        killed.join()
+        assert not sharded.healthy()
+
+        # Chat 2 belongs to the dead shard; its update starts a new one instead of blocking
+        sharded.forward(message(1, 2), None)
+        assert sharded.processes[0] is not killed and sharded.healthy()
+        wait_for(lambda: value(ingress, "test_shard_updates_total") == 1)
+        assert sharded.stats()[0]["restarts"] == 1
+    finally:
+        sharded.stop()
+
+
+def test_stuck_shard_drops_updates_instead_of_blocking():
+    sharded = ShardedDispatcher(
+        "123456:test", count_updates, 2, dispatcher_workers=1, queue_size=1, request=LocalRequest, forward_timeout=0.1
+    )
+    sharded.start()
+    stuck = sharded.processes[0]
+    os.kill(stuck.pid, signal.SIGSTOP)
+    try:
+        started = time.monotonic()
+        for update_id in range(3):
+            sharded.forward(message(update_id, 2), None)
+        assert time.monotonic() - started < 2
+        assert sharded.stats()[0]["dropped"] >= 1
+    finally:
+        os.kill(stuck.pid, signal.SIGCONT)
+        sharded.stop(timeout=1)
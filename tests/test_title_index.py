@@ -0,0 +1,99 @@
+from types import SimpleNamespace
+
+import pytest
+from telegram import Update
+
+import bot
+from stubs import FakeBot
+from title_index import ALL_TOKENS, EXACT_TITLE, PREFIX, TitleIndex, tokenize
+
+
+def movie(media_id, title, date="2010-07-16"):
+    return {"media_type": "movie", "id": media_id, "title": title, "release_date": date}
+
+
+def show(media_id, name, date="2008-01-20"):
+    return {"media_type": "tv", "id": media_id, "name": name, "first_air_date": date}
+
+
+ROWS = [movie(1, "Inception"), movie(2, "The Incredibles", "2004-11-05"), show(3, "Breaking Bad"),
+        {"media_type": "person", "id": 4, "name": "Inception Fan"}]
+
+
+def test_tokenize_normalizes_case_width_and_punctuation():
+    assert tokenize("Amélie: THE Movie!") == ["amélie", "the", "movie"]
+    assert tokenize("ＷＡＬＬ·Ｅ") == tokenize("wall e") == ["wall", "e"]
+    assert tokenize("Straße") == ["strasse"]
+    assert tokenize(" -- ") == []
+
+
+def test_exact_titles_and_years():
+    index = TitleIndex()
+    index.add_results(ROWS)
+    assert len(index) == 3  # People are not indexed
+    assert index.search("inception", prefix=False) == ([ROWS[0]], EXACT_TITLE)
+    assert index.search("INCEPTION 2010", prefix=False) == ([ROWS[0]], EXACT_TITLE)
+    assert index.search("bad", prefix=False) == ([ROWS[2]], ALL_TOKENS)
+    assert index.search("incep", prefix=False) == ([], 0.0)
+    assert index.search("", prefix=False) == ([], 0.0)
+
+
+def test_prefix_lookups_for_inline_queries():
+    index = TitleIndex()
+    index.add_results(ROWS)
+    rows, confidence = index.search("inc", prefix=True)
+    assert rows == [ROWS[0], ROWS[1]] and confidence == PREFIX
+    # Earlier words must match whole; only the last one is still being typed
+    assert index.search("breaking b", prefix=True) == ([ROWS[2]], PREFIX)
+    assert index.search("bad brea", prefix=True) == ([ROWS[2]], PREFIX)
+    assert index.search("breakin b", prefix=True) == ([], 0.0)
+
+
+def test_evicts_titles_seen_least_often():
+    index = TitleIndex(max_titles=10)
+    popular = movie(100, "Popular")
+    index.add_results([popular])
+    index.add_results([popular])
+    index.add_results([movie(number, f"Title{number}") for number in range(10)])
+
+    # Going over the cap drops a tenth of the titles, the least seen first
+    assert len(index) == 10
+    assert index.search("popular", prefix=False) == ([popular], EXACT_TITLE)
+    assert index.stats() == {"titles": 10, "tokens": 11}
+
+
+@pytest.fixture
+def searched(monkeypatch):
+    """Run /tmdb with the local index enabled and record what went to TMDb"""
+    monkeypatch.setattr(bot, "LOCAL_SEARCH_ENABLED", True)
+    monkeypatch.setattr(bot, "async_tmdb", None)
+    monkeypatch.setattr(bot.tmdb, "title_index", TitleIndex())
+    bot.tmdb.title_index.add_results(ROWS)
+    remote = []
+    monkeypatch.setattr(bot.tmdb, "search_multi", lambda query: remote.append(query))
+    monkeypatch.setattr(bot.prefetcher, "prefetch", lambda chat_id, keys: None)
+
+    def search(query):
+        fake_bot = FakeBot()
+        update = Update.de_json({"update_id": 1, "message": {
+            "message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "text": f"/tmdb {query}",
+        }}, fake_bot)
+        bot.tmdb_search(update, SimpleNamespace(args=query.split()))
+        return fake_bot
+
+    return search, remote
+
+
+def test_exact_local_match_skips_tmdb(searched):
+    search, remote = searched
+    fake_bot = search("Inception")
+    assert remote == []
+    # The "Searching..." notice and the results keyboard
+    assert fake_bot.calls["sendMessage"] == 2
+
+
+def test_partial_local_match_asks_tmdb(searched):
+    search, remote = searched
+    search("Incep")
+    search("Bad")
+    assert remote == ["Incep", "Bad"]
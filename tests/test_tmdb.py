@@ -0,0 +1,183 @@
+import asyncio
+import threading
+
+import pytest
+
+import fixtures
+from decoders import DecodeError, available_decoders, get_decoder
+from ratelimit import BACKGROUND
+from stubs import TMDbStub
+from tmdb_api import TMDbAPI
+from tmdb_async import AsyncTMDbAPI
+
+
+@pytest.fixture(scope="module")
+def tmdb_fixtures():
+    return fixtures.synthesize(titles=20)
+
+
+@pytest.fixture
+def stub(tmdb_fixtures):
+    stub = TMDbStub(tmdb_fixtures, latency=0.2).start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def api(stub):
+    api = TMDbAPI(disk_cache_path="")
+    api.base_url = stub.url
+    return api
+
+
+def title(tmdb_fixtures):
+    media_type, media_id = next(iter(tmdb_fixtures["details"])).split("/")
+    return media_type, media_id
+
+
+def test_details_are_cached(api, stub, tmdb_fixtures):
+    first = api.get_details(*title(tmdb_fixtures))
+    assert first["id"]
+    assert api.get_details(*title(tmdb_fixtures)) is first
+    assert stub.requests["details"] == 1
+
+
+def test_malformed_body_is_not_cached(api, stub, tmdb_fixtures):
+    stub.failures.append((200, b"<html><body>502 Bad Gateway</body></html>"))
+    assert api.get_details(*title(tmdb_fixtures)) is None
+    assert len(api.cache) == 0
+    # The next call goes upstream again and gets the real payload
+    assert api.get_details(*title(tmdb_fixtures))["id"]
+    assert stub.requests["details"] == 2
+
+
+MALFORMED_BODIES = [b"<html><body>502 Bad Gateway</body></html>", b'{"id": 1, "title": "Incep', b"[]", b""]
+
+
+@pytest.mark.parametrize("decoder", available_decoders())
+@pytest.mark.parametrize("body", MALFORMED_BODIES)
+def test_every_decoder_raises_decode_error(decoder, body):
+    for cache_key in (("details", "movie", "1", "en-US"), ("search", "inception", "en-US", 1)):
+        with pytest.raises(DecodeError):
+            get_decoder(decoder)(cache_key, body)
+
+
+@pytest.mark.parametrize("decoder", available_decoders())
+def test_malformed_body_fails_the_lookup_with_every_decoder(decoder, stub, tmdb_fixtures):
+    api = TMDbAPI(disk_cache_path="", decoder=decoder)
+    api.base_url = stub.url
+    client = AsyncTMDbAPI(api)
+    stub.failures += [(200, body) for body in MALFORMED_BODIES]
+    for _ in MALFORMED_BODIES[:2]:
+        assert api.get_details(*title(tmdb_fixtures)) is None
+    for _ in MALFORMED_BODIES[2:]:
+        assert run(client, client.get_details(*title(tmdb_fixtures))) is None
+    assert len(api.cache) == 0
+    assert api.get_details(*title(tmdb_fixtures))["id"]
+
+
+def test_concurrent_misses_share_one_request(api, stub, tmdb_fixtures):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(api.get_details(*title(tmdb_fixtures)))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stub.requests["details"] == 1
+    assert all(result is results[0] for result in results)
+    assert api.coalescing_stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_async_and_sync_callers_share_one_request(api, stub, tmdb_fixtures):
+    client = AsyncTMDbAPI(api)
+
+    async def lookups():
+        # A background prefetch on a thread leads; async handlers join it, and more threads join them
+        prefetch = threading.Thread(target=api.get_details, args=title(tmdb_fixtures), kwargs={"priority": BACKGROUND})
+        prefetch.start()
+        await asyncio.sleep(0.05)
+        results = await asyncio.gather(*(client.get_details(*title(tmdb_fixtures)) for _ in range(3)))
+        await client.close()
+        prefetch.join()
+        return results
+
+    results = asyncio.run(lookups())
+    assert stub.requests["details"] == 1
+    assert results[0]["id"] and all(result is results[0] for result in results)
+
+
+def test_async_leader_is_shared_with_threads(api, stub, tmdb_fixtures):
+    client = AsyncTMDbAPI(api)
+    joined = []
+
+    async def lookups():
+        task = asyncio.ensure_future(client.get_details(*title(tmdb_fixtures)))
+        await asyncio.sleep(0.05)
+        thread = threading.Thread(target=lambda: joined.append(api.get_details(*title(tmdb_fixtures))))
+        thread.start()
+        result = await task
+        await asyncio.get_running_loop().run_in_executor(None, thread.join)
+        await client.close()
+        return result
+
+    result = asyncio.run(lookups())
+    assert stub.requests["details"] == 1
+    assert joined == [result]
+    assert api.coalescing_stats()["coalesced"] == 1
+
+
+def run(client, coroutine):
+    async def with_client():
+        try:
+            return await coroutine
+        finally:
+            await client.close()
+
+    return asyncio.run(with_client())
+
+
+def test_async_details_and_search(api, stub, tmdb_fixtures):
+    client = AsyncTMDbAPI(api)
+    media_type, media_id = title(tmdb_fixtures)
+    details = run(client, client.get_details(media_type, media_id))
+    assert str(details["id"]) == media_id
+    # The async client fills the same cache the synchronous one reads
+    assert api.get_details(media_type, media_id) is details
+
+    query = next(iter(tmdb_fixtures["search"]))
+    results = run(client, client.search_multi(query))
+    assert results["results"]
+    assert stub.requests == {"details": 1, "search": 1}
+
+
+def test_async_failures_are_not_cached(api, stub, tmdb_fixtures):
+    client = AsyncTMDbAPI(api, max_retries=0)
+    assert run(client, client.get_details("movie", "999999999")) is None
+    assert run(client, client.get_details("movie", "999999999")) is None
+    assert stub.requests["details"] == 2
+    assert run(client, client.get_details("person", "1")) is None  # Not a details media type
+
+
+def test_async_retries_throttled_and_server_errors(api, stub, tmdb_fixtures):
+    client = AsyncTMDbAPI(api, max_retries=2, backoff_factor=0.01)
+    stub.failures += [429, 503]
+    assert run(client, client.get_details(*title(tmdb_fixtures)))["id"]
+    assert stub.requests["details"] == 3
+
+    stub.failures += [503, 503, 503]
+    api.cache.clear()
+    assert run(client, client.get_details(*title(tmdb_fixtures))) is None
+
+
+def test_cancelled_async_caller_does_not_cancel_the_others(api, stub, tmdb_fixtures):
+    client = AsyncTMDbAPI(api)
+
+    async def lookups():
+        first = asyncio.ensure_future(client.get_details(*title(tmdb_fixtures)))
+        second = asyncio.ensure_future(client.get_details(*title(tmdb_fixtures)))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        return await second
+
+    assert run(client, lookups())["id"]
+    assert stub.requests["details"] == 1
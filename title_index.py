@@ -0,0 +1,146 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+# Confidence levels reported by TitleIndex.search
+EXACT_TITLE = 1.0  # The query is the whole title (optionally with its year)
+ALL_TOKENS = 0.75  # Every query word appears in the title
+PREFIX = 0.5  # The last query word is still being typed
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into normalized, case-folded word tokens"""
+    return _TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+def _year(row):
+    date = row.get('release_date' if row.get('media_type') == 'movie' else 'first_air_date') or ""
+    return date[:4] if len(date) >= 4 else None
+
+
+class _Doc:
+    __slots__ = ("row", "title_tokens", "tokens", "rank", "seen")
+
+    def __init__(self, row, title_tokens, tokens, rank):
+        self.row = row
+        self.title_tokens = title_tokens
+        self.tokens = tokens
+        self.rank = rank  # Best position this title has had in a TMDb result list
+        self.seen = 1
+
+
+class TitleIndex:
+    """In-memory inverted index over movie and TV titles (and years) seen in search results.
+
+    Exact words are looked up in a token -> titles map; the last query word is also
+    matched as a prefix through a sorted token list, which gives as-you-type results.
+    The index is updated incrementally and capped at max_titles, dropping the titles
+    seen least often first.
+    """
+
+    def __init__(self, max_titles=50000):
+        self.max_titles = max_titles
+        self._docs = {}  # (media_type, id) -> _Doc
+        self._postings = {}  # token -> set of doc keys
+        self._tokens = []  # Sorted list of every token, for prefix lookups
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add_results(self, rows):
+        """Index movie and TV rows from a search result, in TMDb's ranking order"""
+        with self._lock:
+            for rank, row in enumerate(rows):
+                media_type = row.get('media_type')
+                if media_type not in ('movie', 'tv'):
+                    continue
+                key = (media_type, row['id'])
+                doc = self._docs.get(key)
+                if doc is not None:
+                    doc.seen += 1
+                    doc.rank = min(doc.rank, rank)
+                    continue
+                title_tokens = tuple(tokenize(row.get('title') or row.get('name') or ""))
+                if not title_tokens:
+                    continue
+                year = _year(row)
+                tokens = set(title_tokens)
+                if year:
+                    tokens.add(year)
+                self._docs[key] = _Doc(row, title_tokens, tokens, rank)
+                for token in tokens:
+                    postings = self._postings.get(token)
+                    if postings is None:
+                        postings = self._postings[token] = set()
+                        bisect.insort(self._tokens, token)
+                    postings.add(key)
+            if len(self._docs) > self.max_titles:
+                self._trim()
+
+    def _trim(self):
+        # Caller must hold the lock; drop the least popular tenth in one pass
+        victims = sorted(self._docs, key=lambda key: self._docs[key].seen)[:max(len(self._docs) // 10, 1)]
+        for key in victims:
+            for token in self._docs.pop(key).tokens:
+                postings = self._postings[token]
+                postings.discard(key)
+                if not postings:
+                    del self._postings[token]
+                    del self._tokens[bisect.bisect_left(self._tokens, token)]
+
+    def _prefixed(self, prefix):
+        # Caller must hold the lock; union of postings for every token starting with prefix
+        keys = set()
+        position = bisect.bisect_left(self._tokens, prefix)
+        while position < len(self._tokens) and self._tokens[position].startswith(prefix):
+            keys |= self._postings[self._tokens[position]]
+            position += 1
+        return keys
+
+    def search(self, query, limit=10, prefix=True):
+        """Return (rows, confidence) for query; confidence is 0 when nothing matched.
+
+        With prefix=True the last word also matches longer words, for as-you-type lookups.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return [], 0.0
+
+        with self._lock:
+            candidates = None
+            for token in query_tokens[:-1]:
+                keys = self._postings.get(token, set())
+                candidates = set(keys) if candidates is None else candidates & keys
+                if not candidates:
+                    return [], 0.0
+
+            last = query_tokens[-1]
+            exact_last = self._postings.get(last, set())
+            last_keys = self._prefixed(last) if prefix else exact_last
+            candidates = set(last_keys) if candidates is None else candidates & last_keys
+            if not candidates:
+                return [], 0.0
+
+            query_words = tuple(query_tokens)
+            scored = []
+            for key in candidates:
+                doc = self._docs[key]
+                if query_words == doc.title_tokens or (query_words[:-1] == doc.title_tokens and last == _year(doc.row)):
+                    score = EXACT_TITLE
+                elif key in exact_last:
+                    score = ALL_TOKENS
+                else:
+                    score = PREFIX
+                scored.append((-score, -doc.seen, doc.rank, key, doc.row))
+
+        scored.sort(key=lambda item: item[:3])
+        top = scored[:limit]
+        return [row for _, _, _, _, row in top], -top[0][0]
+
+    def stats(self):
+        with self._lock:
+            return {"titles": len(self._docs), "tokens": len(self._tokens)}
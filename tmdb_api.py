@@ -1,18 +1,225 @@
+import random
+import time
+import unicodedata
 import requests
 import logging
-from config import TMDB_API_KEY, TMDB_API_BASE_URL, TMDB_IMAGE_BASE_URL, POSTER_SIZES, BACKDROP_SIZES, LOGO_SIZES
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cache import TTLCache, DerivedCache
+from decoders import DecodeError, get_decoder
+from images import ImageIndex
+from projection import project
+from metrics import registry
+from ratelimit import TokenBucket, INTERACTIVE, BACKGROUND
+from refresh import RefreshScheduler
+from title_index import TitleIndex
+from singleflight import SingleFlight
+from config import (
+    TMDB_API_KEY, TMDB_API_BASE_URL, TMDB_IMAGE_BASE_URL, POSTER_SIZES, BACKDROP_SIZES, LOGO_SIZES,
+    TMDB_CACHE_MAX_ENTRIES, TMDB_CACHE_MAX_BYTES, TMDB_CACHE_TTLS,
+    TMDB_POOL_SIZE, TMDB_MAX_RETRIES, TMDB_BACKOFF_FACTOR, TMDB_REQUEST_TIMEOUT,
+    TMDB_RATE_LIMIT, TMDB_RATE_BURST, TMDB_DISK_CACHE_PATH, TMDB_DISK_CACHE_MAX_BYTES,
+    TMDB_STALE_GRACE, TMDB_REFRESH_WORKERS, TMDB_REFRESH_JITTER,
+    SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_MAX_BYTES, TITLE_INDEX_MAX_TITLES, IMAGE_PROXY_URL, TMDB_JSON_DECODER
+)
 
 # Set up logger
 logger = logging.getLogger(__name__)
 
+# Upstream statuses worth retrying; TMDb signals rate limiting with 429
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Latency of calls to TMDb (retries included), by endpoint ("search"/"details") and final HTTP status or "error"
+TMDB_REQUEST_SECONDS = registry.histogram(
+    "tmdb_request_duration_seconds", "Latency of TMDb API calls", ("endpoint", "status")
+)
+
+class JitteredRetry(Retry):
+    """Exponential backoff with full jitter so retrying workers don't stampede together.
+
+    A Retry-After header on 429/503 responses still takes precedence over the backoff.
+    """
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff else 0
+
+def create_session(pool_size=TMDB_POOL_SIZE, max_retries=TMDB_MAX_RETRIES, backoff_factor=TMDB_BACKOFF_FACTOR):
+    """Create a keep-alive HTTP session with a bounded connection pool and retry policy"""
+    retry = JitteredRetry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False  # Hand the final error response back instead of raising
+    )
+    # pool_block makes threads wait for a free connection instead of opening throwaway ones
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def normalize_query(query):
+    """Canonical form of a search query: Unicode-normalized, case-folded, whitespace-collapsed"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
 class TMDbAPI:
-    def __init__(self):
+    def __init__(self, session=None, disk_cache_path=TMDB_DISK_CACHE_PATH, decoder=TMDB_JSON_DECODER):
         self.api_key = TMDB_API_KEY
         self.base_url = TMDB_API_BASE_URL
-        self.image_base_url = TMDB_IMAGE_BASE_URL
+        # Image links point at our image proxy when one is published, otherwise straight at TMDb
+        self.image_base_url = IMAGE_PROXY_URL.rstrip("/") or TMDB_IMAGE_BASE_URL
+        # One pooled session is shared by all dispatcher threads so connections are reused
+        self.session = session or create_session()
+        self.timeout = TMDB_REQUEST_TIMEOUT
+        # Parses and projects response bodies: decode(cache_key, body) -> cached payload (see decoders)
+        self.decode = decoder if callable(decoder) else get_decoder(decoder)
+        self.cache = TTLCache(max_entries=TMDB_CACHE_MAX_ENTRIES, max_bytes=TMDB_CACHE_MAX_BYTES, grace=TMDB_STALE_GRACE)
+        # Searches get their own cache so heavy-tailed query traffic can't evict details payloads
+        self.search_cache = TTLCache(max_entries=SEARCH_CACHE_MAX_ENTRIES, max_bytes=SEARCH_CACHE_MAX_BYTES, grace=TMDB_STALE_GRACE)
+        self.cache_ttls = dict(TMDB_CACHE_TTLS)
+        # Every movie/TV row a search returns is indexed locally for instant lookups and inline suggestions
+        self.title_index = TitleIndex(max_titles=TITLE_INDEX_MAX_TITLES)
+        # Optional second tier that survives restarts; memory misses fall through to it before TMDb
+        self.disk_cache = None
+        if disk_cache_path:
+            from disk_cache import SQLiteCache
+            self.disk_cache = SQLiteCache(disk_cache_path, max_bytes=TMDB_DISK_CACHE_MAX_BYTES)
+        # Concurrent misses for the same key share one upstream request
+        self.flight = SingleFlight()
+        # Outbound requests are throttled below TMDb's limit; interactive lookups jump ahead of background work
+        self.limiter = TokenBucket(TMDB_RATE_LIMIT, TMDB_RATE_BURST)
+        # Image indexes are built once per cached details payload and dropped when it is refreshed or evicted
+        self.image_indexes = DerivedCache(self.cache, "image_index", size=ImageIndex.size_in_bytes)
+        # Stale entries are served immediately and refreshed here, at background priority
+        self.refresher = RefreshScheduler(workers=TMDB_REFRESH_WORKERS, jitter=TMDB_REFRESH_JITTER)
     
-    def search_multi(self, query, language="en-US", page=1):
-        """Search for movies, TV shows, and people in a single request"""
+    def _cached_get(self, cache_key, endpoint, params, error_message, priority=INTERACTIVE):
+        """Return a cached response for cache_key, fetching and caching it on a miss"""
+        data, stale = self.cache_for(cache_key).lookup(cache_key)
+        if data is not None:
+            if stale:
+                self.schedule_refresh(cache_key, endpoint, params, error_message)
+            return data
+        
+        return self.flight.do(cache_key, lambda: self._fetch(cache_key, endpoint, params, error_message, priority))
+    
+    def _fetch(self, cache_key, endpoint, params, error_message, priority=INTERACTIVE):
+        """Fetch a response from TMDb and cache it if it succeeded"""
+        # A previous flight may have filled the cache between our miss and taking the lead
+        data = self.cache_for(cache_key).peek(cache_key)
+        if data is not None:
+            return data
+        
+        data = self.load_persistent(cache_key)
+        if data is not None:
+            return data
+        
+        if not self.limiter.acquire(priority, timeout=self.timeout):
+            logger.warning(f"{error_message}: rate limit queue wait exceeded {self.timeout}s ({priority})")
+            return None
+        
+        start = time.perf_counter()
+        try:
+            response = self.session.get(endpoint, params=params, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            TMDB_REQUEST_SECONDS.observe(time.perf_counter() - start, cache_key[0], "error")
+            logger.error(f"{error_message}: {e}")
+            return None
+        TMDB_REQUEST_SECONDS.observe(time.perf_counter() - start, cache_key[0], str(response.status_code))
+        
+        if response.status_code != 200:
+            return None
+        
+        # Keep only the fields the handlers read, so cached entries stay small
+        try:
+            data = self.decode(cache_key, response.content)
+        except DecodeError as e:
+            # A 200 with a truncated or non-JSON body (e.g. a proxy's HTML error page)
+            logger.error(f"{error_message}: invalid response body: {e}")
+            return None
+        # Only successful responses are cached; failures are retried on the next call
+        self.cache_payload(cache_key, data)
+        return data
+    
+    def cache_for(self, cache_key):
+        """Return the in-memory cache that holds entries for cache_key's namespace"""
+        return self.search_cache if cache_key[0] == "search" else self.cache
+    
+    def schedule_refresh(self, cache_key, endpoint, params, error_message):
+        """Refresh a stale entry in the background through the pool and rate limiter"""
+        self.refresher.schedule(
+            cache_key,
+            lambda: self.flight.do(cache_key, lambda: self._fetch(cache_key, endpoint, params, error_message, BACKGROUND))
+        )
+    
+    def cache_payload(self, cache_key, data, size=None):
+        """Cache a fresh payload in memory and, when enabled, on disk"""
+        ttl = self.cache_ttls[cache_key[0]]
+        self.cache_for(cache_key).set(cache_key, data, ttl=ttl, size=size)
+        self._index_titles(cache_key, data)
+        if self.disk_cache:
+            self.disk_cache.set(cache_key, data, ttl)
+    
+    def _index_titles(self, cache_key, data):
+        if cache_key[0] == "search":
+            self.title_index.add_results(data["media_results"])
+    
+    def load_persistent(self, cache_key):
+        """Return a payload from the disk cache, promoting it into memory for its remaining lifetime"""
+        if not self.disk_cache:
+            return None
+        
+        entry = self.disk_cache.get(cache_key)
+        if entry is None:
+            return None
+        
+        data, remaining_ttl = entry
+        # JSON round-trips image records as lists, so restore their compact form
+        data = project(cache_key, data)
+        self.cache_for(cache_key).set(cache_key, data, ttl=min(remaining_ttl, self.cache_ttls[cache_key[0]]))
+        self._index_titles(cache_key, data)
+        return data
+    
+    def warm_cache(self, limit):
+        """Load the most recently used payloads from disk into memory; returns how many were loaded"""
+        if not self.disk_cache:
+            return 0
+        
+        loaded = 0
+        for cache_key, data, remaining_ttl in self.disk_cache.recent(limit):
+            if cache_key[0] in self.cache_ttls:
+                data = project(cache_key, data)
+                self.cache_for(cache_key).set(cache_key, data, ttl=min(remaining_ttl, self.cache_ttls[cache_key[0]]))
+                self._index_titles(cache_key, data)
+                loaded += 1
+        return loaded
+    
+    def cache_stats(self):
+        """Return hit/miss/eviction counters for the response cache"""
+        stats = self.cache.stats()
+        stats["search"] = self.search_cache.stats()
+        if self.disk_cache:
+            stats["disk"] = self.disk_cache.stats()
+        return stats
+    
+    def coalescing_stats(self):
+        """Return how many lookups ran upstream and how many were coalesced onto them"""
+        return self.flight.stats()
+    
+    def refresh_stats(self):
+        """Return counters for stale-while-revalidate background refreshes"""
+        return self.refresher.stats()
+    
+    def rate_limit_stats(self):
+        """Return per-lane queue-wait statistics for the outbound rate limiter"""
+        return self.limiter.stats()
+    
+    def search_request(self, query, language="en-US", page=1):
+        """Build the (cache_key, endpoint, params) triple for a multi search"""
+        # TMDb search ignores case and extra whitespace, so spelling variants share one entry
+        query = normalize_query(query)
         endpoint = f"{self.base_url}/search/multi"
         params = {
             "api_key": self.api_key,
@@ -21,16 +228,10 @@ class TMDbAPI:
             "page": page,
             "include_adult": False
         }
-        
-        try:
-            response = requests.get(endpoint, params=params, timeout=10)
-            return response.json() if response.status_code == 200 else None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error searching TMDb: {e}")
-            return None
+        return ("search", query, language, page), endpoint, params
     
-    def get_details(self, media_type, media_id, language="en-US"):
-        """Get detailed information about a specific movie or TV show"""
+    def details_request(self, media_type, media_id, language="en-US"):
+        """Build the (cache_key, endpoint, params) triple for a details lookup, or None for unknown media types"""
         if media_type not in ["movie", "tv"]:
             return None
             
@@ -41,13 +242,29 @@ class TMDbAPI:
             "append_to_response": "images",
             "include_image_language": "en,hi,ta,te,bn,null"  # Include images in all supported languages
         }
-        
-        try:
-            response = requests.get(endpoint, params=params, timeout=10)
-            return response.json() if response.status_code == 200 else None
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error getting details from TMDb: {e}")
+        return ("details", media_type, str(media_id), language), endpoint, params
+    
+    def search_local(self, query, limit=10, prefix=False):
+        """Look query up in the local title index; returns (rows, confidence) without any network call"""
+        return self.title_index.search(query, limit=limit, prefix=prefix)
+    
+    def search_multi(self, query, language="en-US", page=1, priority=INTERACTIVE):
+        """Search for movies, TV shows, and people in a single request"""
+        cache_key, endpoint, params = self.search_request(query, language, page)
+        return self._cached_get(cache_key, endpoint, params, "Error searching TMDb", priority)
+    
+    def get_details(self, media_type, media_id, language="en-US", priority=INTERACTIVE):
+        """Get detailed information about a specific movie or TV show"""
+        request = self.details_request(media_type, media_id, language)
+        if request is None:
             return None
+        
+        cache_key, endpoint, params = request
+        return self._cached_get(cache_key, endpoint, params, "Error getting details from TMDb", priority)
+    
+    def image_index(self, details):
+        """Return the ImageIndex for a details payload, building it on first use"""
+        return self.image_indexes.get(details, ImageIndex)
     
     def get_poster_url(self, poster_path, size="medium"):
         """Generate poster URL from poster path"""
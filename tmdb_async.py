@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from config import TMDB_POOL_SIZE, TMDB_MAX_RETRIES, TMDB_BACKOFF_FACTOR, ASYNC_IO_WORKERS
+from decoders import DecodeError
+from ratelimit import INTERACTIVE
+from tmdb_api import RETRY_STATUSES, TMDB_REQUEST_SECONDS
+
+# Set up logger
+logger = logging.getLogger(__name__)
+
+def _query_params(params):
+    """aiohttp only accepts str/int/float query values, so render booleans the way TMDb expects"""
+    return {key: str(value).lower() if isinstance(value, bool) else value for key, value in params.items()}
+
+def _retry_after(response):
+    """Return the Retry-After delay in seconds, or None if the header is missing or not numeric"""
+    value = response.headers.get("Retry-After")
+    if value and value.isdigit():
+        return int(value)
+    return None
+
+class AsyncTMDbAPI:
+    """Coroutine counterpart of TMDbAPI.
+
+    Request building, the response cache, the in-flight request map and the image
+    URL helpers are shared with the wrapped synchronous client, so both paths see
+    the same cached payloads and a title is fetched once however many callers of
+    either kind want it.
+    """
+    def __init__(self, api, pool_size=TMDB_POOL_SIZE, max_retries=TMDB_MAX_RETRIES, backoff_factor=TMDB_BACKOFF_FACTOR):
+        self.api = api
+        self.limiter = api.limiter
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self._session = None  # Created lazily so it binds to the running event loop
+        self._inflight = {}  # cache_key -> task of the requests this client leads in api.flight
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            timeout = aiohttp.ClientTimeout(total=self.api.timeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    def _backoff(self, attempt):
+        # Exponential backoff with full jitter, matching the synchronous retry policy
+        return random.uniform(0, self.backoff_factor * (2 ** attempt))
+
+    async def _acquire(self, priority):
+        """Wait for a rate-limit token without blocking the event loop; returns False on timeout"""
+        start = time.monotonic()
+        waited = None
+        # Registered as waiting in its lane, so lower-priority threads blocked in acquire() let it go first
+        self.limiter.add_waiter(priority)
+        try:
+            while True:
+                delay = self.limiter.try_acquire(priority)
+                if not delay:
+                    waited = time.monotonic() - start
+                    return True
+                if time.monotonic() - start + delay > self.api.timeout:
+                    return False
+                await asyncio.sleep(delay)
+        finally:
+            self.limiter.remove_waiter(priority, waited)
+
+    async def _cached_get(self, cache_key, endpoint, params, error_message, priority=INTERACTIVE):
+        """Return a cached response for cache_key, fetching and caching it on a miss"""
+        data, stale = self.api.cache_for(cache_key).lookup(cache_key)
+        if data is not None:
+            if stale:
+                # Refreshes run on the synchronous client's background workers
+                self.api.schedule_refresh(cache_key, endpoint, params, error_message)
+            return data
+
+        loop = asyncio.get_running_loop()
+        call, leader = self.api.flight.begin(cache_key)
+        if leader:
+            task = loop.create_task(self._fetch(cache_key, endpoint, params, error_message, priority))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda task: self._finish(cache_key, call, task))
+        else:
+            task = self._inflight.get(cache_key)
+            if task is None:
+                # A synchronous caller (a prefetch, a refresh, a sync handler) is fetching it; wait off the loop
+                return await loop.run_in_executor(None, call.wait)
+        # Shield so one cancelled waiter doesn't cancel the request for everyone else
+        return await asyncio.shield(task)
+
+    def _finish(self, cache_key, call, task):
+        # Hands the task's outcome to synchronous callers waiting on the shared flight
+        self._inflight.pop(cache_key, None)
+        error = asyncio.CancelledError() if task.cancelled() else task.exception()
+        self.api.flight.finish(cache_key, call, None if error else task.result(), error)
+
+    async def _fetch(self, cache_key, endpoint, params, error_message, priority=INTERACTIVE):
+        """Fetch a response from TMDb and cache it if it succeeded"""
+        # A previous flight may have filled the cache between our miss and taking the lead
+        data = self.api.cache_for(cache_key).peek(cache_key)
+        if data is not None:
+            return data
+
+        if self.api.disk_cache:
+            # SQLite is blocking, so consult it off the event loop
+            data = await asyncio.get_running_loop().run_in_executor(None, self.api.load_persistent, cache_key)
+            if data is not None:
+                return data
+
+        if not await self._acquire(priority):
+            logger.warning(f"{error_message}: rate limit queue wait exceeded {self.api.timeout}s ({priority})")
+            return None
+
+        session = self._get_session()
+        params = _query_params(params)
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with session.get(endpoint, params=params) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        delay = _retry_after(response)
+                        await asyncio.sleep(delay if delay is not None else self._backoff(attempt))
+                        continue
+                    if response.status != 200:
+                        TMDB_REQUEST_SECONDS.observe(time.perf_counter() - start, cache_key[0], str(response.status))
+                        return None
+                    body = await response.read()
+                    TMDB_REQUEST_SECONDS.observe(time.perf_counter() - start, cache_key[0], "200")
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                TMDB_REQUEST_SECONDS.observe(time.perf_counter() - start, cache_key[0], "error")
+                logger.error(f"{error_message}: {e}")
+                return None
+
+        # Keep only the fields the handlers read, so cached entries stay small
+        try:
+            data = self.api.decode(cache_key, body)
+        except DecodeError as e:
+            logger.error(f"{error_message}: invalid response body: {e}")
+            return None
+        # Only successful responses are cached; failures are retried on the next call
+        if self.api.disk_cache:
+            await asyncio.get_running_loop().run_in_executor(None, self.api.cache_payload, cache_key, data)
+        else:
+            self.api.cache_payload(cache_key, data)
+        return data
+
+    async def search_multi(self, query, language="en-US", page=1, priority=INTERACTIVE):
+        """Search for movies, TV shows, and people in a single request"""
+        cache_key, endpoint, params = self.api.search_request(query, language, page)
+        return await self._cached_get(cache_key, endpoint, params, "Error searching TMDb", priority)
+
+    async def get_details(self, media_type, media_id, language="en-US", priority=INTERACTIVE):
+        """Get detailed information about a specific movie or TV show"""
+        request = self.api.details_request(media_type, media_id, language)
+        if request is None:
+            return None
+
+        cache_key, endpoint, params = request
+        return await self._cached_get(cache_key, endpoint, params, "Error getting details from TMDb", priority)
+
+    def get_poster_url(self, poster_path, size="medium"):
+        return self.api.get_poster_url(poster_path, size)
+
+    def get_backdrop_url(self, backdrop_path, size="medium"):
+        return self.api.get_backdrop_url(backdrop_path, size)
+
+    def get_logo_url(self, logo_path, size="medium"):
+        return self.api.get_logo_url(logo_path, size)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+class EventLoopThread:
+    """Runs a single asyncio event loop in a daemon thread and accepts coroutines from other threads"""
+    def __init__(self, io_workers=ASYNC_IO_WORKERS):
+        self.loop = asyncio.new_event_loop()
+        # Blocking calls (e.g. python-telegram-bot requests) are pushed onto this executor
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="async-io"))
+        self._thread = threading.Thread(target=self._run, name="tmdb-event-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule coro on the loop and return a concurrent.futures.Future for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def run_blocking(self, func, *args):
+        """Run a blocking callable on the loop's executor without stalling the loop"""
+        return await self.loop.run_in_executor(None, func, *args)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)